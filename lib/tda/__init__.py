@@ -1,7 +1,7 @@
 from .logger import TDALogger
 
 from .account import Account, Watchlist
-from .auth import get_token, get_content, authenticate
+from .auth import get_token, get_content, async_get_content, authenticate
 from .equity import Equity, PriceHistory
 from .options import Option, OptionChain
 from .streamclient import StreamClient
@@ -3,7 +3,7 @@
 import pandas as pd
 
 from config import account_id
-from ..auth import get_token, get_content
+from ..auth import get_token, get_content, async_get_content
 
 
 # Account Data
@@ -81,7 +81,21 @@ class Account:
         endpoint = r'https://api.tdameritrade.com/v1/accounts/{}'.format(self.accountID)
         params = {'fields': 'positions'}
         content = get_content(url=endpoint, params=params, headers=self.token)
-        response = content.json()['securitiesAccount']['positions']
+
+        return self.positions_to_df(content.json())
+
+    # Account positions without blocking the event loop
+    async def positions_async(self):
+        endpoint = r'https://api.tdameritrade.com/v1/accounts/{}'.format(self.accountID)
+        params = {'fields': 'positions'}
+        content = await async_get_content(url=endpoint, params=params, headers=self.token)
+
+        return self.positions_to_df(content.json())
+
+    # Format account positions response
+    @staticmethod
+    def positions_to_df(response: dict) -> pd.DataFrame:
+        response = response['securitiesAccount']['positions']
         df = pd.json_normalize(response).set_index('instrument.symbol')
 
         cols = ['longQuantity', 'shortQuantity', 'settledLongQuantity', 'settledShortQuantity', 'averagePrice',
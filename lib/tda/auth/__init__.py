@@ -1,8 +1,12 @@
 from pathlib import Path
 
+from .async_content import async_get_content, close_async_session, configure_async_session
 from .auth_token import get_token
 from .content import get_content
-from .oauth import authenticate, Authenticate
+from .oauth import authenticate, Authenticate, token_cache
+from .rate_limit import configure_rate_limit, rate_limiter
+from .refresher import start_token_refresher, token_refresher
+from .session import configure_session, get_session
 
 # Token Path: */tda/temp/token.pickle
 TOKEN_PATH = Path.joinpath(Path.joinpath(Path(__file__).parent.parent, Path('temp/')), 'token.pickle')
@@ -0,0 +1,220 @@
+# Async REST Transport on aiohttp
+import asyncio
+import json
+
+import aiohttp
+
+from .auth_token import with_token
+from .oauth import authenticate, get_status_cache, token_cache, update_wait_status
+from .rate_limit import rate_limiter, retry_after
+from .refresher import token_refresher
+from ..logger import TDALogger
+
+# Set up logger
+content_logger = TDALogger("content").logger
+
+# Default concurrent requests and keep-alive connections
+CONCURRENCY = 8
+POOL_SIZE = 20
+
+
+class AsyncContent:
+    """
+    Response of async_get_content with the body already read: status_code, text and json() as on requests.Response
+    """
+
+    __slots__ = ("url", "status_code", "headers", "text")
+
+    def __init__(self, url: str, status_code: int, headers: dict, text: str):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.text = text
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class AsyncSession:
+    """
+    One aiohttp ClientSession and one concurrency semaphore shared by every async REST call of an event loop.
+
+    The session keeps pool_size keep-alive connections and accepts gzip. The semaphore caps requests in flight, so
+    gathering hundreds of calls runs them concurrently without opening hundreds of connections.
+    """
+
+    def __init__(self, concurrency: int = CONCURRENCY, pool_size: int = POOL_SIZE):
+        """
+        Initialize AsyncSession
+        :param concurrency: Requests in flight
+        :param pool_size: Keep-alive connections
+        """
+        self.concurrency = concurrency
+        self.pool_size = pool_size
+
+        self._session = None
+        self._semaphore = None
+        self._loop = None
+
+    def configure(self, concurrency: int = CONCURRENCY, pool_size: int = POOL_SIZE) -> None:
+        """
+        Set the limits. They apply to the session created next; close() the current one to apply them now.
+        :param concurrency: Requests in flight
+        :param pool_size: Keep-alive connections
+        :return: None
+        """
+        self.concurrency = concurrency
+        self.pool_size = pool_size
+
+    def session(self) -> tuple[aiohttp.ClientSession, asyncio.Semaphore]:
+        """
+        Get the session and semaphore of the running loop, created on first use
+        :return: (ClientSession, Semaphore)
+        """
+        loop = asyncio.get_running_loop()
+
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, limit_per_host=self.pool_size)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  headers={'Accept-Encoding': 'gzip, deflate'})
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._loop = loop
+
+        return self._session, self._semaphore
+
+    async def close(self) -> None:
+        """
+        Close the session and its connections
+        :return: None
+        """
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+        self._session = None
+        self._semaphore = None
+        self._loop = None
+
+
+# Process-wide async session used by async_get_content
+async_session = AsyncSession()
+
+
+# Configure the process-wide async session
+def configure_async_session(concurrency: int = CONCURRENCY, pool_size: int = POOL_SIZE) -> None:
+    async_session.configure(concurrency=concurrency, pool_size=pool_size)
+
+
+# Close the process-wide async session
+async def close_async_session() -> None:
+    await async_session.close()
+
+
+# Query params as requests encodes them: lists repeat the key, other values are str()
+def encode_params(params: dict) -> list:
+    encoded = []
+    for key, value in params.items():
+        for item in (value if isinstance(value, (list, tuple)) else [value]):
+            if item is not None:
+                encoded.append((key, str(item)))
+
+    return encoded
+
+
+# Re-authenticate after a 401, or wait for the process already doing it
+def reauthenticate() -> None:
+    if not get_status_cache(wait=False):
+        update_wait_status(True)
+        try:
+            authenticate()
+        finally:
+            update_wait_status(False)
+    else:
+        # Read the token the other process saved
+        get_status_cache(wait=True)
+        token_cache.invalidate()
+
+
+# GET content from the given API endpoint without blocking the event loop, handling status errors as get_content
+async def async_get_content(url: str, params=None, headers: dict = None, count_limit: int = 3) -> AsyncContent | None:
+    if params is None:
+        params = {}
+
+    # Renew the access token in the background before it expires
+    token_refresher.start()
+
+    # Use the current access token
+    if headers is None or 'Authorization' in headers:
+        headers = with_token(headers)
+
+    session, semaphore = async_session.session()
+    query = encode_params(params)
+
+    # Generate log
+    log: str = url
+
+    # Add params if not None
+    if params:
+        log += ". Params: {}".format(params)
+
+    count = 1
+    while count <= count_limit:
+
+        # GET content
+        async with semaphore:
+            # Wait for the shared request budget
+            await rate_limiter.acquire_async()
+
+            async with session.get(url, params=query, headers=headers) as response:
+                content = AsyncContent(url=str(response.url), status_code=response.status,
+                                       headers=dict(response.headers), text=await response.text())
+        count += 1
+
+        # GET content status
+        status = content.status_code
+
+        # Status based actions
+        # Normal
+        if status == 200:
+            content_logger.debug(msg="200. SUCCESS: {}".format(log))
+            return content
+
+        # API rate limit reached
+        # Pause every process sharing the budget; the next acquire waits it out
+        elif status == 429:
+            content_logger.error(msg="429. Rate Limit: {}".format(log))
+            rate_limiter.penalize(retry_after(content.headers))
+
+        # Passed a null value
+        elif status == 400:
+            content_logger.error(msg="400. Invalid params: {}".format(log))
+            break
+
+        # Unauthorized / Invalid AuthToken header. Token is likely expired.
+        elif status == 401:
+            content_logger.error(msg="401. Invalid token: {}".format(log))
+
+            # Authentication blocks: run it off the event loop
+            await asyncio.to_thread(reauthenticate)
+            headers = with_token(headers)
+
+        # Forbidden / Access Restricted
+        elif status == 403:
+            content_logger.error(msg="403. Forbidden or Access Restricted: {}".format(log))
+            break
+
+        # Data not found for given Params
+        elif status == 404:
+            content_logger.error(msg="404. Data not found: {}".format(log))
+            break
+
+        # Server error
+        elif status == 500:
+            content_logger.error(msg="500. Server error: {}".format(log))
+            break
+
+        # Temporary problem
+        elif status == 503:
+            content_logger.error(msg="503. Temporary problem: {}".format(log))
+            break
+
+    return None
@@ -1,21 +1,20 @@
-import pickle
-import time
-from datetime import datetime
-
 import requests
 
-from .oauth import TOKEN_PATH, authenticate
+from .oauth import authenticate, token_cache
+from .rate_limit import rate_limiter, retry_after
 
 
-# Get token header
+# Get token header from the in-process token cache
 def get_token(test: bool = False):
     # Test if token has expired
     def test_token(t):
         endpoint = r'https://api.tdameritrade.com/v1/userprincipals'
+        rate_limiter.acquire()
         content = requests.get(url=endpoint, headers=t)
 
         if content.status_code == 429:
-            time.sleep(61 - datetime.now().second)
+            rate_limiter.penalize(retry_after(content.headers))
+            rate_limiter.acquire()
             content = requests.get(url=endpoint, headers=t)
 
         # User Principals JSON
@@ -27,10 +26,7 @@ def get_token(test: bool = False):
 
     # Test token
     try:
-        token_file_obj = open(TOKEN_PATH, 'rb')
-        token_saved = pickle.load(token_file_obj)
-        token_file_obj.close()
-        token_header = token_saved.get('token_header')
+        token_header = token_cache.header()
         if test:
             test_token(t=token_header)
         return token_header
@@ -42,3 +38,12 @@ def get_token(test: bool = False):
     # Token files not found
     except FileNotFoundError:
         return authenticate()
+
+
+# Caller's headers with the current access token merged in
+def with_token(headers: dict = None) -> dict | None:
+    token_header = get_token()
+    if headers is None:
+        return token_header
+
+    return {**headers, **(token_header or {})}
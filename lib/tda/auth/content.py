@@ -1,9 +1,8 @@
-import time
-
-import requests
-
-from .auth_token import get_token
-from .oauth import authenticate, get_status_cache, update_wait_status
+from .auth_token import with_token
+from .oauth import authenticate, get_status_cache, token_cache, update_wait_status
+from .rate_limit import rate_limiter, retry_after
+from .refresher import token_refresher
+from .session import get_session
 from ..logger import TDALogger
 
 
@@ -12,18 +11,28 @@ content_logger = TDALogger("content").logger
 
 
 # GET content from the given API endpoint while handling common status errors
-def get_content(url: str, params=None, headers: str = get_token(), count_limit: int = 3):
+def get_content(url: str, params=None, headers: dict = None, count_limit: int = 3):
     if params is None:
         params = {}
 
+    # Renew the access token in the background before it expires
+    token_refresher.start()
+
+    # Use the current access token: headers saved by long-lived objects may hold a token refreshed since
+    if headers is None or 'Authorization' in headers:
+        headers = with_token(headers)
+
     override_token_header = None
 
     count = 1
     while count <= count_limit:
 
-        # GET content
-        content = requests.get(url=url, params=params,
-                               headers=headers if override_token_header is None else override_token_header)
+        # Wait for the shared request budget
+        rate_limiter.acquire()
+
+        # GET content on the pooled keep-alive session
+        content = get_session().get(url=url, params=params,
+                                    headers=headers if override_token_header is None else override_token_header)
         count += 1
 
         # GET content status
@@ -44,10 +53,10 @@ def get_content(url: str, params=None, headers: str = get_token(), count_limit:
 
         else:
             # API rate limit reached
+            # Pause every process sharing the budget; the next acquire waits it out
             if status == 429:
-                wait_time = 60.125
                 content_logger.error(msg="429. Rate Limit: {}".format(log))
-                time.sleep(wait_time)
+                rate_limiter.penalize(retry_after(content.headers))
 
             # Passed a null value
             if status == 400:
@@ -65,8 +74,10 @@ def get_content(url: str, params=None, headers: str = get_token(), count_limit:
                     authenticate()
                     update_wait_status(False)
                 else:
+                    # Read the token the other process saved
                     get_status_cache(wait=True)
-                override_token_header = get_token()
+                    token_cache.invalidate()
+                override_token_header = with_token(headers)
 
             # Forbidden / Access Restricted
             elif status == 403:
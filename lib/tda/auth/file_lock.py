@@ -0,0 +1,82 @@
+# Cross-process File Lock
+import os
+import threading
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+
+class FileLock:
+    """
+    Exclusive lock shared by every thread and process through a lock file: flock on POSIX, msvcrt.locking on Windows.
+
+    Used as a context manager, it yields the lock file's descriptor so small state can be kept in the file itself.
+    The lock is not reentrant.
+    """
+
+    def __init__(self, path):
+        """
+        Initialize FileLock
+        :param path: Lock file path, created on first use
+        """
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._fd = None
+        self._pid = None
+
+    def _file(self) -> int:
+        """
+        Open the lock file once per process
+        :return: File descriptor
+        """
+        if self._fd is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o600)
+            self._pid = os.getpid()
+
+        return self._fd
+
+    def acquire(self) -> int:
+        """
+        Wait for the lock
+        :return: Lock file descriptor
+        """
+        self._lock.acquire()
+        try:
+            fd = self._file()
+
+            if os.name == 'nt':
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+
+        except BaseException:
+            self._lock.release()
+            raise
+
+        return fd
+
+    def release(self) -> None:
+        """
+        Release the lock
+        :return: None
+        """
+        try:
+            if os.name == 'nt':
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+        finally:
+            self._lock.release()
+
+    def __enter__(self) -> int:
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
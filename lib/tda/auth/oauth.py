@@ -1,6 +1,7 @@
 # TD Ameritrade API Authentication
 import os
 import pickle
+import tempfile
 import time
 import urllib.parse
 from pathlib import Path
@@ -11,6 +12,7 @@ from selenium import webdriver
 from selenium.common.exceptions import WebDriverException
 
 from config import client_id, redirect_uri, host
+from .token_cache import TokenCache
 from ..logger import TDALogger
 
 # Set up loggers
@@ -24,13 +26,41 @@ TEMP_DIR = Path.joinpath(Path(__file__).parent.parent, Path('temp/'))
 TOKEN_PATH = Path.joinpath(TEMP_DIR, 'token.pickle')
 STATUS_PATH = Path.joinpath(TEMP_DIR, 'tda_status.pickle')
 
+# Process-wide token.pickle cache
+token_cache = TokenCache(TOKEN_PATH)
+
+
+# Access token lifetime in seconds when the OAuth response does not say
+ACCESS_TOKEN_LIFETIME = 1800
+
+
+# Access token expiry in epoch seconds from an OAuth response
+def token_expiry(response: dict) -> float:
+    return time.time() + response.get('expires_in', ACCESS_TOKEN_LIFETIME)
+
+
+# Write a pickle file atomically: readers in other processes load the old or the new file, never a partial one
+def dump_pickle(obj, path) -> None:
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file_obj:
+            pickle.dump(obj, file_obj)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+# Save token.pickle and hand the token to the in-process cache
+def save_token(token_saved: dict) -> None:
+    dump_pickle(token_saved, TOKEN_PATH)
+    token_cache.set(token_saved)
+
 
 # Update status wait and time values
 def update_wait_status(condition: bool = False):
-    with open(STATUS_PATH, 'wb') as status_obj:
-        pickle.dump({"wait": condition,
-                     "time": time.time()}, status_obj)
-        status_obj.close()
+    dump_pickle({"wait": condition,
+                 "time": time.time()}, STATUS_PATH)
 
 
 # Get API status cache and wait based on status
@@ -63,14 +93,14 @@ def create_temp_files():
             TEMP_DIR.mkdir(parents=True, exist_ok=True)
 
             # Create temp .pickle files
-            with open(file_path, 'wb') as file_obj:
-                pickle.dump({}, file_obj)
-                file_obj.close()
+            dump_pickle({}, file_path)
 
             # Initiate status as False
             if file_path == STATUS_PATH:
                 update_wait_status(False)
 
+    token_cache.invalidate()
+
 
 # OAuth app
 def authenticate():
@@ -141,6 +171,7 @@ def authenticate():
         # Error handle corrupt token.pickle file
         try:
             access_token = oauth_post.json()['access_token']
+            expires_at = token_expiry(oauth_post.json())
         except KeyError:
             auth_logger.error("token.pickle file is corrupted.")
             auth_logger.info("Renaming corrupted token.pickle file.")
@@ -161,12 +192,10 @@ def authenticate():
         token_header = {'Authorization': "Bearer {}".format(access_token)}
 
         # Save token
-        with open(TOKEN_PATH, 'wb') as token_obj:
-            # Format output dict
-            token_saved.update({'token_header': token_header})
-            # Save to pickle
-            pickle.dump(token_saved, token_obj)
-            token_obj.close()
+        # Format output dict
+        token_saved.update({'token_header': token_header})
+        token_saved.update({'expires_at': expires_at})
+        save_token(token_saved)
 
         # Log
         auth_logger.info('OAuth performed using refresh token.')
@@ -190,6 +219,7 @@ def authenticate():
         # Get refresh and access token
         refresh_token = oauth_post.json()['refresh_token']
         access_token = oauth_post.json()['access_token']
+        expires_at = token_expiry(oauth_post.json())
 
         # Format access_token
         token_header = {'Authorization': "Bearer {}".format(access_token)}
@@ -203,19 +233,17 @@ def authenticate():
             token_obj.close()
 
         # Save tokens
-        with open(TOKEN_PATH, 'wb') as token_obj:
-            # Format output dict
-            token_saved.update({'token_header': token_header})
-            token_saved.update({'refresh_token': refresh_token})
-            # Save to pickle
-            pickle.dump(token_saved, token_obj)
-            token_obj.close()
+        # Format output dict
+        token_saved.update({'token_header': token_header})
+        token_saved.update({'refresh_token': refresh_token})
+        token_saved.update({'expires_at': expires_at})
+        save_token(token_saved)
 
     return token_header
 
 
 class Authenticate:
-    def __init__(self, override_mode: str = None, generate_new_refresh_token: bool = False):
+    def __init__(self, override_mode: str = None, generate_new_refresh_token: bool = False, login: bool = True):
         # User info
         self.redirect_uri = redirect_uri
         self.client_id = client_id
@@ -233,7 +261,10 @@ class Authenticate:
         else:
             self.mode = override_mode
 
-        if not self.test_token() or generate_new_refresh_token:
+        # Skip testing the token and logging in: only oauth() with a known refresh token will be used
+        if not login:
+            self.token_header = token_cache.header()
+        elif not self.test_token() or generate_new_refresh_token:
             self.token_header = self.main(mode=self.mode, force_user_auth=generate_new_refresh_token)
         else:
             self.token_header = self.read_token_file().get("token_header")
@@ -425,11 +456,11 @@ class Authenticate:
         # Post oAuth data and get token
         self.logger.debug("Posting OAuth data.")
         oauth_post = requests.post(self.oauth_url, headers=self.oauth_headers, data=oauth_payload)
-        print(oauth_post.json())
 
-        # Get refresh and access token
-        refresh_token = oauth_post.json()['refresh_token']
+        # Get refresh and access token. The refresh token grant only returns a new refresh token when requested.
+        refresh_token = oauth_post.json().get('refresh_token', refresh_token)
         access_token = oauth_post.json()['access_token']
+        expires_at = token_expiry(oauth_post.json())
 
         # Format access_token
         token_header = {'Authorization': "Bearer {}".format(access_token)}
@@ -441,15 +472,14 @@ class Authenticate:
         token_saved = self.read_token_file()
 
         # Save or Update token file
-        with open(TOKEN_PATH, 'wb') as token_obj:
-            # Format output dict
-            token_saved.update({'token_header': token_header})
-            token_saved.update({'refresh_token': refresh_token})
-
-            # Save to pickle
-            pickle.dump(token_saved, token_obj)
-
-            auth_logger.debug('Updated token.pickle file.')
+        # Format output dict
+        token_saved.update({'token_header': token_header})
+        token_saved.update({'refresh_token': refresh_token})
+        token_saved.update({'expires_at': expires_at})
+
+        # Save to pickle
+        save_token(token_saved)
+        auth_logger.debug('Updated token.pickle file.')
 
         return token_header
 
@@ -0,0 +1,165 @@
+# Cross-process Token Bucket Rate Limiter
+import asyncio
+import os
+import struct
+import time
+
+from .file_lock import FileLock
+from .oauth import TEMP_DIR
+from ..logger import TDALogger
+
+# Set up logger
+limiter_logger = TDALogger("content").logger
+
+# Shared bucket state file
+RATE_LIMIT_PATH = os.path.join(TEMP_DIR, 'rate_limit.bin')
+
+# Default budget: at most BURST + RATE requests in any PER seconds, inside TDA's 120 requests per minute
+RATE = 110
+PER = 60.0
+BURST = 10
+
+# Seconds every process pauses after a 429 without a Retry-After header
+PENALTY = 15.0
+
+# Bucket state: tokens, epoch seconds of the last update
+STATE = struct.Struct("<dd")
+
+
+class RateLimiter:
+    """
+    Token bucket shared by every process through a small locked file.
+
+    The bucket holds up to burst tokens and refills at rate tokens per `per` seconds. Each request reserves a token
+    under an exclusive file lock, so the Streamlit app, the streamer and batch scripts draw from one budget. When the
+    bucket is empty the reservation still succeeds, leaving the bucket in debt: the caller sleeps until its token
+    is due, and later callers queue behind it in reservation order.
+    """
+
+    def __init__(self, path: str = RATE_LIMIT_PATH, rate: float = RATE, per: float = PER, burst: float = BURST):
+        """
+        Initialize RateLimiter
+        :param path: Shared state file
+        :param rate: Tokens refilled every per seconds
+        :param per: Seconds
+        :param burst: Bucket size: requests allowed back to back
+        """
+        self.path = path
+        self.configure(rate=rate, per=per, burst=burst)
+
+        self._file_lock = FileLock(path)
+
+        # Counters
+        self.requests = 0
+        self.waited = 0.0
+
+    def configure(self, rate: float = RATE, per: float = PER, burst: float = BURST) -> None:
+        """
+        Set the budget. Every process sharing the file should use the same budget.
+        :param rate: Tokens refilled every per seconds
+        :param per: Seconds
+        :param burst: Bucket size
+        :return: None
+        """
+        self.rate = rate / per
+        self.burst = burst
+
+    def _update(self, update) -> float:
+        """
+        Read, update and write the bucket under the file lock
+        :param update: Function of (tokens, now) returning (new tokens, result)
+        :return: Result of update
+        """
+        with self._file_lock as fd:
+            os.lseek(fd, 0, os.SEEK_SET)
+            data = os.read(fd, STATE.size)
+            now = time.time()
+
+            if len(data) == STATE.size:
+                tokens, updated = STATE.unpack(data)
+                tokens = min(self.burst, tokens + max(now - updated, 0) * self.rate)
+            else:
+                tokens = self.burst
+
+            tokens, result = update(tokens, now)
+
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.write(fd, STATE.pack(tokens, now))
+
+        return result
+
+    def reserve(self, tokens: float = 1) -> float:
+        """
+        Take tokens from the bucket, going into debt if it is short
+        :param tokens: Tokens
+        :return: Seconds to wait before using them
+        """
+        def take(available, now):
+            available -= tokens
+            return available, max(-available / self.rate, 0.0)
+
+        wait = self._update(take)
+
+        self.requests += 1
+        self.waited += wait
+
+        return wait
+
+    def acquire(self, tokens: float = 1) -> float:
+        """
+        Wait until tokens are available
+        :param tokens: Tokens
+        :return: Seconds waited
+        """
+        wait = self.reserve(tokens)
+        if wait > 0:
+            limiter_logger.debug(f"Rate limit: waiting {wait:.3f}s")
+            time.sleep(wait)
+
+        return wait
+
+    async def acquire_async(self, tokens: float = 1) -> float:
+        """
+        Wait until tokens are available without blocking the event loop
+        :param tokens: Tokens
+        :return: Seconds waited
+        """
+        wait = self.reserve(tokens)
+        if wait > 0:
+            limiter_logger.debug(f"Rate limit: waiting {wait:.3f}s")
+            await asyncio.sleep(wait)
+
+        return wait
+
+    def penalize(self, seconds: float = PENALTY) -> None:
+        """
+        Put the bucket seconds in debt after a 429: TDA counted more requests than the bucket allowed (another client
+        or a larger budget elsewhere), so every process pauses instead of only the caller
+        :param seconds: Pause before the next request
+        :return: None
+        """
+        self._update(lambda available, now: (min(available, 0.0) - seconds * self.rate, None))
+
+    def available(self) -> float:
+        """
+        Tokens in the bucket now, negative when in debt
+        :return: Tokens
+        """
+        return self._update(lambda available, now: (available, available))
+
+
+# Process-wide limiter in front of every REST call
+rate_limiter = RateLimiter()
+
+
+# Seconds to pause from a 429 response's Retry-After header
+def retry_after(headers) -> float:
+    try:
+        return float(headers.get('Retry-After', PENALTY))
+    except (TypeError, ValueError):
+        return PENALTY
+
+
+# Configure the process-wide rate limit budget
+def configure_rate_limit(rate: float = RATE, per: float = PER, burst: float = BURST) -> None:
+    rate_limiter.configure(rate=rate, per=per, burst=burst)
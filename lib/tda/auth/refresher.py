@@ -0,0 +1,176 @@
+# Background Access Token Refresh
+import os
+import threading
+import time
+
+from .file_lock import FileLock
+from .oauth import ACCESS_TOKEN_LIFETIME, Authenticate, create_temp_files, get_status_cache, TEMP_DIR, token_cache, \
+    update_wait_status
+from ..logger import TDALogger
+
+# Set up logger
+refresher_logger = TDALogger("auth").logger
+
+# Lock file held while refreshing
+REFRESH_LOCK_PATH = os.path.join(TEMP_DIR, 'token.lock')
+
+
+class TokenRefresher:
+    """
+    Renews the access token with the refresh token in a daemon thread, margin seconds before it expires.
+
+    Processes refresh one at a time under a file lock. Each re-reads token.pickle once it holds the lock, so when
+    several processes reach the margin together the first one refreshes and the others see the new expiry and go
+    back to sleep. The tda_status wait flag is also set while refreshing, as for the 401 re-authentication in
+    get_content.
+    """
+
+    def __init__(self, margin: float = 300, retry_interval: float = 60, lock_path: str = REFRESH_LOCK_PATH):
+        """
+        Initialize TokenRefresher
+        :param margin: Seconds before expiry to refresh
+        :param retry_interval: Seconds between attempts after a failed refresh or without a token file
+        :param lock_path: Lock file shared by the processes refreshing token.pickle
+        """
+        self.margin = margin
+        self.retry_interval = retry_interval
+        self._file_lock = FileLock(lock_path)
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        # Counters
+        self.refreshes = 0
+        self.last_refresh = None
+        self.last_error = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """
+        Start the refresh thread if it is not running
+        :return: None
+        """
+        if self.running:
+            return
+
+        with self._lock:
+            if not self.running:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="TokenRefresher", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = None) -> None:
+        """
+        Stop the refresh thread
+        :param timeout: Seconds to wait for the thread to exit
+        :return: None
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def due(self) -> float | None:
+        """
+        Seconds until the next refresh
+        :return: Seconds, 0 if the token is within margin of expiring, None if the expiry is unknown
+        """
+        expires_at = token_cache.expires_at()
+        if expires_at is None:
+            return None
+
+        return max(expires_at - self.margin - time.time(), 0)
+
+    def backoff(self) -> float:
+        """
+        Seconds to sleep while the expiry is unknown: until the token would be due if it was saved with the file's
+        mtime, and at least retry_interval
+        :return: Seconds
+        """
+        try:
+            saved = os.path.getmtime(token_cache.path)
+        except OSError:
+            return self.retry_interval
+
+        return max(saved + ACCESS_TOKEN_LIFETIME - self.margin - time.time(), self.retry_interval)
+
+    def refresh(self, force: bool = True) -> dict:
+        """
+        Renew the access token
+        :param force: Refresh even if the token is not due, e.g. after another process refreshed it
+        :return: token_header
+        """
+        create_temp_files()
+
+        with self._file_lock:
+            # Another process may have refreshed while this one waited for the lock
+            token_cache.invalidate()
+            if not force and self.due() != 0:
+                return token_cache.header()
+
+            # Another process is re-authenticating: wait for it
+            if get_status_cache(wait=False):
+                get_status_cache(wait=True)
+                token_cache.invalidate()
+                return token_cache.header()
+
+            refresh_token = token_cache.get().get('refresh_token')
+            if not refresh_token:
+                raise ValueError("token.pickle has no refresh_token. User authentication required.")
+
+            update_wait_status(True)
+            try:
+                token_header = Authenticate(login=False).oauth(refresh_token=refresh_token)
+            finally:
+                update_wait_status(False)
+
+        self.refreshes += 1
+        self.last_refresh = time.time()
+        refresher_logger.info("Access token refreshed ahead of expiry.")
+
+        return token_header
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                delay = self.due()
+
+                # Token saved before its expiry was recorded, or no token yet: do not refresh blind. The next
+                # authentication records the expiry.
+                if delay is None:
+                    self._stop.wait(self.backoff())
+                    continue
+
+                # Sleep, then check the expiry again: another process may have refreshed in the meantime
+                if delay > 0:
+                    self._stop.wait(delay)
+                    continue
+
+                self.refresh(force=False)
+                self.last_error = None
+
+            except FileNotFoundError:
+                self._stop.wait(self.retry_interval)
+
+            except Exception as error:
+                self.last_error = error
+                refresher_logger.error(f"Access token refresh failed: {error}. Retrying in {self.retry_interval}s.")
+                self._stop.wait(self.retry_interval)
+
+
+# Process-wide refresher, started by the first get_content call
+token_refresher = TokenRefresher()
+
+
+# Start refreshing the access token in the background
+def start_token_refresher(margin: float = None) -> TokenRefresher:
+    if margin is not None:
+        token_refresher.margin = margin
+
+    token_refresher.start()
+
+    return token_refresher
@@ -0,0 +1,104 @@
+# Pooled Keep-Alive HTTP Session
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ..logger import TDALogger
+
+# Set up logger
+session_logger = TDALogger("content").logger
+
+# Default keep-alive connections kept per host
+POOL_SIZE = 20
+
+
+class SessionPool:
+    """
+    Keep-alive connection pool shared by every thread.
+
+    Each thread gets its own requests.Session, since a Session's cookies and settings are not thread-safe, but every
+    Session mounts the same HTTPAdapter. The adapter's urllib3 pool is thread-safe, so TCP and TLS connections to
+    api.tdameritrade.com are reused across threads instead of handshaking on every request.
+    """
+
+    def __init__(self, pool_size: int = POOL_SIZE, pool_block: bool = False, keep_alive: bool = True,
+                 gzip: bool = True):
+        """
+        Initialize SessionPool
+        :param pool_size: Connections kept open per host
+        :param pool_block: Block when every connection is in use instead of opening a temporary one
+        :param keep_alive: Keep connections open between requests
+        :param gzip: Accept gzip compressed responses
+        """
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._adapter = None
+        self._generation = 0
+
+        self.configure(pool_size=pool_size, pool_block=pool_block, keep_alive=keep_alive, gzip=gzip)
+
+    def configure(self, pool_size: int = POOL_SIZE, pool_block: bool = False, keep_alive: bool = True,
+                  gzip: bool = True) -> None:
+        """
+        Replace the connection pool. Threads switch to the new pool on their next request.
+        :param pool_size: Connections kept open per host
+        :param pool_block: Block when every connection is in use instead of opening a temporary one
+        :param keep_alive: Keep connections open between requests
+        :param gzip: Accept gzip compressed responses
+        :return: None
+        """
+        with self._lock:
+            old = self._adapter
+
+            self.pool_size = pool_size
+            self.headers = {'Connection': 'keep-alive' if keep_alive else 'close',
+                            'Accept-Encoding': 'gzip, deflate' if gzip else 'identity'}
+            self._adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=pool_block)
+            self._generation += 1
+
+        if old is not None:
+            old.close()
+
+        session_logger.debug(f"HTTP session pool: {pool_size} connections. Keep-alive: {keep_alive}. Gzip: {gzip}")
+
+    def session(self) -> requests.Session:
+        """
+        Get this thread's Session on the shared pool
+        :return: requests.Session
+        """
+        local = self._local
+        if getattr(local, 'generation', None) != self._generation:
+            with self._lock:
+                session = requests.Session()
+                session.mount('https://', self._adapter)
+                session.mount('http://', self._adapter)
+                session.headers.update(self.headers)
+                local.session, local.generation = session, self._generation
+
+        return local.session
+
+    def close(self) -> None:
+        """
+        Close every pooled connection
+        :return: None
+        """
+        with self._lock:
+            if self._adapter is not None:
+                self._adapter.close()
+            self._generation += 1
+
+
+# Process-wide session pool used by get_content
+session_pool = SessionPool()
+
+
+# Get the current thread's pooled Session
+def get_session() -> requests.Session:
+    return session_pool.session()
+
+
+# Configure the process-wide session pool
+def configure_session(pool_size: int = POOL_SIZE, pool_block: bool = False, keep_alive: bool = True,
+                      gzip: bool = True) -> None:
+    session_pool.configure(pool_size=pool_size, pool_block=pool_block, keep_alive=keep_alive, gzip=gzip)
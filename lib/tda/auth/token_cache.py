@@ -0,0 +1,107 @@
+# In-process Token Cache
+import os
+import pickle
+import threading
+import time
+
+from ..logger import TDALogger
+
+# Set up logger
+cache_logger = TDALogger("auth").logger
+
+
+class TokenCache:
+    """
+    Process-wide copy of token.pickle.
+
+    The file is unpickled once and kept in memory. The writers in this process hand the token they saved to set(),
+    so their refreshes need no read back. Writes by other processes are picked up by a coarse mtime check, made at
+    most once per check_interval seconds: the refresher renews tokens minutes before they expire, so a process may
+    keep using the previous, still valid, token until then.
+    """
+
+    def __init__(self, path, check_interval: float = 60.0):
+        """
+        Initialize TokenCache
+        :param path: token.pickle path
+        :param check_interval: Minimum seconds between mtime checks
+        """
+        self.path = path
+        self.check_interval = check_interval
+
+        self._lock = threading.Lock()
+        self._token = None
+        self._mtime = None
+        self._checked = 0.0
+
+        # Counters
+        self.loads = 0
+
+    def _load(self, mtime: int) -> dict:
+        with open(self.path, 'rb') as token_obj:
+            token = pickle.load(token_obj)
+
+        self._token, self._mtime = token, mtime
+        self.loads += 1
+        cache_logger.debug("Loaded token.pickle into the token cache.")
+
+        return token
+
+    def get(self) -> dict:
+        """
+        Get the saved token data: token_header, refresh_token and access token expiry if known
+        :return: Token dict. Raises FileNotFoundError if token.pickle is missing.
+        """
+        now = time.monotonic()
+        token = self._token
+
+        if token is not None and now - self._checked < self.check_interval:
+            return token
+
+        with self._lock:
+            mtime = os.stat(self.path).st_mtime_ns
+            self._checked = now
+
+            if self._token is None or mtime != self._mtime:
+                return self._load(mtime)
+
+            return self._token
+
+    def header(self) -> dict | None:
+        """
+        Get the access token header
+        :return: {'Authorization': 'Bearer ...'}, None if the token file has no header
+        """
+        header = self.get().get('token_header')
+        return dict(header) if header else None
+
+    def expires_at(self) -> float | None:
+        """
+        Get the access token expiry
+        :return: Epoch seconds, None if unknown
+        """
+        return self.get().get('expires_at')
+
+    def set(self, token: dict) -> None:
+        """
+        Use the token this process just wrote to token.pickle, without reading the file back
+        :param token: Token dict as saved
+        :return: None
+        """
+        with self._lock:
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                mtime = None
+
+            self._token, self._mtime, self._checked = dict(token), mtime, time.monotonic()
+
+    def invalidate(self) -> None:
+        """
+        Reload token.pickle on the next get()
+        :return: None
+        """
+        with self._lock:
+            self._token = None
+            self._mtime = None
+            self._checked = 0.0
@@ -0,0 +1,119 @@
+# Stream Message Labelling Benchmark
+# Run from project root: python -m lib.tda.benchmarks.label_message
+
+import json
+import time
+import tracemalloc
+from functools import partial
+
+from ..streamclient.client import Handler
+from ..streamclient.services import Fields
+
+# Recorded frames: QUOTE and OPTION data messages as sent by TDA
+QUOTE_FRAME = json.dumps({"data": [{"service": "QUOTE", "timestamp": 1640966400000, "command": "SUBS", "content": [
+    {"key": "AAPL", "delayed": False, "assetMainType": "EQUITY", "cusip": "037833100", "1": 177.55, "2": 177.57,
+     "3": 177.56, "4": 2, "5": 4, "8": 64062261, "9": 100, "10": 71999, "11": 71999, "49": 177.56, "50": 1640966399000,
+     "51": 1640966399000},
+    {"key": "MSFT", "delayed": False, "assetMainType": "EQUITY", "cusip": "594918104", "1": 336.3, "2": 336.35,
+     "4": 1, "5": 3, "11": 71999, "49": 336.32, "50": 1640966399000},
+    {"key": "SPY", "delayed": False, "assetMainType": "EQUITY", "cusip": "78462F103", "3": 474.96, "8": 65237425,
+     "9": 300, "10": 71999, "51": 1640966399000},
+]}]})
+
+OPTION_FRAME = json.dumps({"data": [{"service": "OPTION", "timestamp": 1640966400000, "command": "SUBS", "content": [
+    {"key": "SPY_012122C475", "delayed": False, "2": 4.5, "3": 4.56, "4": 4.52, "8": 25471, "9": 60123, "10": 14.2,
+     "20": 118, "21": 30, "29": 4.52, "32": 0.5123, "33": 0.0412, "34": -0.1876, "35": 0.3821, "36": 0.1234,
+     "39": 474.96, "41": 4.53},
+    {"key": "QQQ_012122P395", "delayed": False, "2": 5.1, "3": 5.2, "20": 45, "21": 50, "32": -0.4711, "41": 5.15},
+]}]})
+
+# Fields a handler reads from each update: Records resolve labels lazily, so labelling alone understates their cost
+READ_FIELDS = {"QUOTE": ["Bid Price", "Ask Price", "Last Price", "Quote Time"],
+               "OPTION": ["Bid Price", "Ask Price", "Delta", "Mark"]}
+
+
+def legacy_label_message(fields: dict, data: dict) -> dict:
+    """
+    Reference implementation of the dict labelling path that precompiled decoders replaced
+    """
+    output_msg = {}
+    for content in data.get("content"):
+        content_msg = {}
+        for field in content.keys():
+            if field in fields.keys():
+                content_msg.update({fields.get(field): content.get(field)})
+            else:
+                content_msg.update({field: content.get(field)})
+        output_msg.update({content.get("key"): content_msg})
+    return {data.get("service"): output_msg}
+
+
+def read_fields(label: callable, labels: list) -> callable:
+    """
+    Label a data message, then read labels from every symbol's update as a handler would
+    :param label: Function labelling one decoded data message
+    :param labels: Field labels read
+    :return: Function labelling and reading one decoded data message
+    """
+    def label_read(data):
+        msg = label(data)
+        for updates in msg.values():
+            for update in updates.values():
+                for field in labels:
+                    update.get(field)
+        return msg
+
+    return label_read
+
+
+def run(label: callable, frames: list, count: int) -> dict:
+    """
+    Decode and label count frames
+    :param label: Function labelling one decoded data message
+    :param frames: Raw frames to cycle through
+    :param count: Number of frames
+    :return: {"msgs/sec": float (decode + label), "bytes/msg": float (label only)}
+    """
+    frames = [frames[i % len(frames)] for i in range(count)]
+
+    # Throughput
+    start = time.perf_counter()
+    for frame in frames:
+        for data in json.loads(frame).get("data"):
+            label(data)
+    elapsed = time.perf_counter() - start
+
+    # Memory allocated by labelling alone: frames are decoded beforehand
+    decoded = [json.loads(frame).get("data")[0] for frame in frames]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    labelled = [label(data) for data in decoded]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del labelled
+
+    return {"msgs/sec": count / elapsed, "bytes/msg": (after - before) / count}
+
+
+def main(count: int = 50000):
+    for name, frame, fields in [("QUOTE", QUOTE_FRAME, Fields.level_one_equity),
+                                ("OPTION", OPTION_FRAME, Fields.level_one_options)]:
+        handler = Handler(print, fields)
+        legacy_label = partial(legacy_label_message, fields)
+
+        # Label only, then label and read the handler's fields
+        for mode, legacy_run, decoder_run in [
+                ("label", legacy_label, handler.label_message),
+                ("read", read_fields(legacy_label, READ_FIELDS[name]),
+                 read_fields(handler.label_message, READ_FIELDS[name]))]:
+            legacy = run(legacy_run, [frame], count)
+            decoder = run(decoder_run, [frame], count)
+
+            print(f"{name:<8} {mode:<6} legacy:  {legacy['msgs/sec']:>10,.0f} msgs/sec  "
+                  f"{legacy['bytes/msg']:>8,.0f} bytes/msg")
+            print(f"{name:<8} {mode:<6} decoder: {decoder['msgs/sec']:>10,.0f} msgs/sec  "
+                  f"{decoder['bytes/msg']:>8,.0f} bytes/msg")
+
+
+if __name__ == "__main__":
+    main()
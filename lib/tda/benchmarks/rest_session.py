@@ -0,0 +1,153 @@
+# REST Transport Benchmark: fresh connection per request vs the pooled keep-alive session
+# Run from project root: python -m lib.tda.benchmarks.rest_session
+# Needs the openssl command line tool to create a self-signed certificate for the local HTTPS stand-in.
+
+import gzip
+import json
+import multiprocessing
+import os
+import ssl
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import requests
+
+from ..auth.session import SessionPool
+
+# Option chain sized JSON body: 40 strikes of calls and puts
+CHAIN = json.dumps({"symbol": "SPY", "status": "SUCCESS",
+                    "callExpDateMap": {"2022-01-21:18": {str(400 + strike): [{"bid": 1.0, "ask": 1.1, "delta": 0.5,
+                                                                              "openInterest": 1000} for _ in range(3)]
+                                                         for strike in range(40)}}}).encode()
+
+
+class ChainHandler(BaseHTTPRequestHandler):
+    """
+    Answers every GET with the chain body, gzip compressed when accepted, over keep-alive HTTP/1.1
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = CHAIN
+        compressed = "gzip" in self.headers.get("Accept-Encoding", "")
+        if compressed:
+            body = gzip.compress(body, compresslevel=1)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if compressed:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def certificate(directory: str) -> tuple[str, str]:
+    """
+    Create a self-signed certificate for 127.0.0.1
+    :param directory: Output directory
+    :return: (certificate path, key path)
+    """
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-keyout", key, "-out", cert,
+                    "-days", "1", "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1"],
+                   check=True, capture_output=True)
+    return cert, key
+
+
+def serve(cert: str, key: str, port) -> None:
+    """
+    Run the HTTPS stand-in in its own process
+    :param cert: Certificate path
+    :param key: Key path
+    :param port: Shared value receiving the listening port
+    :return: None
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ChainHandler)
+
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+
+    port.value = server.server_address[1]
+    server.serve_forever()
+
+
+def measure(get, url: str, requests_count: int, workers: int) -> dict:
+    """
+    Time requests_count GETs
+    :param get: Function taking the url and returning a response
+    :param url: Url
+    :param requests_count: Number of requests
+    :param workers: Concurrent threads
+    :return: {"requests/sec", "p50 ms", "p99 ms"}
+    """
+    def timed(_):
+        start = time.perf_counter()
+        get(url).json()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(workers) as executor:
+        latencies = np.array(list(executor.map(timed, range(requests_count)))) * 1000
+    elapsed = time.perf_counter() - start
+
+    return {"requests/sec": requests_count / elapsed,
+            "p50 ms": float(np.percentile(latencies, 50)),
+            "p99 ms": float(np.percentile(latencies, 99))}
+
+
+def run(requests_count: int = 300, workers: int = 8) -> dict:
+    """
+    Fetch chains from a local HTTPS server with a fresh connection per request and with the pooled session
+    :param requests_count: Requests per transport
+    :param workers: Concurrent threads, as a screen fetching chains in parallel
+    :return: {transport: measure()}
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        cert, key = certificate(directory)
+
+        port = multiprocessing.Value("i", 0)
+        server = multiprocessing.Process(target=serve, args=(cert, key, port), daemon=True)
+        server.start()
+
+        while not port.value:
+            time.sleep(0.01)
+
+        url = f"https://127.0.0.1:{port.value}/v1/marketdata/chains"
+        pool = SessionPool(pool_size=workers)
+
+        try:
+            results = {
+                "requests.get": measure(lambda u: requests.get(u, verify=cert), url, requests_count, workers),
+                "pooled session": measure(lambda u: pool.session().get(u, verify=cert), url, requests_count,
+                                          workers),
+            }
+        finally:
+            pool.close()
+            server.terminate()
+
+    return results
+
+
+def main(requests_count: int = 300, workers: int = 8):
+    results = run(requests_count=requests_count, workers=workers)
+
+    for transport, result in results.items():
+        print(f"{transport:<16} {result['requests/sec']:>8,.0f} requests/sec  "
+              f"p50 {result['p50 ms']:>7.2f} ms  p99 {result['p99 ms']:>7.2f} ms")
+
+    saved = results["requests.get"]["p50 ms"] - results["pooled session"]["p50 ms"]
+    print(f"{'Saved':<16} {saved:>8.2f} ms per request (p50)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# StreamClient Throughput Benchmark against the local TDA streamer stand-in
+# Run from project root: python -m lib.tda.benchmarks.stream_throughput
+
+import asyncio
+import multiprocessing
+import time
+
+import numpy as np
+
+from ..streamclient.local_server import LocalStreamServer, LocalStreamClient
+
+# Frames per second of each service
+RATES = {"QUOTE": 200, "OPTION": 100, "LISTED_BOOK": 50, "TIMESALE_EQUITY": 200}
+
+
+def serve(rates: dict, port) -> None:
+    """
+    Run the local server in its own process so its CPU time is not charged to the client
+    :param rates: Frames per second of each service
+    :param port: Shared value receiving the listening port
+    :return: None
+    """
+    async def run():
+        server = await LocalStreamServer(rates=rates).start()
+        port.value = server.port
+        await asyncio.Event().wait()
+
+    asyncio.run(run())
+
+
+class LatencyHandler:
+    """
+    Counts entries and records server send → handler complete latency of each entry
+    """
+
+    def __init__(self, service: str):
+        self.service = service
+        self.entries = 0
+        self.latencies = []
+        self.recording = False
+
+    def __call__(self, msg):
+        for content in msg.get(self.service).values():
+            sent = content.get("sendTimeNs")
+
+            if self.recording:
+                self.entries += 1
+                if sent is not None:
+                    self.latencies.append(time.time_ns() - sent)
+
+    def reset(self):
+        self.entries = 0
+        self.latencies = []
+        self.recording = True
+
+
+async def run(symbols: int = 100, duration: float = 10, warmup: float = 1, rates: dict = None) -> dict:
+    """
+    Drive a StreamClient against a local server process
+    :param symbols: Symbols subscribed per service
+    :param duration: Measured seconds
+    :param warmup: Seconds before measuring
+    :param rates: Frames per second of each service
+    :return: {service: {"msgs/sec", "p50 ms", "p99 ms"}, "cpu us/msg": float}
+    """
+    rates = rates or RATES
+
+    port = multiprocessing.Value("i", 0)
+    server = multiprocessing.Process(target=serve, args=(rates, port), daemon=True)
+    server.start()
+
+    while not port.value:
+        await asyncio.sleep(0.01)
+
+    client = LocalStreamClient(f"ws://127.0.0.1:{port.value}/ws", auto_reconnect=False)
+
+    handlers = {service: LatencyHandler(service) for service in rates}
+    client.add_level_one_equity_handler(handlers.get("QUOTE"))
+    client.add_level_one_options_handler(handlers.get("OPTION"))
+    client.add_listed_book_handler(handlers.get("LISTED_BOOK"))
+    client.add_timesale_equity_handler(handlers.get("TIMESALE_EQUITY"))
+
+    equities = [f"EQ{i}" for i in range(symbols)]
+    options = [f"EQ{i}_012122C100" for i in range(symbols)]
+
+    try:
+        await client.login()
+        await client.subscribe([("QUOTE", equities), ("OPTION", options), ("LISTED_BOOK", equities),
+                                ("TIMESALE_EQUITY", equities)])
+
+        await asyncio.sleep(warmup)
+
+        for handler in handlers.values():
+            handler.reset()
+        cpu, start = time.process_time(), time.perf_counter()
+
+        await asyncio.sleep(duration)
+
+        cpu, elapsed = time.process_time() - cpu, time.perf_counter() - start
+        for handler in handlers.values():
+            handler.recording = False
+
+    finally:
+        # An overloaded client has a backlog of frames ahead of any LOGOUT response: close without logging out
+        await client.disconnect()
+        server.terminate()
+
+    results = {}
+    for service, handler in handlers.items():
+        latencies = np.array(handler.latencies) / 1e6 if handler.latencies else np.array([np.nan])
+        results[service] = {"msgs/sec": handler.entries / elapsed,
+                            "p50 ms": float(np.percentile(latencies, 50)),
+                            "p99 ms": float(np.percentile(latencies, 99))}
+
+    entries = sum(handler.entries for handler in handlers.values())
+    results["cpu us/msg"] = cpu / entries * 1e6 if entries else float("nan")
+
+    return results
+
+
+def main(symbols: int = 100, duration: float = 10):
+    results = asyncio.run(run(symbols=symbols, duration=duration))
+
+    cpu = results.pop("cpu us/msg")
+    for service, result in results.items():
+        print(f"{service:<16} {result['msgs/sec']:>10,.0f} msgs/sec  "
+              f"p50 {result['p50 ms']:>8.3f} ms  p99 {result['p99 ms']:>8.3f} ms")
+    print(f"{'CPU':<16} {cpu:>10.2f} us/msg")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,7 @@
 
 import pandas as pd
 
-from ..auth import get_token, get_content
+from ..auth import get_token, get_content, async_get_content
 
 
 # Equity(Stock) Data
@@ -43,6 +43,15 @@ class Equity:
         df = pd.DataFrame.from_dict(response)
         return df
 
+    # Get quote for one or more symbols without blocking the event loop
+    async def quotes_async(self):
+        endpoint = r'https://api.tdameritrade.com/v1/marketdata/quotes'
+        params = {'symbol': ','.join(self.tickers)}
+        content = await async_get_content(url=endpoint, params=params, headers=self.token)
+        response = content.json()
+        df = pd.DataFrame.from_dict(response)
+        return df
+
     # Retrieve fundamental data.
     def fundamentals(self):
         endpoint = r'https://api.tdameritrade.com/v1/instruments'
@@ -5,7 +5,7 @@ from datetime import datetime
 import pandas as pd
 import pytz
 
-from ..auth import get_token, get_content
+from ..auth import get_token, get_content, async_get_content
 
 
 # GET price history for a symbol
@@ -22,6 +22,35 @@ class PriceHistory:
                       ext: str = 'false'
                       ):
 
+        endpoint, params = self.price_history_params(period=period, period_type=period_type, frequency=frequency,
+                                                     frequency_type=frequency_type, ext=ext)
+
+        # GET data
+        content = get_content(url=endpoint, params=params, headers=self.token)
+
+        return self.candles_to_df(content.json(), frequency_type=frequency_type)
+
+    # GET price history without blocking the event loop
+    async def price_history_async(self,
+                                  period: int = 1,
+                                  period_type: str = 'year',
+                                  frequency: int = 1,
+                                  frequency_type: str = 'daily',
+                                  ext: str = 'false'
+                                  ):
+
+        endpoint, params = self.price_history_params(period=period, period_type=period_type, frequency=frequency,
+                                                     frequency_type=frequency_type, ext=ext)
+
+        # GET data
+        content = await async_get_content(url=endpoint, params=params, headers=self.token)
+
+        return self.candles_to_df(content.json(), frequency_type=frequency_type)
+
+    # Price history endpoint and params
+    def price_history_params(self, period: int, period_type: str, frequency: int, frequency_type: str,
+                             ext: str) -> tuple[str, dict]:
+
         # Check if parameters are correct:
         if period_type not in ['year', 'day', 'month', 'ytd']:
             raise ValueError("period_type invalid. Accepted valued: 'year', 'day', 'month', 'ytd'")
@@ -39,9 +68,11 @@ class PriceHistory:
         if frequency_type == 'minute':
             params.update({'needExtendedHoursData': ext})
 
-        # GET data
-        content = get_content(url=endpoint, params=params, headers=self.token)
-        response = content.json()
+        return endpoint, params
+
+    # Format price history response candles
+    @staticmethod
+    def candles_to_df(response: dict, frequency_type: str) -> pd.DataFrame:
         df = pd.json_normalize(response['candles'])
 
         # Rename datetime as unix
@@ -5,7 +5,7 @@ from datetime import datetime
 
 import pandas as pd
 
-from ..auth import get_token, get_content
+from ..auth import get_token, get_content, async_get_content
 
 
 # Get Unix Epoch time
@@ -98,6 +98,25 @@ class OptionChain:
 
         return df
 
+    # GET option chain without blocking the event loop
+    async def chain_async(self, contract_type='ALL', include_quotes=True, exp_month='ALL', option_type='S',
+                          exclude_weekly=False, option_range='ALL'):
+        endpoint = r'https://api.tdameritrade.com/v1/marketdata/chains'
+        params = {'symbol': self.ticker,
+                  'contractType': contract_type,
+                  'includeQuotes': include_quotes,
+                  'expMonth': exp_month,
+                  'optionType': option_type,
+                  'range': option_range}
+        content = await async_get_content(url=endpoint, params=params, headers=self.token)
+        response = content.json()
+
+        self.underlyingData = response['underlying']
+
+        df = self.oc_json_to_df(oc_json=response, exclude_weekly=exclude_weekly)
+
+        return df
+
     # Get best option chain near desired expiration
     def chain_best(self, dte=45, exclude_weekly=True):
         endpoint = r'https://api.tdameritrade.com/v1/marketdata/chains'
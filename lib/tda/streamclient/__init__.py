@@ -1,2 +1,4 @@
 from .client import StreamClient
+from .replay import ReplayStreamClient
+from .recorder import StreamRecorder
 from .services import Fields, QOS
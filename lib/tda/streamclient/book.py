@@ -0,0 +1,237 @@
+# Order Book Engine
+
+import numpy as np
+import pandas as pd
+
+# Price precision of level keys: TDA prices are quoted to at most 4 decimals
+PRICE_DECIMALS = 6
+
+EMPTY = np.empty(0)
+
+
+def aggregate_levels(entries: list, descending: bool) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Aggregate book levels of one side by price
+    :param entries: Wire levels: [{"0": price, "1": volume, "2": count, "3": [{"0": exchange, "1": volume, "2": seq}]}]
+    :param descending: Sort prices high to low (bids) instead of low to high (asks)
+    :return: (prices, sizes) float64 arrays sorted best first
+    """
+    if not entries:
+        return EMPTY, EMPTY
+
+    prices = np.fromiter((entry.get("0") for entry in entries), dtype=float, count=len(entries))
+    sizes = np.fromiter((entry["1"] if "1" in entry else sum(exchange.get("1", 0) for exchange in entry.get("3", ()))
+                         for entry in entries), dtype=float, count=len(entries))
+
+    # Levels of several market makers at one price are summed into one level
+    prices, index = np.unique(prices.round(PRICE_DECIMALS), return_inverse=True)
+    sizes = np.bincount(index, weights=sizes, minlength=len(prices))
+
+    if descending:
+        return prices[::-1].copy(), sizes[::-1].copy()
+    return prices, sizes
+
+
+class OrderBook:
+    """
+    Book of one symbol as sorted price and size arrays, best level first.
+
+    Top of book, microprice and imbalance are derived once per update; depth totals are O(1) lookups into
+    cumulative sizes.
+    """
+
+    __slots__ = ("symbol", "time", "bid_prices", "bid_sizes", "ask_prices", "ask_sizes", "_bid_depth", "_ask_depth",
+                 "bid", "ask", "bid_size", "ask_size", "mid", "spread", "microprice", "imbalance", "updates")
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.time = None
+        self.updates = 0
+
+        self.bid_prices, self.bid_sizes = EMPTY, EMPTY
+        self.ask_prices, self.ask_sizes = EMPTY, EMPTY
+        self._bid_depth, self._ask_depth = EMPTY, EMPTY
+        self._derive()
+
+    def update(self, content: dict) -> bool:
+        """
+        Apply a book content entry. Sides missing from the entry are kept; sides equal to the current book are
+        not recomputed.
+        :param content: {"key": symbol, "1": book time, "2": bids, "3": asks}
+        :return: True if the book changed
+        """
+        changed = False
+
+        if "2" in content:
+            prices, sizes = aggregate_levels(content.get("2"), descending=True)
+            if not (np.array_equal(prices, self.bid_prices) and np.array_equal(sizes, self.bid_sizes)):
+                self.bid_prices, self.bid_sizes, self._bid_depth = prices, sizes, np.cumsum(sizes)
+                changed = True
+
+        if "3" in content:
+            prices, sizes = aggregate_levels(content.get("3"), descending=False)
+            if not (np.array_equal(prices, self.ask_prices) and np.array_equal(sizes, self.ask_sizes)):
+                self.ask_prices, self.ask_sizes, self._ask_depth = prices, sizes, np.cumsum(sizes)
+                changed = True
+
+        self.time = content.get("1", self.time)
+        self.updates += 1
+
+        if changed:
+            self._derive()
+
+        return changed
+
+    def _derive(self) -> None:
+        """
+        Recompute top of book values
+        :return: None
+        """
+        self.bid = float(self.bid_prices[0]) if len(self.bid_prices) else np.nan
+        self.ask = float(self.ask_prices[0]) if len(self.ask_prices) else np.nan
+        self.bid_size = float(self.bid_sizes[0]) if len(self.bid_sizes) else 0.0
+        self.ask_size = float(self.ask_sizes[0]) if len(self.ask_sizes) else 0.0
+
+        self.mid = (self.bid + self.ask) / 2
+        self.spread = self.ask - self.bid
+
+        size = self.bid_size + self.ask_size
+        if size:
+            # Size weighted toward the side more likely to trade through
+            self.microprice = (self.bid * self.ask_size + self.ask * self.bid_size) / size
+            self.imbalance = (self.bid_size - self.ask_size) / size
+        else:
+            self.microprice = np.nan
+            self.imbalance = np.nan
+
+    def depth(self, levels: int) -> tuple[float, float]:
+        """
+        Total size of the best levels of each side
+        :param levels: Number of levels
+        :return: (bid size, ask size)
+        """
+        bid = float(self._bid_depth[min(levels, len(self._bid_depth)) - 1]) if len(self._bid_depth) and levels else 0.0
+        ask = float(self._ask_depth[min(levels, len(self._ask_depth)) - 1]) if len(self._ask_depth) and levels else 0.0
+        return bid, ask
+
+    def depth_imbalance(self, levels: int) -> float:
+        """
+        (bid size - ask size) / (bid size + ask size) over the best levels of each side
+        :param levels: Number of levels
+        :return: -1 to 1, nan if the book is empty
+        """
+        bid, ask = self.depth(levels)
+        return (bid - ask) / (bid + ask) if bid + ask else np.nan
+
+    def snapshot(self, levels: int = None) -> dict:
+        """
+        Top of book values and the best levels of each side
+        :param levels: Number of levels per side, None for every level
+        :return: dict
+        """
+        return {"symbol": self.symbol, "time": self.time,
+                "bid": self.bid, "ask": self.ask, "bid_size": self.bid_size, "ask_size": self.ask_size,
+                "mid": self.mid, "spread": self.spread, "microprice": self.microprice, "imbalance": self.imbalance,
+                "bids": np.column_stack((self.bid_prices[:levels], self.bid_sizes[:levels])),
+                "asks": np.column_stack((self.ask_prices[:levels], self.ask_sizes[:levels]))}
+
+
+class BookEngine:
+    """
+    Order books of every symbol of a book service (LISTED_BOOK, NASDAQ_BOOK, OPTIONS_BOOK, ...).
+
+    Book messages carry the displayed levels of each side with every market maker's quote. The engine aggregates
+    them by price into sorted arrays instead of relabelling the nested lists, so readers get top of book, depth,
+    microprice and imbalance without walking dicts.
+    """
+
+    def __init__(self, depth: int = 5):
+        """
+        Initialize BookEngine
+        :param depth: Levels per side summed for depth and depth imbalance in to_frame()
+        """
+        self.depth = depth
+
+        # {symbol: OrderBook}
+        self.books = {}
+
+    def __len__(self):
+        return len(self.books)
+
+    def __contains__(self, symbol: str):
+        return symbol in self.books
+
+    def __getitem__(self, symbol: str) -> OrderBook:
+        return self.books[symbol]
+
+    def get(self, symbol: str, default=None) -> OrderBook | None:
+        return self.books.get(symbol, default)
+
+    def add(self, symbols: str | list) -> None:
+        """
+        Add empty books for symbols
+        :param symbols: Symbol or list of symbols
+        :return: None
+        """
+        if isinstance(symbols, str):
+            symbols = [symbols]
+
+        for symbol in symbols:
+            if symbol not in self.books:
+                self.books[symbol] = OrderBook(symbol)
+
+    def remove(self, symbols: str | list) -> None:
+        """
+        Remove the books of symbols
+        :param symbols: Symbol or list of symbols
+        :return: None
+        """
+        if isinstance(symbols, str):
+            symbols = [symbols]
+
+        for symbol in symbols:
+            self.books.pop(symbol, None)
+
+    def update(self, data: dict) -> list:
+        """
+        Apply a book data message
+        :param data: Data message: {"service", "timestamp", "content": [{"key", "1": time, "2": bids, "3": asks}]}
+        :return: Symbols whose book changed
+        """
+        changed = []
+
+        for content in data.get("content", []):
+            symbol = content.get("key")
+            book = self.books.get(symbol)
+
+            if book is None:
+                book = self.books[symbol] = OrderBook(symbol)
+
+            if book.update(content):
+                changed.append(symbol)
+
+        return changed
+
+    def snapshot(self, symbol: str, levels: int = None) -> dict:
+        """
+        Snapshot of a symbol's book
+        :param symbol: Symbol
+        :param levels: Number of levels per side, None for every level
+        :return: dict
+        """
+        return self.books[symbol].snapshot(levels)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Top of book and depth of every symbol
+        :return: DataFrame indexed by symbol
+        """
+        columns = ["Time", "Bid", "Ask", "Bid Size", "Ask Size", "Mid", "Spread", "Microprice", "Imbalance",
+                   f"Bid Depth {self.depth}", f"Ask Depth {self.depth}", f"Depth Imbalance {self.depth}"]
+
+        rows = []
+        for book in self.books.values():
+            rows.append([book.time, book.bid, book.ask, book.bid_size, book.ask_size, book.mid, book.spread,
+                         book.microprice, book.imbalance, *book.depth(self.depth), book.depth_imbalance(self.depth)])
+
+        return pd.DataFrame(rows, index=pd.Index(list(self.books), name="Symbol"), columns=columns, dtype=float)
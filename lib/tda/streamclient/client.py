@@ -1,18 +1,32 @@
 # TDA Stream Client
 
 import asyncio
-import copy
-import inspect
 import json
-from collections import defaultdict
+import random
+import time
+from collections import defaultdict, deque
 from datetime import datetime
+from types import MappingProxyType
 from urllib.parse import urlencode
 
+import numpy as np
+import pandas as pd
 import websockets
 from websockets.extensions.permessage_deflate import ClientPerMessageDeflateFactory
 
 from config import account_id
-from .services import Fields, QOS
+from .book import BookEngine
+from .decoders import get_decoder
+from .dispatch import HandlerQueue, BatchQueue, BLOCK, INLINE
+from .metrics import StreamMetrics, SERVER_TO_RECEIVE, RECEIVE_TO_DECODE, DECODE_TO_LABEL, LABEL_TO_HANDLER
+from .quote_store import QuoteStore
+from .recorder import StreamRecorder
+from .services import Fields, QOS, SERVICE_FIELDS
+from .subscriptions import SubscriptionManager, DEFAULT_CONSUMER
+from .trades import TradeClassifier
+from .volatility import RealizedCovariance
+from .volume_profile import VolumeProfiler
+from .watchdog import LoopWatchdog
 from ..account import Account
 from ..logger import TDALogger
 
@@ -60,13 +74,63 @@ class Handler:
     Basic Stream Handler
     """
 
-    def __init__(self, func: callable, fields: dict | Fields):
+    def __init__(self,
+                 func: callable,
+                 fields: dict | Fields,
+                 consumes: list = None,
+                 queue_size: int = 1000,
+                 overflow: str = BLOCK,
+                 executor: str = INLINE,
+                 callback: callable = None,
+                 batch_size: int = 100):
+        """
+        Stream Handler constructor
+        :param func: Handler function
+        :param fields: Fields table of the service
+        :param consumes: Field labels or numbers the handler reads. None for every field. Subscribed by the service's
+                         next update_symbols or update_fields.
+        :param queue_size: Maximum queued messages (symbols for conflate) before the overflow policy applies
+        :param overflow: Overflow policy of the handler queue: block, drop_oldest or conflate
+        :param executor: Where the handler runs: inline (event loop), thread or process (see HandlerQueue)
+        :param callback: Called on the event loop with the handler's return value
+        :param batch_size: Maximum messages per process handler call
+        """
         self.func = func
         self.fields = fields
+        self.decoder = get_decoder(fields)
+        self.consumes = None if consumes is None else frozenset(self.decoder.field_numbers(consumes))
+        self.queue = HandlerQueue(self, maxsize=queue_size, overflow=overflow,
+                                  executor=executor, callback=callback, batch_size=batch_size)
 
     def __call__(self, *args, **kwargs):
         return self.func(*args, **kwargs)
 
+    def __eq__(self, other):
+        return type(self) is type(other) and self.func == other.func
+
+    def __hash__(self):
+        return hash((type(self), self.func))
+
+    @property
+    def label_key(self) -> tuple:
+        """
+        Handlers with the same label_key produce identical labelled messages
+        :return: (Handler class, fields table id)
+        """
+        return type(self), id(self.fields)
+
+    def labelled_view(self, msg: list | dict) -> MappingProxyType:
+        """
+        Label the message and wrap it in a read-only view that can be shared between handlers
+        :param msg: Stream Message
+        :return: Read-only {service: {symbol: Record}}
+        """
+        def read_only(value):
+            return MappingProxyType(value) if isinstance(value, dict) else value
+
+        return MappingProxyType({service: MappingProxyType({key: read_only(content) for key, content in data.items()})
+                                 for service, data in self.label_message(msg).items()})
+
     def label_message(self, msg: list | dict):
         """
         Label the message with the fields
@@ -84,8 +148,7 @@ class Handler:
         content = {"key":"SPY","1":1640307600996,"2":[],"3":[]}
         """
 
-        msg = copy.deepcopy(msg)
-
+        # msg is not modified, so it is not copied
         if isinstance(msg, dict):
             msg = [msg]
 
@@ -93,24 +156,12 @@ class Handler:
         for data in msg:
             service = data.get("service")
 
+            # Content entries are decoded into Records: {label: value} mappings over the content dict
             if 'content' in data:
-                output_msg = {}
-
-                for content in data.get("content"):
-                    content_msg = {}
-
-                    for field in content.keys():
-                        if field in self.fields.keys():
-                            content_msg.update({self.fields.get(field): content.get(field)})
-
-                        else:
-                            content_msg.update({field: content.get(field)})
-
-                    output_msg.update({content.get("key"): content_msg})
-                output.update({service: output_msg})
+                output.update({service: self.decoder.records(data)})
 
             else:
-                return output.update({service: data})
+                output.update({service: data})
 
         return output
 
@@ -181,7 +232,7 @@ class BookHandler(Handler):
         bid_fields = Fields.book_bids
         ask_fields = Fields.book_asks
         exchange_fields = Fields.book_exchange
-        bids_asks = ["bids", "asks"]
+        bids_asks = ["Bids", "Asks"]
 
         # Get data from message
         data = msg.get(service)
@@ -197,8 +248,8 @@ class BookHandler(Handler):
             ticker_data = data.get(ticker)
             ticker_data_keys = ticker_data.keys()
 
-            # Initialize new_ticker_data
-            new_ticker_data = {}
+            # Initialize new_ticker_data with the top-level fields: key, Time, sendTimeNs
+            new_ticker_data = {field: ticker_data.get(field) for field in ticker_data_keys if field not in bids_asks}
 
             # Bid/Ask
             for bid_ask in bids_asks:
@@ -236,20 +287,108 @@ class BookHandler(Handler):
                                 new_bid_ask.update({bid_ask_fields.get(field): bid_ask_exchange})
 
                             # Update other fields
-                            elif field in self.fields.keys():
+                            elif field in bid_ask_fields.keys():
                                 new_bid_ask.update({bid_ask_fields.get(field): bid_ask_data.get(field)})
                             else:
                                 new_bid_ask.update({field: bid_ask_data.get(field)})
 
                         new_bid_data.append(new_bid_ask)
 
-                    new_ticker_data.update({ticker: new_bid_data})
+                    new_ticker_data.update({bid_ask: new_bid_data})
 
             new_data.update({ticker: new_ticker_data})
 
         return {service: new_data}
 
 
+class BatchHandler(Handler):
+    """
+    Handler receiving micro-batches of numeric updates as columns instead of one labelled message per frame.
+
+    Every interval seconds, or once max_messages content entries are pending, the handler is called with
+    msg = one row per updated field:
+        symbol (object), field (label, object), value (float64), timestamp (frame timestamp in ms, int64)
+    as a DataFrame (output="frame") or a dict of NumPy arrays (output="arrays").
+    Text, boolean and nested fields are left out. Repeated labels are suffixed with their field number.
+    """
+
+    def __init__(self,
+                 func: callable,
+                 fields: dict | Fields,
+                 consumes: list = None,
+                 interval: float = 0.05,
+                 max_messages: int = 1000,
+                 output: str = "frame",
+                 queue_size: int = 10,
+                 overflow: str = BLOCK,
+                 **options):
+        """
+        BatchHandler constructor
+        :param func: Handler function
+        :param fields: Fields table of the service
+        :param consumes: Field labels or numbers in the batches. None for every field.
+        :param interval: Seconds between batches
+        :param max_messages: Pending content entries that trigger a batch before interval
+        :param output: frame or arrays
+        :param queue_size: Maximum ready batches
+        :param overflow: block or drop_oldest
+        :param options: HandlerQueue options: executor, callback, batch_size
+        """
+        if output not in ("frame", "arrays"):
+            raise ValueError(f"output must be frame or arrays. Got: {output}")
+
+        super().__init__(func, fields, consumes)
+        self.output = output
+        self.queue = BatchQueue(self, interval=interval, max_messages=max_messages, maxsize=queue_size,
+                                overflow=overflow, **options)
+
+        # {wire key: column label} of the batched fields
+        labels = {}
+        for wire_key, label in zip(self.decoder.wire_keys, self.decoder.names):
+            if self.consumes is None or int(wire_key) in self.consumes:
+                labels[wire_key] = label if label not in labels.values() else f"{label} ({wire_key})"
+        self.labels = labels
+
+    def labelled_view(self, msg: list | dict) -> dict:
+        """
+        Batches are built from the raw data message
+        :param msg: Data message
+        :return: msg
+        """
+        return msg
+
+    def columns(self, frames: list) -> pd.DataFrame | dict:
+        """
+        Convert data messages to columns
+        :param frames: Data messages
+        :return: DataFrame or {"symbol", "field", "value", "timestamp": np.ndarray}
+        """
+        labels = self.labels
+        symbols, fields, values, timestamps = [], [], [], []
+
+        for data in frames:
+            timestamp = data.get("timestamp") or 0
+
+            for content in data.get("content", ()):
+                symbol = content.get("key")
+
+                for wire_key, value in content.items():
+                    label = labels.get(wire_key)
+
+                    if label is not None and type(value) in (int, float):
+                        symbols.append(symbol)
+                        fields.append(label)
+                        values.append(value)
+                        timestamps.append(timestamp)
+
+        columns = {"symbol": np.array(symbols, dtype=object),
+                   "field": np.array(fields, dtype=object),
+                   "value": np.array(values, dtype=np.float64),
+                   "timestamp": np.array(timestamps, dtype=np.int64)}
+
+        return pd.DataFrame(columns, copy=False) if self.output == "frame" else columns
+
+
 class StreamClient:
     """
     TDA Websocket Stream Client
@@ -303,9 +442,17 @@ class StreamClient:
 
     """
 
-    def __init__(self):
+    def __init__(self,
+                 auto_reconnect: bool = True,
+                 reconnect_attempts: int = 10,
+                 reconnect_delay: float = 0.5,
+                 reconnect_max_delay: float = 30):
         """
         Initialize Stream Client
+        :param auto_reconnect: Reconnect and replay subscriptions when the socket drops
+        :param reconnect_attempts: Maximum reconnect attempts per drop
+        :param reconnect_delay: Base backoff delay in seconds, doubled every attempt and jittered
+        :param reconnect_max_delay: Maximum backoff delay in seconds
         """
         self.logger = TDALogger(logger_name="StreamClient").logger
 
@@ -313,25 +460,81 @@ class StreamClient:
         self._account_id = account_id
 
         # Stream Client Variables
-        self.userPrincipals = Account().user_principals().copy()[0]
-        self._accounts = self.userPrincipals.loc["accounts"][0]
-        self._streamer_url = self.userPrincipals.loc["streamerInfo.streamerSocketUrl"]
-        self._streamer_key = self.userPrincipals.loc["streamerSubscriptionKeys.keys"][0]['key']
-        self._streamer_appid = self.userPrincipals.loc["streamerInfo.appId"]
-        self._token = self.userPrincipals.loc["streamerInfo.token"]
+        self._load_user_principals()
 
         # Stream Handlers
         self.handlers = defaultdict(list)
 
+        # Level One last-value stores
+        self.quote_stores = {
+            "QUOTE": QuoteStore(Fields.level_one_equity),
+            "OPTION": QuoteStore(Fields.level_one_options),
+            "LEVELONE_FUTURES": QuoteStore(Fields.level_one_futures),
+            "LEVELONE_FUTURES_OPTIONS": QuoteStore(Fields.level_one_futures),
+        }
+
+        # Order book engines
+        self.book_engines = {service: BookEngine() for service in
+                             ("LISTED_BOOK", "NASDAQ_BOOK", "OPTIONS_BOOK", "FUTURES_BOOK", "FUTURES_OPTIONS_BOOK")}
+
+        # Streaming analytics updated in message order: {service: [objects with update(data)]}
+        self.analytics = defaultdict(list)
+
         # Async Variables
         self._lock = asyncio.Lock()
+        self._reader_task = None
+        self._message_event = asyncio.Event()
 
         # Request Variables
         self._request_id = 0
+        self._responses = {}
 
         # Web Socket Object
         self.Socket = None
         self._logged_in = False
+        self._closing = False
+
+        # Active subscriptions, also replayed after reconnecting: {service: SubscriptionManager}
+        self.subscriptions = {}
+        self._qos_level = None
+
+        # Reconnect Variables
+        self.auto_reconnect = auto_reconnect
+        self.reconnect_attempts = reconnect_attempts
+        self.reconnect_delay = reconnect_delay
+        self.reconnect_max_delay = reconnect_max_delay
+        self._reconnect_task = None
+        self._dropped_at = None
+
+        # Reconnect metrics. reconnect_to_first_tick: seconds from socket drop to first data after replay
+        self.reconnect_metrics = {"reconnects": 0, "reconnect_to_first_tick": deque(maxlen=100)}
+
+        # Raw frame recorder
+        self.recorder = None
+
+        # Latency histograms per service and stage
+        self.metrics = StreamMetrics()
+        self._metrics_task = None
+
+        # Async iterator consumer ids
+        self._stream_id = 0
+
+        # Handler runs (start ns, end ns, handler name, executor) and event loop lag watchdog
+        self.handler_runs = deque(maxlen=10000)
+        self.watchdog = None
+
+    def _load_user_principals(self):
+        """
+        Get streamer credentials from User Principals
+        :return: None
+        """
+        self.userPrincipals = Account().user_principals().copy()[0]
+        self._accounts = self.userPrincipals.loc["accounts"][0]
+        self._streamer_url = self.userPrincipals.loc["streamerInfo.streamerSocketUrl"]
+        self._ws_url = f'wss://{str(self._streamer_url)}/ws'
+        self._streamer_key = self.userPrincipals.loc["streamerSubscriptionKeys.keys"][0]['key']
+        self._streamer_appid = self.userPrincipals.loc["streamerInfo.appId"]
+        self._token = self.userPrincipals.loc["streamerInfo.token"]
 
     async def connect(self):
         """
@@ -341,15 +544,11 @@ class StreamClient:
         self.logger.info("Connecting to server")
 
         if self.Socket is None or "socket" not in client_socket:
-            # Generate URL
-            # ws_url = r"wss://streamer-ws.tdameritrade.com/ws"
-            ws_url = f'wss://{str(self._streamer_url)}/ws'
-
             # Define websocket connect args
             websocket_connect_args = {"extensions": [ClientPerMessageDeflateFactory()]}
 
-            # Connect to server with SSL
-            socket = await websockets.connect(ws_url, **websocket_connect_args)
+            # Connect to server with SSL: wss://streamer-ws.tdameritrade.com/ws
+            socket = await websockets.connect(self._ws_url, **websocket_connect_args)
 
             # Store socket
             self.Socket = socket
@@ -361,6 +560,9 @@ class StreamClient:
             self.logger.info("Already connected to server")
             self.Socket = socket
 
+        # Start the reader that owns Socket.recv()
+        self._start_reader()
+
         return self.Socket
 
     async def disconnect(self):
@@ -368,12 +570,32 @@ class StreamClient:
         Disconnect from server
         :return: None
         """
+        self._closing = True
+
+        reconnect = self._reconnect_task
+        if reconnect is not None and not reconnect.done() and reconnect is not asyncio.current_task():
+            reconnect.cancel()
+
         if self.Socket is not None:
             self.logger.info("Disconnecting from server")
             await self.Socket.close()
+            client_socket.pop("socket", None)
         else:
             self.logger.info("Not connected to server")
 
+        # Stop the reader unless it is the caller (ADMIN notify); it exits on the closed socket instead
+        reader = self._reader_task
+        if reader is not None and not reader.done() and reader is not asyncio.current_task():
+            reader.cancel()
+
+        self._fail_pending(ConnectionError("Disconnected from server"))
+
+        if self.recorder is not None:
+            self.recorder.flush()
+
+        self.stop_metrics_dump()
+        self.stop_watchdog()
+
     async def send(self, msg) -> None:
         """
         Send message to server
@@ -382,7 +604,8 @@ class StreamClient:
         """
 
         self.logger.debug(f"Sending message: {msg}")
-        await self.Socket.send(json.dumps(msg))
+        async with self._lock:
+            await self.Socket.send(json.dumps(msg))
 
     async def receive(self):
         """
@@ -394,6 +617,26 @@ class StreamClient:
         # print(msg)
         return msg
 
+    def start_recording(self, directory: str, **options) -> StreamRecorder:
+        """
+        Record every raw frame received from server with its receive timestamp
+        :param directory: Segment directory
+        :param options: StreamRecorder options
+        :return: StreamRecorder
+        """
+        self.stop_recording()
+        self.recorder = StreamRecorder(directory, **options)
+        return self.recorder
+
+    def stop_recording(self) -> None:
+        """
+        Stop recording and close the current segment
+        :return: None
+        """
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
     def _make_request(self,
                       service: str,
                       command: str,
@@ -419,59 +662,250 @@ class StreamClient:
 
         return request, request_id
 
-    async def await_response(self,
-                             request_id: int | str,
-                             service: str,
-                             command: str) -> dict | bool:
+    def _expect_response(self, request_id: int | str) -> asyncio.Future:
         """
-        Await response from server
+        Register a future to be resolved by the reader when the response for request_id arrives.
+        Must be called before the request is sent so that a fast response is not missed.
         :param request_id: Request ID
+        :return: Future resolved with the response dict
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._responses[str(request_id)] = future
+        return future
+
+    def _fail_pending(self, err: Exception) -> None:
+        """
+        Fail every request still waiting on a response
+        :param err: Exception to set on the pending futures
+        :return: None
+        """
+        responses, self._responses = self._responses, {}
+        for future in responses.values():
+            if not future.done():
+                future.set_exception(err)
+
+    def _start_reader(self) -> None:
+        """
+        Start the background reader task if it is not already running
+        :return: None
+        """
+        if self._reader_task is None or self._reader_task.done():
+            self._reader_task = asyncio.ensure_future(self._reader())
+
+    async def _reader(self):
+        """
+        Background reader: the only coroutine that calls receive().
+        Routes response frames to the request futures and data/notify frames to the handlers.
+        """
+        try:
+            while True:
+                msg = await self.receive()
+                received, start = time.time_ns(), time.perf_counter_ns()
+
+                if self.recorder is not None:
+                    self.recorder.record(msg, received)
+
+                # Parse message string to json dict
+                msg = JSONDecode.decode(msg)
+                decoded_at = time.perf_counter_ns()
+
+                await self._route_message(msg, received=received, decode_time=decoded_at - start,
+                                          decoded_at=decoded_at)
+
+                # Wake up handle_message() waiters
+                event, self._message_event = self._message_event, asyncio.Event()
+                event.set()
+
+        except websockets.ConnectionClosed as err:
+            self._fail_pending(ConnectionError(f"Socket closed: {err}"))
+
+            if self._should_reconnect():
+                self.logger.warning(f"Socket closed: {err}. Reconnecting")
+                self._start_reconnect()
+                return
+
+            # Logout/disconnect closed the socket
+            if self._closing:
+                self.logger.info("Stream reader stopped")
+                return
+
+            self.logger.warning(f"Stream reader stopped. Socket closed: {err}")
+            raise
+
+    def _should_reconnect(self) -> bool:
+        """
+        Reconnect only unexpected drops with subscriptions to replay
+        :return: bool
+        """
+        return self.auto_reconnect and not self._closing and any(self.subscriptions.values())
+
+    def _start_reconnect(self) -> None:
+        """
+        Start the reconnect task if it is not already running
+        :return: None
+        """
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._dropped_at = time.perf_counter()
+            self._reconnect_task = asyncio.ensure_future(self._reconnect())
+
+    async def _reconnect(self):
+        """
+        Reconnect with jittered exponential backoff, login again and replay every subscription
+        :return: None
+        """
+        for attempt in range(self.reconnect_attempts):
+            delay = min(self.reconnect_max_delay, self.reconnect_delay * 2 ** attempt) * random.uniform(0.5, 1)
+            self.logger.info(f"Reconnect attempt {attempt + 1}/{self.reconnect_attempts} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+            try:
+                # Drop the old socket and refresh the streamer token
+                self.Socket = None
+                client_socket.pop("socket", None)
+                await asyncio.get_running_loop().run_in_executor(None, self._load_user_principals)
+
+                if not await self.login():
+                    raise ConnectionError("Login failed")
+
+                await self.replay_subscriptions()
+
+            except (OSError, ConnectionError, websockets.WebSocketException) as err:
+                self.logger.error(f"Reconnect attempt {attempt + 1} FAILED: {err}")
+                continue
+
+            self.reconnect_metrics["reconnects"] += 1
+            self.logger.info("Reconnect SUCCESS")
+            return
+
+        self.logger.error(f"Reconnect FAILED after {self.reconnect_attempts} attempts")
+        raise ConnectionError(f"Reconnect failed after {self.reconnect_attempts} attempts")
+
+    async def replay_subscriptions(self):
+        """
+        Re-send QOS and every active subscription in one batched frame
+        :return: None
+        """
+        requests = []
+
+        if self._qos_level is not None:
+            requests.append(self._make_request(service="ADMIN", command="QOS",
+                                               params={"qoslevel": self._qos_level})[0])
+
+        for service, subscription in self.subscriptions.items():
+            if not subscription:
+                continue
+
+            # Account activity is keyed by the streamer subscription key, which may have changed
+            keys = [str(self._streamer_key)] if service == "ACCT_ACTIVITY" else subscription.keys
+
+            params = {"keys": ",".join(keys)}
+            if subscription.fields is not None:
+                params.update({"fields": subscription.fields})
+
+            requests.append(self._make_request(service=service, command="SUBS", params=params)[0])
+
+        if not requests:
+            return
+
+        self.logger.info(f"Replaying {len(requests)} requests")
+        for response in await self.send_requests(requests):
+            if response.get("content", {}).get("code") != 0:
+                self.logger.error(f"Replay FAILED. Response: {response}")
+
+    def subscription(self, service: str) -> SubscriptionManager:
+        """
+        Get the subscription manager of a service
         :param service: Service
-        :param command: Command
-        :return: Response
+        :return: SubscriptionManager
         """
+        manager = self.subscriptions.get(service)
+        if manager is None:
+            manager = self.subscriptions[service] = SubscriptionManager(service)
+        return manager
 
-        # Await response
-        while True:
-            responses = await self.receive()
+    def _track_subscription(self, service: str, command: str, symbols: list, fields: str = None) -> None:
+        """
+        Track active subscriptions after a successful raw request
+        :param service: Service
+        :param command: SUBS, ADD or UNSUBS
+        :param symbols: List of Symbols
+        :param fields: Fields string
+        :return: None
+        """
+        manager = self.subscription(service)
+        previous = manager.keys
 
-            # Parse responses string to json dict
-            responses = JSONDecode.decode(responses)
+        manager.track(command=command, symbols=symbols, fields=fields)
 
-            # Check if response is for this request
-            if "response" in responses.keys():
-                for response in responses.get("response"):
-                    if response.get("requestid") == str(request_id):
-                        if response.get("service") == service and response.get("command") == command:
-                            return response.get("content")
-                        else:
-                            self.logger.warning(f"Received unexpected response: {response}")
-                            return False
+        self._sync_quote_store(service, previous)
 
-    async def handle_message(self):
+    def _sync_quote_store(self, service: str, previous: list) -> None:
         """
-        Handle message from server
+        Add and remove QuoteStore rows to match the subscribed symbols
+        :param service: Service
+        :param previous: Symbols subscribed before the change
+        :return: None
         """
-        async with self._lock:
-            msg = await self.receive()
+        store = self.quote_stores.get(service, self.book_engines.get(service))
+        if store is None:
+            return
+
+        keys = self.subscription(service).refcounts
+        store.remove([symbol for symbol in previous if symbol not in keys])
+        store.add(list(keys))
+
+    async def _route_message(self,
+                             msg: dict,
+                             received: int = None,
+                             decode_time: int = None,
+                             decoded_at: int = None):
+        """
+        Route a decoded message from server
+        :param msg: Decoded message
+        :param received: time.time_ns() when the frame was received
+        :param decode_time: JSON decode duration in ns
+        :param decoded_at: time.perf_counter_ns() after decoding
+        :return: None
+        """
+        if "response" in msg.keys():
+            for response in msg.get("response"):
+                future = self._responses.pop(str(response.get("requestid")), None)
 
-        # Parse response string to json dict
-        msg = JSONDecode.decode(msg)
+                if future is None:
+                    self.logger.debug(f"Received response with no pending request: {response}")
+                elif not future.done():
+                    future.set_result(response)
 
         if "data" in msg.keys():
+            # First data after reconnecting
+            if self._dropped_at is not None:
+                gap = time.perf_counter() - self._dropped_at
+                self._dropped_at = None
+                self.reconnect_metrics.get("reconnect_to_first_tick").append(gap)
+                self.logger.info(f"First data {gap:.3f}s after socket drop")
+
             for data in msg.get("data"):
+                service = data.get("service")
 
-                if data.get("service") in self.handlers.keys():
-                    for handler in self.handlers.get(data.get("service")):
-                        # Label Message
-                        labelled_data = handler.label_message(data)
+                if received is not None:
+                    self.metrics.record(service, SERVER_TO_RECEIVE, received - data.get("timestamp", 0) * 1_000_000)
+                    self.metrics.record(service, RECEIVE_TO_DECODE, decode_time)
 
-                        # Handle Message
-                        h = handler(msg=labelled_data)
+                # Merge level one deltas and book levels before handlers run so they can read the latest values
+                store = self.quote_stores.get(service, self.book_engines.get(service))
+                if store is not None:
+                    try:
+                        store.update(data)
+                    except Exception as error:
+                        self.logger.exception(f"{service} {type(store).__name__} update failed: {error}")
 
-                        # Schedule Message if awaitable
-                        if inspect.isawaitable(h):
-                            asyncio.ensure_future(h)
+                for analytics in self.analytics.get(service, ()):
+                    try:
+                        analytics.update(data)
+                    except Exception as error:
+                        self.logger.exception(f"{service} analytics {type(analytics).__name__} failed: {error}")
+
+                await self._dispatch(service, data, decoded_at)
 
         if "notify" in msg.keys():
             for data in msg.get("notify"):
@@ -480,39 +914,130 @@ class StreamClient:
                 if "heartbeat" in data.keys():
                     continue
 
-                # Stream is Stopped
+                # Stream is Stopped: close the socket and let the reader reconnect, or disconnect
                 elif data.get("service") == "ADMIN":
                     self.logger.warning(f"Socket closed by TDA API. msg: {data.get('content')}")
-                    await self.disconnect()
                     self._logged_in = False
 
+                    if self._should_reconnect():
+                        await self.Socket.close()
+                    else:
+                        await self.disconnect()
+
                 else:
-                    for handler in self.handlers.get(data.get("service")):
-                        # Label Message
-                        data = handler.label_message(data)
+                    await self._dispatch(data.get("service"), data)
+
+    async def _dispatch(self, service: str, data: dict, decoded_at: int = None):
+        """
+        Label data once and queue the shared read-only view to every handler registered for its service.
+        Each handler runs in its own worker task; blocking queues pause the reader when full.
+        :param service: Service
+        :param data: Data or notify message
+        :param decoded_at: time.perf_counter_ns() after decoding, to record decode → label latency
+        :return: None
+        """
+        labelled = {}
+
+        for handler in self.handlers.get(service, []):
+            # Label Message once per labeller (handler class and fields table)
+            labelled_data = labelled.get(handler.label_key)
+            if labelled_data is None:
+                labelled_data = labelled[handler.label_key] = (handler.labelled_view(data), time.perf_counter_ns())
 
-                        # Handle Message
-                        h = handler(data)
+                if decoded_at is not None:
+                    self.metrics.record(service, DECODE_TO_LABEL, labelled_data[1] - decoded_at)
 
-                        # Schedule Message if awaitable
-                        if inspect.isawaitable(h):
-                            asyncio.ensure_future(h)
+            # Queue Message
+            await handler.queue.put(*labelled_data)
+
+    async def await_response(self,
+                             request_id: int | str,
+                             service: str,
+                             command: str) -> dict | bool:
+        """
+        Await response from server
+        :param request_id: Request ID
+        :param service: Service
+        :param command: Command
+        :return: Response
+        """
+
+        # Future registered before the request was sent, or register one now
+        future = self._responses.get(str(request_id))
+        if future is None:
+            future = self._expect_response(request_id)
+
+        self._start_reader()
+        response = await future
+
+        # Check if response is for this request
+        if response.get("service") == service and response.get("command") == command:
+            return response.get("content")
+        else:
+            self.logger.warning(f"Received unexpected response: {response}")
+            return False
+
+    async def handle_message(self):
+        """
+        Wait until the reader has handled the next message from server.
+        The reader owns the socket, so any number of coroutines can loop on this without racing.
+        Waits through reconnects. Raises ConnectionError once the client logged out or disconnected.
+        """
+        while True:
+            # Wait for reconnect to finish. Raises if it gave up.
+            if self._reconnect_task is not None and not self._reconnect_task.done():
+                await asyncio.shield(self._reconnect_task)
+
+            if self._closing:
+                raise ConnectionError("Stream closed")
+
+            self._start_reader()
+            reader = self._reader_task
+
+            waiter = asyncio.ensure_future(self._message_event.wait())
+            await asyncio.wait([waiter, reader], return_when=asyncio.FIRST_COMPLETED)
+
+            if waiter.done():
+                return
+
+            # Reader stopped: wait for reconnect or surface its exception (e.g. ConnectionClosed)
+            waiter.cancel()
+            if self._reconnect_task is not None and not self._reconnect_task.done():
+                continue
+            if reader.cancelled():
+                raise ConnectionError("Stream reader stopped")
+            reader.result()
+            return
 
     async def service_request(self,
                               service: str,
                               command: str,
                               symbols: list = None,
-                              fields: int = None):
+                              fields: int = None,
+                              consumer: str = DEFAULT_CONSUMER):
 
         """
-        Send service request to server
+        Send service request to server.
+        SUBS and UNSUBS update consumer's symbols and only send the ADD/UNSUBS deltas (see update_symbols).
         :param service: Service
         :param command: Command
         :param symbols: List of Symbols
         :param fields:  Largest fields int
+        :param consumer: Consumer of the symbols
         :return:
         """
 
+        if command == "SUBS":
+            return await self.update_symbols(service=service, symbols=symbols, consumer=consumer,
+                                             fields=self.projected_fields(service) or fields)
+
+        elif command == "UNSUBS":
+            manager = self.subscription(service)
+            async with manager.lock:
+                current = manager.consumers.get(consumer, set())
+                return await self._update_symbols(service=service, consumer=consumer,
+                                                  symbols=[symbol for symbol in current if symbol not in symbols])
+
         # Build params keys:    Comma seperated string of symbols
         parameters = {'keys': ','.join(symbols)}
 
@@ -527,20 +1052,212 @@ class StreamClient:
             params=parameters)
 
         # Send request
-        async with self._lock:
-            await self.send({'requests': [request]})
-            response = await self.await_response(request_id=request_id, service=service, command=command)
+        self._expect_response(request_id)
+        await self.send({'requests': [request]})
+        response = await self.await_response(request_id=request_id, service=service, command=command)
+
+        if isinstance(response, dict) and response.get("code") == 0:
+            self._track_subscription(service=service, command=command, symbols=symbols,
+                                     fields=parameters.get("fields"))
 
         return response
 
+    async def update_symbols(self,
+                             service: str,
+                             symbols: list,
+                             fields: int | list | str = None,
+                             consumer: str = DEFAULT_CONSUMER) -> dict:
+        """
+        Set the symbols a consumer wants from a service and send only the ADD and UNSUBS deltas.
+        Symbols are reference counted across consumers: a symbol is unsubscribed when no consumer wants it anymore.
+        :param service: Service
+        :param symbols: Desired symbols of consumer. Empty list releases the consumer.
+        :param fields: Largest field int, list of field ints or fields string. Widens the subscribed fields.
+                       None subscribes the handlers' projection, resubscribing in the same frame if it changed.
+        :param consumer: Consumer of the symbols
+        :return: Response content
+        """
+        async with self.subscription(service).lock:
+            return await self._update_symbols(service, symbols, fields, consumer)
+
+    async def _update_symbols(self,
+                              service: str,
+                              symbols: list,
+                              fields: int | list | str = None,
+                              consumer: str = DEFAULT_CONSUMER) -> dict:
+        """
+        update_symbols with the service's subscription lock held
+        """
+
+        # Convert symbols to list if str
+        if isinstance(symbols, str):
+            symbols = [symbols]
+
+        manager = self.subscription(service)
+        previous = manager.keys
+
+        # Fields are widened to the union with the subscribed fields, never narrowed under other consumers
+        if fields is None:
+            fields = self.projected_fields(service) or self._fields_string(service, None)
+        elif manager and manager.fields is not None:
+            fields = self._fields_string(service, manager.fields.split(",") +
+                                         self._fields_string(service, fields).split(","))
+        else:
+            fields = self._fields_string(service, fields)
+
+        add, remove = manager.diff(consumer, symbols)
+
+        # Build requests
+        requests = []
+        if manager and fields != manager.fields:
+            # Field set changed: resubscribe every symbol once
+            keys = [symbol for symbol in previous if symbol not in remove] + add
+            remove = []
+            if keys:
+                requests.append(self._make_request(service=service, command="SUBS",
+                                                   params={"keys": ",".join(keys), "fields": fields})[0])
+            else:
+                remove = previous
+
+        elif add:
+            requests.append(self._make_request(service=service, command="ADD" if manager else "SUBS",
+                                               params={"keys": ",".join(add), "fields": fields})[0])
+
+        if remove:
+            requests.append(self._make_request(service=service, command="UNSUBS",
+                                               params={"keys": ",".join(remove)})[0])
+
+        # Nothing to send
+        if not requests:
+            manager.commit(consumer, symbols)
+            return {"code": 0, "msg": "No change"}
+
+        # Send deltas in one frame
+        responses = await self.send_requests(requests)
+        content = {}
+
+        for response in responses:
+            content = response.get("content", {})
+            if response.get("service") != service or content.get("code") != 0:
+                self.logger.error(f"{service} update FAILED. Consumer: {consumer}. Response: {response}")
+                return content
+
+        manager.commit(consumer, symbols)
+        manager.fields = fields if manager else None
+        self._sync_quote_store(service, previous)
+
+        self.logger.info(f"{service} update SUCCESS. Consumer: {consumer}. Added: {add}. Removed: {remove}.")
+
+        return content
+
+    @staticmethod
+    def _fields_string(service: str, fields: int | list | str = None) -> str:
+        """
+        Build fields string
+        :param service: Service
+        :param fields: Largest field int, list of field ints, fields string or None for every field of the service
+        :return: Comma seperated string of sorted field ints
+        """
+        if isinstance(fields, str):
+            fields = fields.split(",")
+
+        if fields is None:
+            fields = range(len(SERVICE_FIELDS.get(service)))
+        elif isinstance(fields, int):
+            fields = range(0, fields + 1)
+
+        return ",".join(map(str, sorted(set(map(int, fields)))))
+
+    async def subscribe(self, plan: list, command: str = "SUBS") -> dict:
+        """
+        Send a subscription plan for several services in one frame and await all acknowledgements together
+        :param plan: List of (service, symbols) or (service, symbols, fields) entries.
+                     fields: largest field int, list of field ints, or None for every field of the service.
+                     Entries for the same service are merged.
+        :param command: SUBS, ADD or UNSUBS
+        :return: {service: response content}
+        """
+
+        # Merge entries by service
+        merged = {}
+        for entry in plan:
+            service, symbols = entry[0], entry[1]
+            fields = entry[2] if len(entry) > 2 else None
+
+            # Convert symbols to list if str
+            if isinstance(symbols, str):
+                symbols = [symbols]
+
+            # Convert fields to a set of field ints
+            fields = set(map(int, self._fields_string(service, fields).split(",")))
+
+            entry_symbols, entry_fields = merged.setdefault(service, ({}, set()))
+            entry_symbols.update(dict.fromkeys(symbols))
+            entry_fields.update(fields)
+
+        # Build requests
+        requests = []
+        for service, (symbols, fields) in merged.items():
+            parameters = {"keys": ",".join(symbols)}
+
+            # UNSUBS only needs keys
+            if command != "UNSUBS":
+                parameters.update({"fields": ",".join(map(str, sorted(fields)))})
+
+            requests.append(self._make_request(service=service, command=command, params=parameters)[0])
+
+        if not requests:
+            return {}
+
+        # Send one frame, await all responses
+        responses = await self.send_requests(requests)
+
+        output = {}
+        for request, response in zip(requests, responses):
+            service = request.get("service")
+            parameters = request.get("parameters")
+            content = response.get("content", {})
+            symbols = list(merged.get(service)[0])
+
+            if response.get("service") == service and content.get("code") == 0:
+                self._track_subscription(service=service, command=command, symbols=symbols,
+                                         fields=parameters.get("fields"))
+                self.logger.info(f"{service} {command} SUCCESS. Symbols: {symbols}. msg: {content.get('msg')}")
+            else:
+                self.logger.error(f"{service} {command} FAILED. Symbols: {symbols}. Response: {response}")
+
+            output.update({service: content})
+
+        return output
+
+    async def unsubscribe(self, plan: list) -> dict:
+        """
+        Unsubscribe from several services in one frame
+        :param plan: List of (service, symbols) entries
+        :return: {service: response content}
+        """
+        return await self.subscribe(plan=plan, command="UNSUBS")
+
+    async def send_requests(self, requests: list) -> list:
+        """
+        Send requests in a single frame and await all their responses
+        :param requests: Requests built with _make_request
+        :return: Responses in request order
+        """
+        futures = [self._expect_response(request.get("requestid")) for request in requests]
+        await self.send({'requests': requests})
+
+        return list(await asyncio.gather(*futures))
+
     # Login after connecting
-    async def login(self):
+    async def login(self) -> bool:
         """
         Login to server
-        :return: Socket
+        :return: True if login succeeded
         """
 
         self._logged_in = True
+        self._closing = False
 
         # Connect to ws server
         await self.connect()
@@ -594,29 +1311,34 @@ class StreamClient:
         request, request_id = self._make_request(service="ADMIN", command="LOGIN", params=request_params)
 
         # Send and Wait for Response
-        async with self._lock:
-            self.logger.info("Sending login request")
-            await self.send({'requests': [request]})
-            response = await self.await_response(request_id=request_id, service="ADMIN", command="LOGIN")
+        self.logger.info("Sending login request")
+        self._expect_response(request_id)
+        await self.send({'requests': [request]})
+        response = await self.await_response(request_id=request_id, service="ADMIN", command="LOGIN")
 
         if isinstance(response, dict) and response.get("code") == 0:
             self.logger.info(f"Login successful. msg: {response.get('msg')}")
+            return True
         else:
             self.logger.error(f"Login failed. Response: {response}")
+            return False
 
     # Logout and disconnect
     async def logout(self, disconnect: bool = True):
         service = "ADMIN"
         command = "LOGOUT"
 
+        # Logging out is not a drop: do not reconnect
+        self._closing = True
+
         if self._logged_in:
             request, request_id = self._make_request(service=service, command=command, params={})
 
             # Send and Wait for Response
-            async with self._lock:
-                self.logger.info("Sending Logout request")
-                await self.send({'requests': [request]})
-                response = await self.await_response(request_id=request_id, service=service, command=command)
+            self.logger.info("Sending Logout request")
+            self._expect_response(request_id)
+            await self.send({'requests': [request]})
+            response = await self.await_response(request_id=request_id, service=service, command=command)
 
             if response.get("code") == 0:
                 self.logger.info(f"Logout SUCCESS. msg: {response.get('msg')}")
@@ -630,6 +1352,245 @@ class StreamClient:
         if disconnect:
             await self.disconnect()
 
+    def _add_handler(self, service: str, handler: Handler) -> None:
+        """
+        Register handler. Its fields join the handlers' projection, subscribed by the next update_symbols or
+        update_fields of the service.
+        :param service: Service
+        :param handler: Handler
+        :return: None
+        """
+        handler.queue.histogram = self.metrics.histogram(service, LABEL_TO_HANDLER)
+        handler.queue.runs = self.handler_runs
+        self.handlers[service].append(handler)
+
+    def _remove_handler(self, service: str, handler: Handler) -> None:
+        """
+        Remove handler. The projection narrows to the remaining handlers' fields on the next update_symbols or
+        update_fields of the service.
+        :param service: Service
+        :param handler: Handler
+        :return: None
+        """
+        handlers = self.handlers[service]
+        handlers.pop(handlers.index(handler)).queue.stop()
+
+    def add_batch_handler(self, service: str, handler: callable, fields: list = None, **options) -> None:
+        """
+        Register a handler called with columnar micro-batches of the service's numeric updates
+        :param service: Service, e.g. QUOTE, OPTION, TIMESALE_EQUITY
+        :param handler: Handler function called with msg=batch
+        :param fields: Field labels or numbers in the batches. None for every field.
+        :param options: BatchHandler options: interval, max_messages, output, queue_size, overflow, executor, ...
+        :return: None
+        """
+        self._add_handler(service, BatchHandler(handler, SERVICE_FIELDS[service], fields, **options))
+
+    def remove_batch_handler(self, service: str, handler: callable) -> None:
+        self._remove_handler(service, BatchHandler(handler, SERVICE_FIELDS[service]))
+
+    def handler_stats(self) -> dict:
+        """
+        Queue depth, counters and profile (calls, total/mean/max runtime, exceptions) of every handler
+        :return: {service: [HandlerQueue.stats()]}
+        """
+        return {service: [handler.queue.stats() for handler in handlers]
+                for service, handlers in self.handlers.items() if handlers}
+
+    def latency_stats(self, service: str = None) -> dict:
+        """
+        Latency percentiles in ms of every stage: server_to_receive, receive_to_decode, decode_to_label and
+        label_to_handler
+        :param service: Service, None for every service
+        :return: {service: {stage: {"count", "mean", "min", "p50", "p90", "p99", "p99.9", "max"}}}
+        """
+        return self.metrics.summary(service)
+
+    def start_metrics_dump(self, interval: float = 60, path: str = None, reset: bool = False) -> None:
+        """
+        Periodically dump latency stats to the log, or as JSON lines to path
+        :param interval: Seconds between dumps
+        :param path: JSON lines file. None to log.
+        :param reset: Reset the histograms after each dump
+        :return: None
+        """
+        self.stop_metrics_dump()
+
+        async def dump():
+            while True:
+                await asyncio.sleep(interval)
+                stats = self.metrics.dump(path, reset=reset)
+                if path is None:
+                    self.logger.info(f"Stream latency ms: {json.dumps(stats.get('latency'))}")
+
+        self._metrics_task = asyncio.ensure_future(dump())
+
+    def stop_metrics_dump(self) -> None:
+        """
+        Stop dumping latency stats
+        :return: None
+        """
+        if self._metrics_task is not None:
+            self._metrics_task.cancel()
+            self._metrics_task = None
+
+    def start_watchdog(self, interval: float = 0.1, threshold: float = 0.1) -> LoopWatchdog:
+        """
+        Watch event loop lag and log the handlers that ran during stalls
+        :param interval: Seconds between checks
+        :param threshold: Lag in seconds logged as a stall
+        :return: LoopWatchdog
+        """
+        self.stop_watchdog()
+        self.watchdog = LoopWatchdog(self.handler_runs, interval=interval, threshold=threshold)
+        self.watchdog.start()
+        return self.watchdog
+
+    def stop_watchdog(self) -> None:
+        """
+        Stop the event loop lag watchdog
+        :return: None
+        """
+        if self.watchdog is not None:
+            self.watchdog.stop()
+
+    def projected_fields(self, service: str) -> str | None:
+        """
+        Union of the fields consumed by the service's handlers
+        :param service: Service
+        :return: Fields string, or None if a handler consumes every field or there are no handlers
+        """
+        handlers = self.handlers.get(service)
+
+        if not handlers or any(handler.consumes is None for handler in handlers):
+            return None
+
+        # Field 0 (symbol) is always subscribed
+        fields = {0}
+        for handler in handlers:
+            fields.update(handler.consumes)
+
+        return self._fields_string(service, fields)
+
+    async def update_fields(self, service: str, fields: int | list | str = None) -> dict:
+        """
+        Resubscribe every symbol of a service with new fields
+        :param service: Service
+        :param fields: Largest field int, list of field ints or fields string. None for the handlers' projection.
+        :return: Response content
+        """
+        manager = self.subscription(service)
+
+        async with manager.lock:
+            return await self._update_fields(service, fields)
+
+    async def _update_fields(self, service: str, fields: int | list | str = None) -> dict:
+        """
+        update_fields with the service's subscription lock held
+        """
+        manager = self.subscription(service)
+
+        if fields is None:
+            fields = self.projected_fields(service) or self._fields_string(service, None)
+        else:
+            fields = self._fields_string(service, fields)
+
+        if not manager or fields == manager.fields:
+            return {"code": 0, "msg": "No change"}
+
+        request, request_id = self._make_request(service=service, command="SUBS",
+                                                 params={"keys": ",".join(manager.keys), "fields": fields})
+
+        response = (await self.send_requests([request]))[0]
+        content = response.get("content", {})
+
+        if content.get("code") == 0:
+            manager.fields = fields
+            self.logger.info(f"{service} fields update SUCCESS. Fields: {fields}")
+        else:
+            self.logger.error(f"{service} fields update FAILED. Response: {response}")
+
+        return content
+
+    def quote_store(self, service: str = "QUOTE") -> QuoteStore:
+        """
+        Get the last-value store of a level one service
+        :param service: QUOTE, OPTION, LEVELONE_FUTURES or LEVELONE_FUTURES_OPTIONS
+        :return: QuoteStore
+        """
+        return self.quote_stores[service]
+
+    def book_engine(self, service: str = "LISTED_BOOK") -> BookEngine:
+        """
+        Get the order books of a book service
+        :param service: LISTED_BOOK, NASDAQ_BOOK, OPTIONS_BOOK, FUTURES_BOOK or FUTURES_OPTIONS_BOOK
+        :return: BookEngine
+        """
+        return self.book_engines[service]
+
+    def add_analytics(self, service: str, analytics) -> None:
+        """
+        Update analytics with every data message of service, in message order and before the handlers run
+        :param service: Service
+        :param analytics: Object with an update(data) method taking the raw data message
+        :return: None
+        """
+        if analytics not in self.analytics[service]:
+            self.analytics[service].append(analytics)
+
+    def remove_analytics(self, service: str, analytics) -> None:
+        """
+        Stop updating analytics
+        :param service: Service
+        :param analytics: Analytics added with add_analytics
+        :return: None
+        """
+        if analytics in self.analytics.get(service, []):
+            self.analytics[service].remove(analytics)
+
+    def trade_classifier(self, service: str = "TIMESALE_EQUITY", **options) -> TradeClassifier:
+        """
+        Classify the prints of a TIMESALE service as buys and sells against its level one quotes
+        :param service: TIMESALE_EQUITY, TIMESALE_FUTURES or TIMESALE_OPTIONS. Subscribe the matching level one
+            service (QUOTE, LEVELONE_FUTURES or OPTION) for the quote rule; without quotes the tick rule is used.
+        :param options: TradeClassifier options: max_quote_age, bar_interval, bar_volume, bar_ticks, on_trade, on_bar
+        :return: TradeClassifier, updated until removed with remove_analytics
+        """
+        quotes = {"TIMESALE_EQUITY": "QUOTE", "TIMESALE_FUTURES": "LEVELONE_FUTURES",
+                  "TIMESALE_OPTIONS": "OPTION"}.get(service)
+
+        classifier = TradeClassifier(self.quote_stores.get(quotes), **options)
+        self.add_analytics(service, classifier)
+
+        return classifier
+
+    def volume_profiler(self, service: str = "TIMESALE_EQUITY", **options) -> VolumeProfiler:
+        """
+        Build volume at price, VWAP, POC and value area of the prints of a TIMESALE service
+        :param service: TIMESALE_EQUITY, TIMESALE_FUTURES or TIMESALE_OPTIONS
+        :param options: VolumeProfiler options: tick_size, window, resolution, value_area
+        :return: VolumeProfiler, updated until removed with remove_analytics
+        """
+        profiler = VolumeProfiler(**options)
+        self.add_analytics(service, profiler)
+
+        return profiler
+
+    def realized_covariance(self, service: str = "QUOTE", **options) -> RealizedCovariance:
+        """
+        Estimate realized volatility, covariance, beta and correlation from the marks of a level one service
+        :param service: QUOTE, OPTION, LEVELONE_FUTURES or LEVELONE_FUTURES_OPTIONS. The Mark field must be subscribed.
+        :param options: RealizedCovariance options: interval, method, halflife, benchmark, capacity
+        :return: RealizedCovariance, updated until removed with remove_analytics
+        """
+        options.setdefault("field", {"QUOTE": "49", "OPTION": "41", "LEVELONE_FUTURES": "24",
+                                     "LEVELONE_FUTURES_OPTIONS": "24"}.get(service))
+
+        estimator = RealizedCovariance(**options)
+        self.add_analytics(service, estimator)
+
+        return estimator
+
     ####################################################################################################################
     # ACCT_ACTIVITY
     async def account_activity_sub(self):
@@ -657,11 +1618,12 @@ class StreamClient:
             ]
         }
 
-        async with self._lock:
-            await self.send(request)
-            response = await self.await_response(request_id, service, command)
+        self._expect_response(request_id)
+        await self.send(request)
+        response = await self.await_response(request_id, service, command)
 
         if response.get("code") == 0:
+            self._track_subscription(service, command, [str(self._streamer_key)], "0,1,2,3")
             self.logger.info(f"Account Activity Subscription SUCCESS. msg: {response.get('msg')}")
         else:
             self.logger.error(f"Account Activity Subscription FAILED. Response: {response}")
@@ -691,20 +1653,21 @@ class StreamClient:
             ]
         }
 
-        async with self._lock:
-            await self.send(request)
-            response = await self.await_response(request_id, service, command)
+        self._expect_response(request_id)
+        await self.send(request)
+        response = await self.await_response(request_id, service, command)
 
         if response.get("code") == 0:
+            self._track_subscription(service, command, [str(self._streamer_key)])
             self.logger.info(f"Account Activity Unsubscription SUCCESS. msg: {response.get('msg')}")
         else:
             self.logger.error(f"Account Activity Unsubscription FAILED. Response: {response}")
 
-    def add_account_activity_handler(self, handler: callable):
-        self.handlers["ACCT_ACTIVITY"].append(Handler(handler, Fields.account_activity))
+    def add_account_activity_handler(self, handler: callable, fields: list = None, **options):
+        self._add_handler("ACCT_ACTIVITY", Handler(handler, Fields.account_activity, fields, **options))
 
     def remove_account_activity_handler(self, handler: callable):
-        self.handlers["ACCT_ACTIVITY"].remove(Handler(handler, Fields.account_activity))
+        self._remove_handler("ACCT_ACTIVITY", Handler(handler, Fields.account_activity))
 
     # -------------------------------------------------------------------------------------------------------------------
 
@@ -728,12 +1691,13 @@ class StreamClient:
         request, request_id = self._make_request(service=service, command=command, params=params)
 
         # Send and Wait for Response
-        async with self._lock:
-            self.logger.info("Sending QOS update request")
-            await self.send({'requests': [request]})
-            response = await self.await_response(request_id=request_id, service=service, command=command)
+        self.logger.info("Sending QOS update request")
+        self._expect_response(request_id)
+        await self.send({'requests': [request]})
+        response = await self.await_response(request_id=request_id, service=service, command=command)
 
         if response.get("code") == 0:
+            self._qos_level = level
             self.logger.info(f"QOS update SUCCESS. Updated to: {level}. msg: {response.get('msg')}")
         else:
             self.logger.error(f"QOS update FAILED. Response: {response}")
@@ -793,11 +1757,11 @@ class StreamClient:
             self.logger.error(f"L1 Equity Unsubscription FAILED."
                               f"Symbols: {symbols}. Response: {response}")
 
-    def add_level_one_equity_handler(self, handler: callable):
-        self.handlers["QUOTE"].append(Handler(handler, Fields.level_one_equity))
+    def add_level_one_equity_handler(self, handler: callable, fields: list = None, **options):
+        self._add_handler("QUOTE", Handler(handler, Fields.level_one_equity, fields, **options))
 
     def remove_level_one_equity_handler(self, handler: callable):
-        self.handlers["QUOTE"].remove(Handler(handler, Fields.level_one_equity))
+        self._remove_handler("QUOTE", Handler(handler, Fields.level_one_equity))
 
     # ------------------------------------------------------------------------------------------------------------------
     # OPTION
@@ -846,11 +1810,11 @@ class StreamClient:
             self.logger.error(f"L1 Options Unsubscription FAILED."
                               f"Symbols: {symbols}. Response: {response}")
 
-    def add_level_one_options_handler(self, handler: callable):
-        self.handlers["OPTION"].append(Handler(handler, Fields.level_one_options))
+    def add_level_one_options_handler(self, handler: callable, fields: list = None, **options):
+        self._add_handler("OPTION", Handler(handler, Fields.level_one_options, fields, **options))
 
     def remove_level_one_options_handler(self, handler: callable):
-        self.handlers["OPTION"].remove(Handler(handler, Fields.level_one_options))
+        self._remove_handler("OPTION", Handler(handler, Fields.level_one_options))
 
     # ------------------------------------------------------------------------------------------------------------------
     # LEVELONE_FUTURES
@@ -899,11 +1863,11 @@ class StreamClient:
             self.logger.error(f"L1 Futures Unsubscription FAILED."
                               f"Symbols: {symbols}. Response: {response}")
 
-    def add_level_one_futures_handler(self, handler: callable):
-        self.handlers["LEVELONE_FUTURES"].append(Handler(handler, Fields.level_one_futures))
+    def add_level_one_futures_handler(self, handler: callable, fields: list = None, **options):
+        self._add_handler("LEVELONE_FUTURES", Handler(handler, Fields.level_one_futures, fields, **options))
 
     def remove_level_one_futures_handler(self, handler: callable):
-        self.handlers["LEVELONE_FUTURES"].remove(Handler(handler, Fields.level_one_futures))
+        self._remove_handler("LEVELONE_FUTURES", Handler(handler, Fields.level_one_futures))
 
     # ------------------------------------------------------------------------------------------------------------------
     # LEVELONE_FUTURES_OPTIONS
@@ -954,11 +1918,11 @@ class StreamClient:
             self.logger.error(f"L1 Futures Options Unsubscription FAILED."
                               f"Symbols: {symbols}. Response: {response}")
 
-    def add_level_one_futures_options_handler(self, handler: callable):
-        self.handlers["LEVELONE_FUTURES_OPTIONS"].append(Handler(handler, Fields.level_one_futures))
+    def add_level_one_futures_options_handler(self, handler: callable, fields: list = None, **options):
+        self._add_handler("LEVELONE_FUTURES_OPTIONS", Handler(handler, Fields.level_one_futures, fields, **options))
 
     def remove_level_one_futures_options_handler(self, handler: callable):
-        self.handlers["LEVELONE_FUTURES_OPTIONS"].remove(Handler(handler, Fields.level_one_futures))
+        self._remove_handler("LEVELONE_FUTURES_OPTIONS", Handler(handler, Fields.level_one_futures))
 
     ####################################################################################################################
 
@@ -1016,11 +1980,11 @@ class StreamClient:
             self.logger.error(f"Listed Book Unsubscription FAILED."
                               f"Symbols: {symbols}. Response: {response}")
 
-    def add_listed_book_handler(self, handler: callable):
-        self.handlers["LISTED_BOOK"].append(BookHandler(handler, Fields.book))
+    def add_listed_book_handler(self, handler: callable, fields: list = None, **options):
+        self._add_handler("LISTED_BOOK", BookHandler(handler, Fields.book, fields, **options))
 
     def remove_listed_book_handler(self, handler: callable):
-        self.handlers["LISTED_BOOK"].remove(BookHandler(handler, Fields.book))
+        self._remove_handler("LISTED_BOOK", BookHandler(handler, Fields.book))
 
     # ------------------------------------------------------------------------------------------------------------------
     # NASDAQ_BOOK
@@ -1076,11 +2040,11 @@ class StreamClient:
             self.logger.error(f"NASDAQ Book Unsubscription FAILED."
                               f"Symbols: {symbols}. Response: {response}")
 
-    def add_nasdaq_book_handler(self, handler: callable):
-        self.handlers["NASDAQ_BOOK"].append(BookHandler(handler, Fields.book))
+    def add_nasdaq_book_handler(self, handler: callable, fields: list = None, **options):
+        self._add_handler("NASDAQ_BOOK", BookHandler(handler, Fields.book, fields, **options))
 
     def remove_nasdaq_book_handler(self, handler: callable):
-        self.handlers["NASDAQ_BOOK"].remove(BookHandler(handler, Fields.book))
+        self._remove_handler("NASDAQ_BOOK", BookHandler(handler, Fields.book))
 
     # ------------------------------------------------------------------------------------------------------------------
     # OPTIONS_BOOK
@@ -1135,11 +2099,11 @@ class StreamClient:
             self.logger.error(f"Options Book Unsubscription FAILED."
                               f"Symbols: {symbols}. Response: {response}")
 
-    def add_options_book_handler(self, handler: callable):
-        self.handlers["OPTIONS_BOOK"].append(BookHandler(handler, Fields.book))
+    def add_options_book_handler(self, handler: callable, fields: list = None, **options):
+        self._add_handler("OPTIONS_BOOK", BookHandler(handler, Fields.book, fields, **options))
 
     def remove_options_book_handler(self, handler: callable):
-        self.handlers["OPTIONS_BOOK"].remove(BookHandler(handler, Fields.book))
+        self._remove_handler("OPTIONS_BOOK", BookHandler(handler, Fields.book))
 
     # ------------------------------------------------------------------------------------------------------------------
     # FUTURES_BOOK
@@ -1195,11 +2159,11 @@ class StreamClient:
             self.logger.error(f"Futures Book Unsubscription FAILED."
                               f"Symbols: {symbols}. Response: {response}")
 
-    def add_futures_book_handler(self, handler: callable):
-        self.handlers["FUTURES_BOOK"].append(BookHandler(handler, Fields.book))
+    def add_futures_book_handler(self, handler: callable, fields: list = None, **options):
+        self._add_handler("FUTURES_BOOK", BookHandler(handler, Fields.book, fields, **options))
 
     def remove_futures_book_handler(self, handler: callable):
-        self.handlers["FUTURES_BOOK"].remove(BookHandler(handler, Fields.book))
+        self._remove_handler("FUTURES_BOOK", BookHandler(handler, Fields.book))
 
     # ------------------------------------------------------------------------------------------------------------------
     # FUTURES_OPTIONS_BOOK
@@ -1255,11 +2219,11 @@ class StreamClient:
             self.logger.error(f"Futures Options Book Unsubscription FAILED."
                               f"Symbols: {symbols}. Response: {response}")
 
-    def add_futures_options_book_handler(self, handler: callable):
-        self.handlers["FUTURES_OPTIONS_BOOK"].append(BookHandler(handler, Fields.book))
+    def add_futures_options_book_handler(self, handler: callable, fields: list = None, **options):
+        self._add_handler("FUTURES_OPTIONS_BOOK", BookHandler(handler, Fields.book, fields, **options))
 
     def remove_futures_options_book_handler(self, handler: callable):
-        self.handlers["FUTURES_OPTIONS_BOOK"].remove(BookHandler(handler, Fields.book))
+        self._remove_handler("FUTURES_OPTIONS_BOOK", BookHandler(handler, Fields.book))
 
     ####################################################################################################################
 
@@ -1317,11 +2281,11 @@ class StreamClient:
             self.logger.error(f"Equity TimeSale Unsubscription FAILED."
                               f"Symbols: {symbols}. Response: {response}")
 
-    def add_timesale_equity_handler(self, handler: callable):
-        self.handlers["TIMESALE_EQUITY"].append(Handler(handler, Fields.timesale))
+    def add_timesale_equity_handler(self, handler: callable, fields: list = None, **options):
+        self._add_handler("TIMESALE_EQUITY", Handler(handler, Fields.timesale, fields, **options))
 
     def remove_timesale_equity_handler(self, handler: callable):
-        self.handlers["TIMESALE_EQUITY"].remove(Handler(handler, Fields.timesale))
+        self._remove_handler("TIMESALE_EQUITY", Handler(handler, Fields.timesale))
 
     # ------------------------------------------------------------------------------------------------------------------
     # TIMESALE_OPTIONS
@@ -1377,11 +2341,11 @@ class StreamClient:
             self.logger.error(f"Options TimeSale Unsubscription FAILED."
                               f"Symbols: {symbols}. Response: {response}")
 
-    def add_timesale_options_handler(self, handler: callable):
-        self.handlers["TIMESALE_OPTIONS"].append(Handler(handler, Fields.timesale))
+    def add_timesale_options_handler(self, handler: callable, fields: list = None, **options):
+        self._add_handler("TIMESALE_OPTIONS", Handler(handler, Fields.timesale, fields, **options))
 
     def remove_timesale_options_handler(self, handler: callable):
-        self.handlers["TIMESALE_OPTIONS"].remove(Handler(handler, Fields.timesale))
+        self._remove_handler("TIMESALE_OPTIONS", Handler(handler, Fields.timesale))
 
     # ------------------------------------------------------------------------------------------------------------------
     # TIMESALE_FUTURES
@@ -1437,11 +2401,11 @@ class StreamClient:
             self.logger.error(f"Futures TimeSale Unsubscription FAILED."
                               f"Symbols: {symbols}. Response: {response}")
 
-    def add_timesale_futures_handler(self, handler: callable):
-        self.handlers["TIMESALE_FUTURES"].append(Handler(handler, Fields.timesale))
+    def add_timesale_futures_handler(self, handler: callable, fields: list = None, **options):
+        self._add_handler("TIMESALE_FUTURES", Handler(handler, Fields.timesale, fields, **options))
 
     def remove_timesale_futures_handler(self, handler: callable):
-        self.handlers["TIMESALE_FUTURES"].remove(Handler(handler, Fields.timesale))
+        self._remove_handler("TIMESALE_FUTURES", Handler(handler, Fields.timesale))
 
     ####################################################################################################################
 
@@ -1495,10 +2459,109 @@ class StreamClient:
         else:
             self.logger.error(f"News Headline Unsubscription FAILED. Response: {response}")
 
-    def add_news_headline_handler(self, handler: callable):
-        self.handlers["NEWS_HEADLINE"].append(Handler(handler, Fields.news_headline))
+    def add_news_headline_handler(self, handler: callable, fields: list = None, **options):
+        self._add_handler("NEWS_HEADLINE", Handler(handler, Fields.news_headline, fields, **options))
 
     def remove_news_headline_handler(self, handler: callable):
-        self.handlers["NEWS_HEADLINE"].remove(Handler(handler, Fields.news_headline))
+        self._remove_handler("NEWS_HEADLINE", Handler(handler, Fields.news_headline))
 
     ####################################################################################################################
+
+    # Async Iterators
+    async def stream(self,
+                     service: str,
+                     symbols: str | list,
+                     fields: list = None,
+                     queue_size: int = 1000,
+                     overflow: str = BLOCK,
+                     handler_class: type = Handler):
+        """
+        Iterate over the updates of symbols from a service:
+            async for tick in client.stream("QUOTE", ["AAPL", "MSFT"]):
+                print(tick.key, tick.get("Last Price"))
+
+        The symbols are subscribed for this iterator when iteration starts and released when it is closed, by break,
+        exception or aclose(). Other consumers of the same symbols are not affected.
+        Updates wait in a bounded queue until the iterator takes them, following the overflow policy when it is full.
+        :param service: Service
+        :param symbols: Symbol or list of symbols
+        :param fields: Field labels or numbers read by the consumer. None for every field.
+        :param queue_size: Maximum queued messages (symbols for conflate)
+        :param overflow: block, drop_oldest or conflate
+        :param handler_class: Handler labelling the updates, e.g. BookHandler
+        :return: Async generator of Records: {label: value} with the symbol in .key
+        """
+        if isinstance(symbols, str):
+            symbols = [symbols]
+        wanted = set(symbols)
+
+        self._stream_id += 1
+        consumer = f"stream-{self._stream_id}-{service}"
+
+        handler = handler_class(consumer, SERVICE_FIELDS[service], fields)
+        handler.queue = HandlerQueue(handler, maxsize=queue_size, overflow=overflow, pull=True)
+
+        if not self._logged_in:
+            await self.login()
+
+        manager = self.subscription(service)
+
+        try:
+            # Register and subscribe together: the handler's fields go out in the same SUBS as its symbols
+            async with manager.lock:
+                self._add_handler(service, handler)
+                await self._update_symbols(service, symbols, consumer=consumer)
+
+            while True:
+                msg = await handler.queue.get()
+
+                for symbol, tick in msg.get(service, {}).items():
+                    if symbol in wanted:
+                        yield tick
+
+        finally:
+            async with manager.lock:
+                if handler in self.handlers[service]:
+                    self._remove_handler(service, handler)
+
+                if self._logged_in and not self._closing:
+                    await self._update_symbols(service, [], consumer=consumer)
+
+    def quotes(self, symbols: str | list, **options):
+        """
+        Iterate over level one equity updates. See stream().
+        """
+        return self.stream("QUOTE", symbols, **options)
+
+    def options(self, symbols: str | list, **options):
+        """
+        Iterate over level one option updates. See stream().
+        """
+        return self.stream("OPTION", symbols, **options)
+
+    def futures(self, symbols: str | list, **options):
+        """
+        Iterate over level one futures updates. See stream().
+        """
+        return self.stream("LEVELONE_FUTURES", symbols, **options)
+
+    def book(self, symbols: str | list, service: str = "LISTED_BOOK", **options):
+        """
+        Iterate over labelled book updates, as passed to the book handlers. See stream().
+        :param service: LISTED_BOOK, NASDAQ_BOOK, OPTIONS_BOOK, FUTURES_BOOK or FUTURES_OPTIONS_BOOK
+        :return: Async generator of {"key", "Time", "Bids", "Asks"} dicts
+        """
+        return self.stream(service, symbols, handler_class=BookHandler, **options)
+
+    def timesale(self, symbols: str | list, service: str = "TIMESALE_EQUITY", **options):
+        """
+        Iterate over time and sale updates. See stream().
+        :param service: TIMESALE_EQUITY, TIMESALE_OPTIONS or TIMESALE_FUTURES
+        """
+        return self.stream(service, symbols, **options)
+
+    def news(self, symbols: str | list, **options):
+        """
+        Iterate over news headlines. See stream().
+        """
+        return self.stream("NEWS_HEADLINE", symbols, **options)
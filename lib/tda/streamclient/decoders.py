@@ -0,0 +1,161 @@
+# Precompiled Stream Field Decoders
+
+from collections.abc import Mapping
+
+# Compiled decoders by id of their Fields table
+decoders = {}
+
+
+class Record(Mapping):
+    """
+    Compact read-only record of one content entry in a stream message.
+
+    Wraps the decoded content dict without copying it: labels are resolved through the decoder's
+    precompiled tables only when a field is read.
+    Behaves like the labelled dict {label: value} that Handler.label_message used to build: a label repeated in the
+    Fields table (e.g. "Quote Time") appears once, with the latest field's value.
+    """
+
+    __slots__ = ("key", "_content", "_decoder")
+
+    def __init__(self, content: dict, decoder: "FieldDecoder"):
+        self.key = content.get("key")
+        self._content = content
+        self._decoder = decoder
+
+    def __getitem__(self, label: str):
+        content = self._content
+
+        for wire_key in self._decoder.lookup.get(label, (label,)):
+            if wire_key in content:
+                return content[wire_key]
+
+        raise KeyError(label)
+
+    def __iter__(self):
+        labels = self._decoder.labels
+        decoded = (labels.get(wire_key, wire_key) for wire_key in self._content)
+
+        # Each repeated label once
+        return iter(dict.fromkeys(decoded)) if self._decoder.repeated else decoded
+
+    def __len__(self):
+        if self._decoder.repeated:
+            return sum(1 for _ in self)
+        return len(self._content)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)!r})"
+
+    def field(self, number: int | str):
+        """
+        Get field value by field number
+        :param number: Field number
+        :return: Value or None if the field is not in this update
+        """
+        return self._content.get(str(number))
+
+    def values_by_number(self) -> tuple:
+        """
+        Get all field values indexed by field number
+        :return: Tuple of values, None for fields not in this update
+        """
+        return self._decoder.values(self._content)
+
+    @property
+    def raw(self) -> dict:
+        """
+        Decoded content dict as received: {wire key: value}
+        """
+        return self._content
+
+
+class FieldDecoder:
+    """
+    Fields table compiled once into lookup tables for decoding stream content
+    """
+
+    def __init__(self, fields: dict):
+        """
+        Compile Fields table
+        :param fields: Fields table {wire key: label}
+        """
+        self.fields = fields
+
+        # Wire keys ordered by field number: position in tuple == field number
+        self.wire_keys = tuple(sorted(fields.keys(), key=int))
+        self.names = tuple(fields.get(wire_key) for wire_key in self.wire_keys)
+
+        # {wire key: label}
+        self.labels = dict(fields)
+
+        # {label: wire keys}: latest field first when a label is repeated (e.g. "Quote Time")
+        lookup = {}
+        for wire_key in reversed(self.wire_keys):
+            lookup.setdefault(fields.get(wire_key), []).append(wire_key)
+        self.lookup = {label: tuple(wire_keys) for label, wire_keys in lookup.items()}
+
+        # Labels of more than one field
+        self.repeated = {label for label, wire_keys in self.lookup.items() if len(wire_keys) > 1}
+
+        # {wire key: column number}
+        self.columns = {wire_key: number for number, wire_key in enumerate(self.wire_keys)}
+
+    def __len__(self):
+        return len(self.wire_keys)
+
+    def field_numbers(self, fields: list) -> set:
+        """
+        Resolve field labels or numbers to field numbers
+        :param fields: Field labels or numbers. A repeated label resolves to all its fields.
+        :return: Set of field ints
+        """
+        numbers = set()
+
+        for field in fields:
+            if isinstance(field, int) or str(field).isdigit():
+                numbers.add(int(field))
+            elif field in self.lookup:
+                numbers.update(map(int, self.lookup.get(field)))
+            else:
+                raise ValueError(f"Unknown field: {field}")
+
+        return numbers
+
+    def record(self, content: dict) -> Record:
+        """
+        Decode one content entry
+        :param content: Content entry {"key": symbol, wire key: value}
+        :return: Record
+        """
+        return Record(content, self)
+
+    def records(self, data: dict) -> dict:
+        """
+        Decode all content entries of a data message
+        :param data: Data message with "content" list
+        :return: {symbol: Record}
+        """
+        return {content.get("key"): Record(content, self) for content in data.get("content")}
+
+    def values(self, content: dict) -> tuple:
+        """
+        Decode content entry into a tuple indexed by field number
+        :param content: Content entry
+        :return: Tuple of values, None for fields not in content
+        """
+        return tuple(map(content.get, self.wire_keys))
+
+
+def get_decoder(fields: dict) -> FieldDecoder:
+    """
+    Get the compiled decoder for a Fields table. Each table is compiled once.
+    :param fields: Fields table
+    :return: FieldDecoder
+    """
+    decoder = decoders.get(id(fields))
+
+    if decoder is None or decoder.fields is not fields:
+        decoder = decoders[id(fields)] = FieldDecoder(fields)
+
+    return decoder
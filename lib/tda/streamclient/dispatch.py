@@ -0,0 +1,495 @@
+# Stream Handler Queues
+
+import asyncio
+import inspect
+import time
+from collections.abc import Mapping
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from types import MappingProxyType
+
+from ..logger import TDALogger
+
+# Overflow policies
+BLOCK = "block"
+DROP_OLDEST = "drop_oldest"
+CONFLATE = "conflate"
+OVERFLOW_POLICIES = (BLOCK, DROP_OLDEST, CONFLATE)
+
+# Executor modes
+INLINE = "inline"
+THREAD = "thread"
+PROCESS = "process"
+EXECUTOR_MODES = (INLINE, THREAD, PROCESS)
+
+# Shared pools by executor mode
+executors = {}
+
+
+def get_executor(mode: str) -> Executor:
+    """
+    Get the shared pool of an executor mode. Each pool is created once per process.
+    :param mode: thread or process
+    :return: Executor
+    """
+    executor = executors.get(mode)
+
+    if executor is None:
+        executor = executors[mode] = ThreadPoolExecutor() if mode == THREAD else ProcessPoolExecutor()
+
+    return executor
+
+
+def shutdown_executors(wait: bool = True) -> None:
+    """
+    Shut down the shared pools
+    :param wait: Wait for running handlers to finish
+    :return: None
+    """
+    while executors:
+        executors.popitem()[1].shutdown(wait=wait)
+
+
+def to_plain(msg):
+    """
+    Convert a labelled message into plain dicts that can be pickled to another process
+    :param msg: Labelled message
+    :return: {service: {symbol: {label: value}}}
+    """
+    if isinstance(msg, Mapping):
+        return {key: to_plain(value) for key, value in msg.items()}
+    return msg
+
+
+def conflatable(msg) -> bool:
+    """
+    Check that a message is keyed by symbol, so it can be conflated
+    :param msg: Labelled message
+    :return: True if msg is {service: {symbol: {label: value}}}
+    """
+    return isinstance(msg, Mapping) and all(
+        isinstance(data, Mapping) and all(isinstance(content, Mapping) for content in data.values())
+        for data in msg.values())
+
+
+class HandlerQueue:
+    """
+    Bounded queue and worker task of one stream handler.
+
+    The reader puts labelled messages; the worker calls the handler. Overflow policies when the queue is full:
+        block:       put waits for room, which pauses the reader (lossless backpressure)
+        drop_oldest: the oldest queued message is dropped
+        conflate:    messages are merged per symbol so only the latest value of each field is kept. Messages not
+                     keyed by symbol (heartbeats, notify payloads) are queued as drop_oldest.
+
+    Executor modes:
+        inline:  handler runs on the event loop
+        thread:  handler runs in the shared thread pool with msg=labelled message
+        process: handler runs in the shared process pool with msg=list of up to batch_size plain-dict messages.
+                 The handler function must be importable (module level) to be pickled.
+    The return value of thread and process handlers is passed to callback on the event loop.
+
+    A pull queue has no worker: its consumer takes messages with get().
+    """
+
+    def __init__(self,
+                 handler: callable,
+                 maxsize: int = 1000,
+                 overflow: str = BLOCK,
+                 executor: str = INLINE,
+                 callback: callable = None,
+                 batch_size: int = 100,
+                 pull: bool = False):
+        """
+        Initialize HandlerQueue
+        :param handler: Handler called with msg=labelled message
+        :param maxsize: Maximum queued messages, or symbols for conflate
+        :param overflow: block, drop_oldest or conflate
+        :param executor: inline, thread or process
+        :param callback: Called on the event loop with the handler's return value. Can be a coroutine function.
+        :param batch_size: Maximum messages per process handler call
+        :param pull: No worker: messages are taken with get()
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_POLICIES}. Got: {overflow}")
+
+        if executor not in EXECUTOR_MODES:
+            raise ValueError(f"executor must be one of {EXECUTOR_MODES}. Got: {executor}")
+
+        self.logger = TDALogger("StreamClient").logger
+
+        self.handler = handler
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.executor = executor
+        self.callback = callback
+        self.batch_size = batch_size
+        self.pull = pull
+
+        self._queue = None
+        self._task = None
+        self._busy = False
+
+        # Conflated updates: {service: {symbol: {label: value}}} and perf_counter_ns of the oldest one
+        self._conflated = {}
+        self._conflated_at = None
+        self._conflated_event = None
+
+        # Queued → handler complete latency histogram, set by StreamClient
+        self.histogram = None
+
+        # Shared log of handler runs (start ns, end ns, handler name, executor), set by StreamClient
+        self.runs = None
+
+        # Counters
+        self.processed = 0
+        self.dropped = 0
+        self.conflated = 0
+        self.errors = 0
+        self.batches = 0
+
+        # Profile: handler calls, runtime in ns and last exception
+        self.calls = 0
+        self.runtime_total = 0
+        self.runtime_max = 0
+        self.last_error = None
+
+    @property
+    def depth(self) -> int:
+        """
+        Number of queued messages, plus conflated symbols
+        """
+        depth = self._queue.qsize() if self._queue is not None else 0
+        if self.overflow == CONFLATE:
+            depth += sum(map(len, self._conflated.values()))
+        return depth
+
+    def stats(self) -> dict:
+        """
+        Queue counters
+        :return: dict
+        """
+        return {"handler": self.name,
+                "executor": self.executor,
+                "overflow": self.overflow,
+                "maxsize": self.maxsize,
+                "depth": self.depth,
+                "processed": self.processed,
+                "dropped": self.dropped,
+                "conflated": self.conflated,
+                "errors": self.errors,
+                "last_error": self.last_error,
+                "batches": self.batches,
+                "calls": self.calls,
+                "runtime_total_ms": self.runtime_total / 1e6,
+                "runtime_mean_ms": self.runtime_total / self.calls / 1e6 if self.calls else None,
+                "runtime_max_ms": self.runtime_max / 1e6}
+
+    @property
+    def name(self) -> str:
+        """
+        Handler function name
+        """
+        func = self.func
+        if isinstance(func, str):
+            return func
+        return getattr(func, "__qualname__", None) or getattr(func, "__name__", None) or type(func).__name__
+
+    @property
+    def func(self) -> callable:
+        """
+        Handler function, unwrapped from its Handler
+        """
+        return getattr(self.handler, "func", self.handler)
+
+    def start(self) -> None:
+        """
+        Start the worker task. Needs a running event loop.
+        :return: None
+        """
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.maxsize)
+            self._conflated_event = asyncio.Event()
+
+        if not self.pull and (self._task is None or self._task.done()):
+            self._task = asyncio.ensure_future(self._worker())
+
+    def stop(self) -> None:
+        """
+        Cancel the worker task. Queued messages are discarded.
+        :return: None
+        """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def get(self):
+        """
+        Take the next message of a pull queue
+        :return: Labelled message
+        """
+        self.start()
+
+        msg, labelled_at = await self._next()
+        self.processed += 1
+
+        if self.histogram is not None:
+            self.histogram.record(time.perf_counter_ns() - labelled_at)
+
+        return msg
+
+    async def drain(self) -> None:
+        """
+        Wait until every queued message has been handled
+        :return: None
+        """
+        while self._task is not None and (self.depth or self._busy):
+            await asyncio.sleep(0.001)
+
+    async def put(self, msg, labelled_at: int = None) -> None:
+        """
+        Queue a labelled message
+        :param msg: {service: {symbol: Record}}
+        :param labelled_at: time.perf_counter_ns() when msg was labelled. Defaults to now.
+        :return: None
+        """
+        self.start()
+
+        if labelled_at is None:
+            labelled_at = time.perf_counter_ns()
+
+        if self.overflow == BLOCK:
+            await self._queue.put((msg, labelled_at))
+
+        elif self.overflow == DROP_OLDEST or not conflatable(msg):
+            if self._queue.full():
+                self._queue.get_nowait()
+                self.dropped += 1
+            self._queue.put_nowait((msg, labelled_at))
+
+            if self.overflow == CONFLATE:
+                self._conflated_event.set()
+
+        else:
+            if self._conflated_at is None:
+                self._conflated_at = labelled_at
+            self._conflate(msg)
+
+    def _conflate(self, msg) -> None:
+        """
+        Merge message into the pending updates: newer field values replace older ones
+        :param msg: {service: {symbol: Record}}
+        :return: None
+        """
+        for service, data in msg.items():
+            pending = self._conflated.setdefault(service, {})
+
+            for symbol, content in data.items():
+                previous = pending.get(symbol)
+
+                if previous is None:
+                    # Drop the oldest symbol when full
+                    if self.depth >= self.maxsize:
+                        oldest_service = next(service for service in self._conflated if self._conflated[service])
+                        self._conflated[oldest_service].pop(next(iter(self._conflated[oldest_service])))
+                        self.dropped += 1
+                    pending[symbol] = dict(content)
+                else:
+                    previous.update(content)
+                    self.conflated += 1
+
+        self._conflated_event.set()
+
+    async def _next(self) -> tuple:
+        """
+        Get the next message to handle
+        :return: (labelled message, labelled_at)
+        """
+        if self.overflow != CONFLATE:
+            return await self._queue.get()
+
+        # Messages that could not be conflated first, then the pending updates
+        while True:
+            await self._conflated_event.wait()
+            if not self._queue.empty():
+                return self._queue.get_nowait()
+
+            self._conflated_event.clear()
+            if any(self._conflated.values()):
+                break
+
+        msg, self._conflated = self._conflated, {}
+        labelled_at, self._conflated_at = self._conflated_at, None
+
+        return MappingProxyType({service: MappingProxyType({symbol: MappingProxyType(content)
+                                                            for symbol, content in data.items()})
+                                 for service, data in msg.items() if data}), labelled_at
+
+    def _batch(self, msg) -> list:
+        """
+        Collect msg and the messages already queued behind it into one compact batch for a process handler
+        :param msg: First message
+        :return: List of plain-dict messages
+        """
+        batch = [to_plain(msg)]
+
+        if self.overflow != CONFLATE:
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(to_plain(self._queue.get_nowait()[0]))
+
+        return batch
+
+    async def _call(self, msg):
+        """
+        Call the handler in its executor
+        :param msg: Labelled message, or batch for process handlers
+        :return: Handler return value
+        """
+        if self.executor == INLINE:
+            h = self.handler(msg=msg)
+            return await h if inspect.isawaitable(h) else h
+
+        # Process handlers get the bare function: Handler objects hold the queue and are not picklable
+        func = self.handler if self.executor == THREAD else self.func
+        return await asyncio.get_running_loop().run_in_executor(get_executor(self.executor), partial(func, msg=msg))
+
+    async def _worker(self):
+        """
+        Call the handler for each queued message. Awaitable results are awaited so the queue stays bounded.
+        """
+        while True:
+            msg, labelled_at = await self._next()
+            count = 1
+            self._busy = True
+
+            if self.executor == PROCESS:
+                msg = self._batch(msg)
+                count = len(msg)
+                self.batches += 1
+
+            start = time.perf_counter_ns()
+
+            try:
+                result = await self._call(msg)
+
+                if self.callback is not None:
+                    c = self.callback(result)
+                    if inspect.isawaitable(c):
+                        await c
+
+            except Exception as err:
+                self.errors += 1
+                self.last_error = repr(err)
+                self.logger.exception(f"Handler {self.name} raised: {err}")
+
+            end = time.perf_counter_ns()
+            runtime = end - start
+            self.calls += 1
+            self.runtime_total += runtime
+            if runtime > self.runtime_max:
+                self.runtime_max = runtime
+            if self.runs is not None:
+                self.runs.append((start, end, self.name, self.executor))
+
+            self.processed += count
+            self._busy = False
+
+            if self.histogram is not None:
+                self.histogram.record(end - labelled_at)
+
+
+class BatchQueue(HandlerQueue):
+    """
+    Handler queue that micro-batches data messages.
+
+    Raw data messages are accumulated and converted into one columnar batch every interval seconds, or as soon as
+    max_messages content entries are pending. Ready batches are queued to the worker like labelled messages, so the
+    overflow policy (block or drop_oldest) and executor modes apply per batch.
+    """
+
+    def __init__(self,
+                 handler: callable,
+                 interval: float = 0.05,
+                 max_messages: int = 1000,
+                 maxsize: int = 10,
+                 overflow: str = BLOCK,
+                 **options):
+        """
+        Initialize BatchQueue
+        :param handler: BatchHandler
+        :param interval: Seconds between batches
+        :param max_messages: Content entries that trigger a batch before interval
+        :param maxsize: Maximum ready batches
+        :param overflow: block or drop_oldest
+        :param options: HandlerQueue options
+        """
+        if overflow == CONFLATE:
+            raise ValueError("Batches cannot be conflated")
+
+        super().__init__(handler, maxsize=maxsize, overflow=overflow, **options)
+
+        self.interval = interval
+        self.max_messages = max_messages
+
+        # Pending data messages, their content entries and perf_counter_ns of the oldest one
+        self._pending = []
+        self._pending_entries = 0
+        self._pending_at = None
+
+        self._timer = None
+
+    @property
+    def depth(self) -> int:
+        """
+        Number of ready batches and pending data messages
+        """
+        return super().depth + len(self._pending)
+
+    def start(self) -> None:
+        super().start()
+
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.ensure_future(self._flush_timer())
+
+    def stop(self) -> None:
+        super().stop()
+
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    async def put(self, msg, labelled_at: int = None) -> None:
+        """
+        Add a data message to the pending batch
+        :param msg: Data message: {"service", "timestamp", "content": [...]}
+        :param labelled_at: time.perf_counter_ns() when msg was routed. Defaults to now.
+        :return: None
+        """
+        self.start()
+
+        if self._pending_at is None:
+            self._pending_at = labelled_at if labelled_at is not None else time.perf_counter_ns()
+
+        self._pending.append(msg)
+        self._pending_entries += len(msg.get("content", ()))
+
+        if self._pending_entries >= self.max_messages:
+            await self.flush()
+
+    async def flush(self) -> None:
+        """
+        Convert the pending messages into one batch and queue it
+        :return: None
+        """
+        if not self._pending:
+            return
+
+        pending, self._pending, self._pending_entries = self._pending, [], 0
+        labelled_at, self._pending_at = self._pending_at, None
+
+        await super().put(self.handler.columns(pending), labelled_at)
+
+    async def _flush_timer(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
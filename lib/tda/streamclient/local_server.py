@@ -0,0 +1,357 @@
+# Local TDA Streamer Stand-in
+# Speaks the TDA streamer protocol on a local websocket with synthetic market data.
+# Run from project root: python -m lib.tda.streamclient.local_server
+
+import asyncio
+import json
+import random
+import time
+
+import pandas as pd
+import websockets
+
+from .client import StreamClient
+from .services import SERVICE_FIELDS
+
+# Default frames per second of each service
+DEFAULT_RATE = 10
+
+# Login timestamp format of User Principals
+TOKEN_TIMESTAMP = "2022-01-03T14:30:00+0000"
+
+
+class SyntheticMarket:
+    """
+    Random walk prices and synthetic content entries in TDA wire format
+    """
+
+    def __init__(self, seed: int = 0, book_levels: int = 10):
+        """
+        Initialize SyntheticMarket
+        :param seed: Random seed
+        :param book_levels: Price levels per book side
+        """
+        self.random = random.Random(seed)
+        self.book_levels = book_levels
+
+        # {symbol: last price}
+        self.prices = {}
+
+        # {symbol: [total volume, sequence]}
+        self.counters = {}
+
+    def _tick(self, symbol: str) -> tuple[float, float, float, int]:
+        """
+        Move symbol's price one tick
+        :return: (bid, ask, last, trade size)
+        """
+        price = self.prices.get(symbol) or self.random.uniform(10, 500)
+        price = round(max(price + self.random.choice((-0.01, 0, 0.01)), 0.01), 2)
+        self.prices[symbol] = price
+
+        size = self.random.randrange(1, 10) * 100
+        counters = self.counters.setdefault(symbol, [0, 0])
+        counters[0] += size
+        counters[1] += 1
+
+        last = self.random.choice((price - 0.01, price, price + 0.01))
+        return round(price - 0.01, 2), round(price + 0.01, 2), round(last, 2), size
+
+    def level_one(self, symbol: str, now: int) -> dict:
+        bid, ask, last, size = self._tick(symbol)
+        return {"key": symbol, "delayed": False, "1": bid, "2": ask, "3": last, "4": self.random.randrange(1, 50),
+                "5": self.random.randrange(1, 50), "8": self.counters[symbol][0], "9": size, "49": last,
+                "50": now, "51": now}
+
+    def option(self, symbol: str, now: int) -> dict:
+        bid, ask, last, size = self._tick(symbol)
+        return {"key": symbol, "delayed": False, "2": bid, "3": ask, "4": last, "8": self.counters[symbol][0],
+                "20": self.random.randrange(1, 50), "21": self.random.randrange(1, 50), "22": size,
+                "32": round(self.random.uniform(-1, 1), 4), "33": round(self.random.uniform(0, 0.1), 4),
+                "34": round(self.random.uniform(-0.5, 0), 4), "35": round(self.random.uniform(0, 0.5), 4),
+                "41": round((bid + ask) / 2, 2)}
+
+    def book(self, symbol: str, now: int) -> dict:
+        bid, ask, _, _ = self._tick(symbol)
+
+        def side(top: float, step: float) -> list:
+            levels = []
+            for level in range(self.book_levels):
+                volume = self.random.randrange(1, 20) * 100
+                levels.append({"0": round(top + step * level, 2), "1": volume, "2": 1,
+                               "3": [{"0": "ARCX", "1": volume, "2": self.counters[symbol][1]}]})
+            return levels
+
+        return {"key": symbol, "1": now, "2": side(bid, -0.01), "3": side(ask, 0.01)}
+
+    def timesale(self, symbol: str, now: int) -> dict:
+        _, _, last, size = self._tick(symbol)
+        return {"key": symbol, "seq": self.counters[symbol][1], "1": now, "2": last, "3": size,
+                "4": self.counters[symbol][1]}
+
+    def content(self, service: str, symbol: str, now: int) -> dict:
+        """
+        Synthetic content entry of service for symbol
+        :param service: Service
+        :param symbol: Symbol
+        :param now: Time in ms since epoch
+        :return: {"key": symbol, wire key: value}
+        """
+        if service in ("QUOTE", "LEVELONE_FUTURES", "LEVELONE_FUTURES_OPTIONS"):
+            return self.level_one(symbol, now)
+        elif service == "OPTION":
+            return self.option(symbol, now)
+        elif service.endswith("_BOOK"):
+            return self.book(symbol, now)
+        elif service.startswith("TIMESALE_"):
+            return self.timesale(symbol, now)
+        return {"key": symbol}
+
+
+class LocalStreamServer:
+    """
+    Local websocket server speaking the TDA streamer protocol:
+        ADMIN LOGIN/LOGOUT/QOS, SUBS/ADD/UNSUBS/VIEW for every data service, heartbeat notify messages.
+    Every subscribed service emits one data frame per 1/rate seconds with an entry for each subscribed symbol,
+    projected to the subscribed fields. Each entry also carries "sendTimeNs", the server send time in ns, so
+    benchmarks can measure end-to-end latency.
+
+    Usage:
+        async with LocalStreamServer(rates={"QUOTE": 100}) as server:
+            client = LocalStreamClient(server)
+    """
+
+    def __init__(self,
+                 host: str = "127.0.0.1",
+                 port: int = 0,
+                 rates: dict = None,
+                 heartbeat: float = 10,
+                 seed: int = 0,
+                 book_levels: int = 10):
+        """
+        Initialize LocalStreamServer
+        :param host: Host
+        :param port: Port. 0 for any free port.
+        :param rates: Frames per second of each service: {service: rate}. DEFAULT_RATE for other services.
+        :param heartbeat: Seconds between heartbeat notify messages
+        :param seed: Random seed of the synthetic market
+        :param book_levels: Price levels per book side
+        """
+        self.host = host
+        self.port = port
+        self.rates = rates or {}
+        self.heartbeat = heartbeat
+        self.market = SyntheticMarket(seed=seed, book_levels=book_levels)
+
+        self._server = None
+
+        # Counters
+        self.frames_sent = 0
+        self.entries_sent = 0
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}/ws"
+
+    async def start(self) -> "LocalStreamServer":
+        """
+        Start listening
+        :return: self
+        """
+        self._server = await websockets.serve(self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        """
+        Stop the server and close every connection
+        :return: None
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    async def serve_forever(self) -> None:
+        """
+        Start and serve until cancelled
+        :return: None
+        """
+        await self.start()
+        try:
+            await asyncio.Future()
+        finally:
+            await self.stop()
+
+    async def _serve(self, connection) -> None:
+        """
+        Serve one client connection
+        :param connection: Server connection
+        :return: None
+        """
+        # {service: {"symbols": {symbol: None}, "fields": set of wire keys or None}}
+        subscriptions = {}
+        emitters = {}
+        logged_in = False
+
+        heartbeat = asyncio.ensure_future(self._heartbeat(connection))
+
+        try:
+            async for frame in connection:
+                responses = []
+
+                for request in json.loads(frame).get("requests", []):
+                    service = request.get("service")
+                    command = request.get("command")
+                    parameters = request.get("parameters", {})
+                    code, msg = 0, f"{command} command succeeded"
+
+                    if command == "LOGIN":
+                        logged_in = True
+
+                    elif not logged_in:
+                        code, msg = 3, "Login required"
+
+                    elif service not in SERVICE_FIELDS and service != "ADMIN":
+                        code, msg = 11, f"Unknown service {service}"
+
+                    elif command in ("SUBS", "ADD", "UNSUBS", "VIEW"):
+                        subscription = subscriptions.setdefault(service, {"symbols": {}, "fields": None})
+                        symbols = [symbol for symbol in parameters.get("keys", "").split(",") if symbol]
+
+                        if command == "SUBS":
+                            subscription["symbols"] = dict.fromkeys(symbols)
+                        elif command == "ADD":
+                            subscription["symbols"].update(dict.fromkeys(symbols))
+                        elif command == "UNSUBS":
+                            for symbol in symbols:
+                                subscription["symbols"].pop(symbol, None)
+
+                        if parameters.get("fields"):
+                            subscription["fields"] = set(parameters.get("fields").split(","))
+
+                        if subscription["symbols"] and service not in emitters:
+                            emitters[service] = asyncio.ensure_future(
+                                self._emit(connection, service, subscription))
+
+                    responses.append({"service": service, "requestid": str(request.get("requestid")),
+                                      "command": command, "timestamp": int(time.time() * 1000),
+                                      "content": {"code": code, "msg": msg}})
+
+                await connection.send(json.dumps({"response": responses}))
+
+                if any(request.get("command") == "LOGOUT" for request in json.loads(frame).get("requests", [])):
+                    await connection.close()
+                    break
+
+        except websockets.ConnectionClosed:
+            pass
+
+        finally:
+            heartbeat.cancel()
+            for emitter in emitters.values():
+                emitter.cancel()
+
+    async def _heartbeat(self, connection) -> None:
+        """
+        Send heartbeat notify messages
+        :param connection: Server connection
+        :return: None
+        """
+        while True:
+            await connection.send(json.dumps({"notify": [{"heartbeat": str(int(time.time() * 1000))}]}))
+            await asyncio.sleep(self.heartbeat)
+
+    async def _emit(self, connection, service: str, subscription: dict) -> None:
+        """
+        Send data frames of service at its rate
+        :param connection: Server connection
+        :param service: Service
+        :param subscription: Subscribed symbols and fields, updated in place by requests
+        :return: None
+        """
+        interval = 1 / self.rates.get(service, DEFAULT_RATE)
+        start = time.perf_counter()
+        sent = 0
+
+        while True:
+            # Frames due since start: catches up after slow sends instead of drifting
+            due = int((time.perf_counter() - start) / interval) + 1 - sent
+
+            for _ in range(due):
+                symbols = list(subscription.get("symbols"))
+                if not symbols:
+                    continue
+
+                fields = subscription.get("fields")
+                now = int(time.time() * 1000)
+
+                content = []
+                for symbol in symbols:
+                    entry = self.market.content(service, symbol, now)
+                    if fields is not None:
+                        entry = {key: value for key, value in entry.items() if not key.isdigit() or key in fields}
+                    entry["sendTimeNs"] = time.time_ns()
+                    content.append(entry)
+
+                await connection.send(json.dumps(
+                    {"data": [{"service": service, "timestamp": now, "command": "SUBS", "content": content}]}))
+
+                self.frames_sent += 1
+                self.entries_sent += len(content)
+
+            sent += due
+            await asyncio.sleep(max(start + sent * interval - time.perf_counter(), 0))
+
+
+class LocalStreamClient(StreamClient):
+    """
+    StreamClient connected to a LocalStreamServer instead of TDA. Needs no account.
+    """
+
+    def __init__(self, server: LocalStreamServer | str, **kwargs):
+        """
+        Initialize LocalStreamClient
+        :param server: LocalStreamServer or its websocket url
+        :param kwargs: StreamClient options
+        """
+        self.server_url = server if isinstance(server, str) else server.url
+        super().__init__(**kwargs)
+
+    def _load_user_principals(self):
+        """
+        User Principals of the local server
+        :return: None
+        """
+        self.userPrincipals = pd.Series({
+            "streamerInfo.streamerSocketUrl": self.server_url,
+            "streamerInfo.token": "local",
+            "streamerInfo.tokenTimestamp": TOKEN_TIMESTAMP,
+            "streamerInfo.userGroup": "ACCT",
+            "streamerInfo.accessLevel": "ACCT",
+            "streamerInfo.acl": "local",
+            "streamerInfo.appId": "local",
+        })
+        self._accounts = {"company": "local", "segment": "local", "accountCdDomainId": "local"}
+        self._streamer_url = self.server_url
+        self._ws_url = self.server_url
+        self._streamer_key = "local"
+        self._streamer_appid = "local"
+        self._token = "local"
+
+
+async def main(port: int = 8765):
+    server = LocalStreamServer(port=port, rates={"QUOTE": 100, "OPTION": 50, "LISTED_BOOK": 20,
+                                                 "TIMESALE_EQUITY": 100})
+    print(f"Serving TDA streamer protocol on {server.host}:{port}")
+    await server.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,194 @@
+# Stream Latency Metrics
+
+import json
+import time
+
+# Latency stages of a data frame
+SERVER_TO_RECEIVE = "server_to_receive"
+RECEIVE_TO_DECODE = "receive_to_decode"
+DECODE_TO_LABEL = "decode_to_label"
+LABEL_TO_HANDLER = "label_to_handler"
+STAGES = (SERVER_TO_RECEIVE, RECEIVE_TO_DECODE, DECODE_TO_LABEL, LABEL_TO_HANDLER)
+
+# Sub-buckets per power of two: values are recorded with 1/32 (~3%) relative precision
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+
+class LatencyHistogram:
+    """
+    HDR-style histogram of nanosecond durations.
+
+    Buckets are log-linear: every power of two is split into SUB_BUCKETS linear sub-buckets, so recording is O(1) with
+    fixed relative precision from 1 ns to hours in under 2000 counters.
+    """
+
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts = [0] * (SUB_BUCKETS * 2)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    @staticmethod
+    def bucket(value: int) -> int:
+        """
+        Bucket index of a value
+        :param value: Non-negative int
+        :return: Index
+        """
+        if value < SUB_BUCKETS:
+            return value
+
+        shift = value.bit_length() - SUB_BUCKET_BITS - 1
+        return SUB_BUCKETS + shift * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS
+
+    @staticmethod
+    def bucket_value(index: int) -> int:
+        """
+        Lowest value of a bucket
+        :param index: Index
+        :return: Value
+        """
+        if index < SUB_BUCKETS:
+            return index
+
+        shift, sub_bucket = divmod(index - SUB_BUCKETS, SUB_BUCKETS)
+        return (SUB_BUCKETS + sub_bucket) << shift
+
+    def record(self, value: int) -> None:
+        """
+        Record a duration. Negative values (clock skew) are recorded as 0.
+        :param value: Duration in ns
+        :return: None
+        """
+        value = int(value) if value > 0 else 0
+        index = self.bucket(value)
+
+        counts = self.counts
+        if index >= len(counts):
+            counts.extend([0] * (index + 1 - len(counts)))
+        counts[index] += 1
+
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, percentile: float) -> int | None:
+        """
+        Value at percentile, within the bucket precision
+        :param percentile: 0 to 100
+        :return: Duration in ns, None if empty
+        """
+        if not self.count:
+            return None
+
+        rank = max(1, round(percentile / 100 * self.count))
+        seen = 0
+
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(max(self.bucket_value(index), self.min), self.max)
+
+        return self.max
+
+    def summary(self) -> dict:
+        """
+        Count, mean, min, max and percentiles in ms
+        :return: dict
+        """
+        def ms(value):
+            return None if value is None else value / 1e6
+
+        return {"count": self.count,
+                "mean": ms(self.total / self.count) if self.count else None,
+                "min": ms(self.min),
+                "p50": ms(self.percentile(50)),
+                "p90": ms(self.percentile(90)),
+                "p99": ms(self.percentile(99)),
+                "p99.9": ms(self.percentile(99.9)),
+                "max": ms(self.max)}
+
+    def reset(self) -> None:
+        self.counts = [0] * (SUB_BUCKETS * 2)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+
+class StreamMetrics:
+    """
+    Latency histograms of every stage of every service:
+        server_to_receive: TDA frame timestamp → websocket frame received
+        receive_to_decode: frame received → JSON decoded
+        decode_to_label:   JSON decoded → labelled for the handlers
+        label_to_handler:  labelled → handler completed
+    """
+
+    def __init__(self):
+        # {service: {stage: LatencyHistogram}}
+        self.histograms = {}
+
+    def histogram(self, service: str, stage: str) -> LatencyHistogram:
+        """
+        Get the histogram of a service stage, created on first use
+        :param service: Service
+        :param stage: Stage
+        :return: LatencyHistogram
+        """
+        histograms = self.histograms.get(service)
+        if histograms is None:
+            histograms = self.histograms[service] = {stage: LatencyHistogram() for stage in STAGES}
+
+        return histograms[stage]
+
+    def record(self, service: str, stage: str, value: int) -> None:
+        """
+        Record a duration
+        :param service: Service
+        :param stage: Stage
+        :param value: Duration in ns
+        :return: None
+        """
+        self.histogram(service, stage).record(value)
+
+    def summary(self, service: str = None) -> dict:
+        """
+        Summaries in ms
+        :param service: Service, None for every service
+        :return: {service: {stage: summary}}
+        """
+        services = [service] if service is not None else list(self.histograms)
+
+        return {service: {stage: histogram.summary() for stage, histogram in self.histograms.get(service, {}).items()}
+                for service in services}
+
+    def reset(self) -> None:
+        for histograms in self.histograms.values():
+            for histogram in histograms.values():
+                histogram.reset()
+
+    def dump(self, path: str = None, reset: bool = False) -> dict:
+        """
+        Dump summaries, appended as one JSON line to path if given
+        :param path: JSON lines file
+        :param reset: Reset the histograms after dumping
+        :return: {"time": epoch seconds, "latency": summary()}
+        """
+        dump = {"time": time.time(), "latency": self.summary()}
+
+        if path is not None:
+            with open(path, "a") as file:
+                file.write(json.dumps(dump) + "\n")
+
+        if reset:
+            self.reset()
+
+        return dump
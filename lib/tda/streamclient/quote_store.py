@@ -0,0 +1,230 @@
+# Level One Last-Value Quote Store
+
+import numpy as np
+import pandas as pd
+
+from .decoders import get_decoder
+
+# Level one fields that are not numeric
+TEXT_FIELDS = {"Symbol", "Description", "Ask ID", "Bid ID", "Bid Tick", "Exchange ID", "Marginable", "Shortable",
+               "Last ID", "Exchange Name", "Dividend Date", "Regular Market Quote", "Regular Market Trade",
+               "Security Status", "Contract Type", "Underlying", "Deliverables", "UV Expiration Type", "Product",
+               "Future Price Format", "Future Trading Hours", "Future is Tradable", "Future is Active",
+               "Future Active Symbol"}
+
+
+def as_float(value) -> float | None:
+    """
+    Convert a numeric field value
+    :param value: Value, None for a missing value
+    :return: float, NaN for None, None if the value is not numeric
+    """
+    try:
+        return float(np.nan if value is None else value)
+    except (TypeError, ValueError):
+        return None
+
+
+class QuoteStore:
+    """
+    Last value of every level one field for every symbol of a service.
+
+    TDA level one messages only carry the fields that changed. The store merges them in place into
+    preallocated columns: numeric fields live in one Fortran-ordered float64 matrix (one contiguous array per field)
+    and text fields in one object array per field. Rows are symbols.
+    """
+
+    def __init__(self, fields: dict, capacity: int = 256):
+        """
+        Initialize QuoteStore
+        :param fields: Level one Fields table
+        :param capacity: Initial number of symbol rows
+        """
+        self.decoder = get_decoder(fields)
+
+        # Column labels: repeated labels (e.g. "Quote Time" 11 and 50) are suffixed with their field number
+        labels = {}
+        for wire_key, label in zip(self.decoder.wire_keys, self.decoder.names):
+            labels[wire_key] = label if label not in labels.values() else f"{label} ({wire_key})"
+
+        # {wire key: column}
+        self.numeric = {}
+        self.text = {}
+        for wire_key, label in labels.items():
+            if label in TEXT_FIELDS:
+                self.text[wire_key] = len(self.text)
+            else:
+                self.numeric[wire_key] = len(self.numeric)
+
+        self.numeric_labels = [labels.get(wire_key) for wire_key in self.numeric] + ["Timestamp"]
+        self.text_labels = [labels.get(wire_key) for wire_key in self.text]
+        self._timestamp = len(self.numeric)
+
+        # Symbol rows
+        self.symbols = []
+        self.rows = {}
+
+        # Preallocated columns
+        self.capacity = capacity
+        self.values = np.full((capacity, len(self.numeric_labels)), np.nan, order="F")
+        self.texts = [np.full(capacity, None, dtype=object) for _ in self.text]
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol: str):
+        return symbol in self.rows
+
+    def _grow(self):
+        """
+        Double capacity. Frames returned by to_frame() before growing stop receiving updates.
+        """
+        capacity = self.capacity * 2
+
+        values = np.full((capacity, len(self.numeric_labels)), np.nan, order="F")
+        values[:self.capacity] = self.values
+        self.values = values
+
+        for i, column in enumerate(self.texts):
+            texts = np.full(capacity, None, dtype=object)
+            texts[:self.capacity] = column
+            self.texts[i] = texts
+
+        self.capacity = capacity
+
+    def add(self, symbols: str | list) -> None:
+        """
+        Add rows for symbols
+        :param symbols: Symbol or list of symbols
+        :return: None
+        """
+        if isinstance(symbols, str):
+            symbols = [symbols]
+
+        for symbol in symbols:
+            if symbol not in self.rows:
+                if len(self.symbols) == self.capacity:
+                    self._grow()
+
+                self.rows[symbol] = len(self.symbols)
+                self.symbols.append(symbol)
+
+    def remove(self, symbols: str | list) -> None:
+        """
+        Remove rows for symbols. The last row is moved into the freed row.
+        :param symbols: Symbol or list of symbols
+        :return: None
+        """
+        if isinstance(symbols, str):
+            symbols = [symbols]
+
+        for symbol in symbols:
+            row = self.rows.pop(symbol, None)
+            if row is None:
+                continue
+
+            last = len(self.symbols) - 1
+            last_symbol = self.symbols.pop()
+
+            if row != last:
+                self.values[row] = self.values[last]
+                for column in self.texts:
+                    column[row] = column[last]
+                self.symbols[row] = last_symbol
+                self.rows[last_symbol] = row
+
+            self.values[last] = np.nan
+            for column in self.texts:
+                column[last] = None
+
+    def update(self, data: dict) -> None:
+        """
+        Apply a level one data message in place
+        :param data: Data message: {"service", "timestamp", "content": [{"key": symbol, wire key: value}]}
+        :return: None
+        """
+        numeric = self.numeric
+        text = self.text
+        rows, columns, values = [], [], []
+
+        for content in data.get("content"):
+            symbol = content.get("key")
+            row = self.rows.get(symbol)
+
+            if row is None:
+                self.add(symbol)
+                row = self.rows.get(symbol)
+
+            for wire_key, value in content.items():
+                column = numeric.get(wire_key)
+
+                if column is not None:
+                    rows.append(row)
+                    columns.append(column)
+                    values.append(value)
+
+                elif wire_key in text:
+                    self.texts[text[wire_key]][row] = value
+
+            rows.append(row)
+            columns.append(self._timestamp)
+            values.append(data.get("timestamp"))
+
+        # One vectorized assignment for all numeric fields in the message
+        try:
+            self.values[rows, columns] = np.array(values, dtype=float)
+
+        # A non-numeric value in a numeric field: skip it and keep the rest of the message
+        except (TypeError, ValueError):
+            converted = list(map(as_float, values))
+            keep = [i for i, value in enumerate(converted) if value is not None]
+            self.values[[rows[i] for i in keep], [columns[i] for i in keep]] = [converted[i] for i in keep]
+
+    def snapshot(self, symbol: str) -> dict:
+        """
+        Get the last value of every field for symbol
+        :param symbol: Symbol
+        :return: {label: value}
+        """
+        row = self.rows[symbol]
+
+        snapshot = dict(zip(self.numeric_labels, self.values[row].tolist()))
+        snapshot.update({label: column[row] for label, column in zip(self.text_labels, self.texts)})
+
+        return snapshot
+
+    def get(self, symbol: str, label: str, default=None):
+        """
+        Get the last value of one field for symbol
+        :param symbol: Symbol
+        :param label: Field label
+        :param default: Value if symbol or field is unknown
+        :return: Value
+        """
+        row = self.rows.get(symbol)
+        if row is None:
+            return default
+
+        if label in self.numeric_labels:
+            return self.values[row, self.numeric_labels.index(label)]
+        elif label in self.text_labels:
+            return self.texts[self.text_labels.index(label)][row]
+
+        return default
+
+    def to_frame(self, text: bool = False) -> pd.DataFrame:
+        """
+        Get all symbols as a DataFrame
+        :param text: Include text fields. The numeric frame is a zero-copy view of the store; text fields are copied.
+        :return: DataFrame indexed by symbol
+        """
+        n = len(self.symbols)
+
+        df = pd.DataFrame(self.values[:n], index=pd.Index(self.symbols, name="Symbol"),
+                          columns=self.numeric_labels, copy=False)
+
+        if text:
+            df = df.join(pd.DataFrame({label: column[:n] for label, column in zip(self.text_labels, self.texts)},
+                                      index=df.index))
+
+        return df
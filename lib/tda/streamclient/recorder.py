@@ -0,0 +1,155 @@
+# Raw Stream Frame Recorder
+
+import gzip
+import os
+import struct
+import time
+import zlib
+
+from ..logger import TDALogger
+
+# Frame header: receive timestamp (ns since epoch), frame length (bytes)
+HEADER = struct.Struct("<qI")
+
+# Segment file suffix
+SEGMENT_SUFFIX = ".seg.gz"
+
+
+class StreamRecorder:
+    """
+    Append-only recorder of raw websocket frames.
+
+    Every frame is written with its receive timestamp to gzip-compressed segment files in a directory:
+        {directory}/{first receive timestamp ns}.seg.gz
+    Each record is a HEADER (timestamp, length) followed by the UTF-8 frame. A new segment is started once the
+    current one holds segment_size uncompressed bytes. Segments are sync-flushed every flush_every frames, so a crash
+    loses at most the last unflushed frames.
+    """
+
+    def __init__(self,
+                 directory: str,
+                 segment_size: int = 64 * 1024 * 1024,
+                 flush_every: int = 1000,
+                 compresslevel: int = 6):
+        """
+        Initialize StreamRecorder
+        :param directory: Segment directory, created if missing
+        :param segment_size: Uncompressed bytes per segment
+        :param flush_every: Frames between sync flushes
+        :param compresslevel: gzip compression level
+        """
+        self.logger = TDALogger("StreamClient").logger
+
+        self.directory = directory
+        self.segment_size = segment_size
+        self.flush_every = flush_every
+        self.compresslevel = compresslevel
+
+        os.makedirs(directory, exist_ok=True)
+
+        self._file = None
+        self._size = 0
+        self._unflushed = 0
+
+        # Counters
+        self.frames = 0
+        self.segments = []
+
+    def _open(self, received: int) -> None:
+        """
+        Start a new segment
+        :param received: Receive timestamp of its first frame
+        :return: None
+        """
+        self.close()
+
+        path = os.path.join(self.directory, f"{received}{SEGMENT_SUFFIX}")
+        self._file = gzip.open(path, "ab", compresslevel=self.compresslevel)
+        self._size = 0
+        self.segments.append(path)
+
+        self.logger.info(f"Recording stream to {path}")
+
+    def record(self, frame: str | bytes, received: int = None) -> None:
+        """
+        Append a raw frame
+        :param frame: Frame as received from the socket
+        :param received: Receive timestamp in ns since epoch. Defaults to now.
+        :return: None
+        """
+        if received is None:
+            received = time.time_ns()
+
+        if isinstance(frame, str):
+            frame = frame.encode("utf-8")
+
+        if self._file is None or self._size >= self.segment_size:
+            self._open(received)
+
+        self._file.write(HEADER.pack(received, len(frame)))
+        self._file.write(frame)
+
+        self._size += HEADER.size + len(frame)
+        self.frames += 1
+
+        self._unflushed += 1
+        if self._unflushed >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Sync flush the current segment so every frame written so far can be read back
+        :return: None
+        """
+        if self._file is not None:
+            self._file.flush(zlib.Z_SYNC_FLUSH)
+        self._unflushed = 0
+
+    def close(self) -> None:
+        """
+        Close the current segment
+        :return: None
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._unflushed = 0
+
+
+def segment_paths(path: str) -> list:
+    """
+    Get segment files in recording order
+    :param path: Segment directory or a single segment file
+    :return: List of paths
+    """
+    if os.path.isfile(path):
+        return [path]
+
+    return [os.path.join(path, name)
+            for name in sorted(os.listdir(path), key=lambda name: int(name.split(".")[0]))
+            if name.endswith(SEGMENT_SUFFIX)]
+
+
+def read_segments(path: str):
+    """
+    Read recorded frames. A truncated last record (recorder killed mid-write) ends its segment.
+    :param path: Segment directory or a single segment file
+    :return: Generator of (receive timestamp ns, frame str)
+    """
+    for segment in segment_paths(path):
+        with gzip.open(segment, "rb") as file:
+            while True:
+                try:
+                    header = file.read(HEADER.size)
+                    if len(header) < HEADER.size:
+                        break
+
+                    received, length = HEADER.unpack(header)
+                    frame = file.read(length)
+                    if len(frame) < length:
+                        break
+
+                except (EOFError, gzip.BadGzipFile):
+                    break
+
+                yield received, frame.decode("utf-8")
@@ -0,0 +1,208 @@
+# Recorded Stream Replay
+
+import asyncio
+import json
+import time
+from collections import deque
+
+import websockets
+
+from .client import StreamClient
+from .recorder import read_segments
+
+
+class ReplaySocket:
+    """
+    Socket stand-in that plays recorded frames back at their recorded pace.
+
+    Requests sent to it are acknowledged with code 0 so subscriptions, handlers and logout work unchanged.
+    Recorded responses are dropped: their request ids belong to the recorded session.
+    Once every frame is played, finished is set and the socket keeps acknowledging requests until closed.
+    """
+
+    def __init__(self, path: str, speed: float | None = 1.0):
+        """
+        Initialize ReplaySocket
+        :param path: Segment directory or a single segment file
+        :param speed: Replay speed: 1 for real time, N for N times faster, None or 0 for as fast as possible
+        """
+        self.path = path
+        self.speed = speed
+
+        self._frames = read_segments(path)
+        self._responses = deque()
+        self._closed = False
+        self._wakeup = asyncio.Event()
+        self.finished = asyncio.Event()
+
+        # Pacing: first recorded timestamp and its replay time
+        self._first = None
+        self._start = None
+
+        # Counters
+        self.frames = 0
+
+    async def send(self, msg: str) -> None:
+        """
+        Acknowledge every request of a frame
+        :param msg: Requests frame
+        :return: None
+        """
+        response = [{"service": request.get("service"),
+                     "requestid": str(request.get("requestid")),
+                     "command": request.get("command"),
+                     "timestamp": int(time.time() * 1000),
+                     "content": {"code": 0, "msg": "replay"}}
+                    for request in json.loads(msg).get("requests", [])]
+
+        self._responses.append(json.dumps({"response": response}))
+        self._wakeup.set()
+
+    async def recv(self) -> str:
+        """
+        Next acknowledgement, or next recorded frame once its replay time is reached
+        :return: Frame
+        """
+        while True:
+            if self._closed:
+                raise websockets.ConnectionClosed(None, None)
+
+            if self._responses:
+                return self._responses.popleft()
+
+            if self.finished.is_set():
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            received, frame = next(self._frames, (None, None))
+            if frame is None:
+                self.finished.set()
+                continue
+
+            msg = json.loads(frame)
+            msg.pop("response", None)
+            if not msg:
+                continue
+
+            await self._pace(received)
+            self.frames += 1
+
+            return json.dumps(msg)
+
+    async def _pace(self, received: int) -> None:
+        """
+        Sleep until the replay time of a frame
+        :param received: Recorded receive timestamp in ns
+        :return: None
+        """
+        if not self.speed:
+            # Let handlers run between frames
+            await asyncio.sleep(0)
+            return
+
+        if self._first is None:
+            self._first, self._start = received, time.perf_counter()
+
+        delay = self._start + (received - self._first) / 1e9 / self.speed - time.perf_counter()
+        await asyncio.sleep(max(delay, 0))
+
+    async def close(self) -> None:
+        self._closed = True
+        self._wakeup.set()
+
+
+class ReplayStreamClient(StreamClient):
+    """
+    StreamClient that replays recorded sessions instead of connecting to TDA.
+
+    Handlers and subscriptions use the same API as StreamClient:
+        client = ReplayStreamClient("recordings/2022-01-03", speed=10)
+        client.add_timesale_futures_handler(handler)
+        await client.run()
+    """
+
+    def __init__(self, path: str, speed: float | None = 1.0, **kwargs):
+        """
+        Initialize ReplayStreamClient
+        :param path: Segment directory or a single segment file written by StreamRecorder
+        :param speed: Replay speed: 1 for real time, N for N times faster, None or 0 for as fast as possible
+        :param kwargs: StreamClient options
+        """
+        self.path = path
+        self.speed = speed
+
+        kwargs.setdefault("auto_reconnect", False)
+        super().__init__(**kwargs)
+
+    def _load_user_principals(self):
+        """
+        Replays need no streamer credentials
+        :return: None
+        """
+        self.userPrincipals = None
+        self._accounts = {}
+        self._streamer_url = None
+        self._streamer_key = None
+        self._streamer_appid = "replay"
+        self._token = None
+
+    async def connect(self):
+        """
+        Open the recording
+        :return: ReplaySocket
+        """
+        if self.Socket is None:
+            self.Socket = ReplaySocket(self.path, speed=self.speed)
+            self.logger.info(f"Replaying {self.path} at speed {self.speed or 'max'}")
+
+        self._start_reader()
+
+        return self.Socket
+
+    async def disconnect(self):
+        """
+        Close the recording
+        :return: None
+        """
+        self._closing = True
+
+        if self.Socket is not None:
+            self.logger.info("Closing replay")
+            await self.Socket.close()
+            self.Socket = None
+
+        reader = self._reader_task
+        if reader is not None and not reader.done() and reader is not asyncio.current_task():
+            reader.cancel()
+
+        self._fail_pending(ConnectionError("Replay closed"))
+
+    async def login(self) -> bool:
+        """
+        Open the recording. There is no server to login to.
+        :return: True
+        """
+        self._logged_in = True
+        self._closing = False
+
+        await self.connect()
+
+        return True
+
+    async def run(self) -> int:
+        """
+        Replay every recorded frame and wait for the handlers to finish
+        :return: Number of frames replayed
+        """
+        if self.Socket is None:
+            await self.login()
+
+        socket = self.Socket
+        await socket.finished.wait()
+
+        for handlers in list(self.handlers.values()):
+            for handler in handlers:
+                await handler.queue.drain()
+
+        return socket.frames
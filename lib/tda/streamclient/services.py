@@ -210,6 +210,25 @@ class Fields:
     }
 
 
+# Fields table of each streaming service
+SERVICE_FIELDS = {
+    "ACCT_ACTIVITY": Fields.account_activity,
+    "QUOTE": Fields.level_one_equity,
+    "OPTION": Fields.level_one_options,
+    "LEVELONE_FUTURES": Fields.level_one_futures,
+    "LEVELONE_FUTURES_OPTIONS": Fields.level_one_futures,
+    "LISTED_BOOK": Fields.book,
+    "NASDAQ_BOOK": Fields.book,
+    "OPTIONS_BOOK": Fields.book,
+    "FUTURES_BOOK": Fields.book,
+    "FUTURES_OPTIONS_BOOK": Fields.book,
+    "TIMESALE_EQUITY": Fields.timesale,
+    "TIMESALE_OPTIONS": Fields.timesale,
+    "TIMESALE_FUTURES": Fields.timesale,
+    "NEWS_HEADLINE": Fields.news_headline,
+}
+
+
 class QOS(Enum):
     """
     Quality of service levels
@@ -0,0 +1,112 @@
+# Stream Subscription Manager
+import asyncio
+
+# Consumer of symbols subscribed with the *_sub methods and raw SUBS/ADD/UNSUBS requests
+DEFAULT_CONSUMER = "default"
+
+
+class SubscriptionManager:
+    """
+    Subscribed symbols of one service, reference counted across independent consumers.
+
+    Consumers (watchlists, screener pages, ...) declare the symbols they want. The manager works out the ADD and
+    UNSUBS deltas against the symbols already subscribed, so a change from one consumer never resets the stream for
+    the others. Changes are made under lock, from diff through the server's acknowledgement to commit, so the
+    deltas of concurrent consumers are computed one after another.
+    """
+
+    def __init__(self, service: str):
+        """
+        Initialize SubscriptionManager
+        :param service: Service
+        """
+        self.service = service
+
+        # {consumer: set of symbols}
+        self.consumers = {}
+
+        # {symbol: number of consumers}. Insertion ordered.
+        self.refcounts = {}
+
+        # Subscribed fields string
+        self.fields = None
+
+        # Held from diff to commit
+        self.lock = asyncio.Lock()
+
+    def __bool__(self):
+        return bool(self.refcounts)
+
+    @property
+    def keys(self) -> list:
+        """
+        Symbols currently subscribed
+        """
+        return list(self.refcounts)
+
+    def diff(self, consumer: str, symbols: list) -> tuple[list, list]:
+        """
+        Compute the deltas to go from consumer's current symbols to symbols
+        :param consumer: Consumer
+        :param symbols: Desired symbols of consumer
+        :return: (symbols to ADD, symbols to UNSUBS)
+        """
+        current = self.consumers.get(consumer, set())
+        desired = dict.fromkeys(symbols)
+
+        add = [symbol for symbol in desired if symbol not in current and symbol not in self.refcounts]
+        remove = [symbol for symbol, count in self.refcounts.items()
+                  if count == 1 and symbol in current and symbol not in desired]
+
+        return add, remove
+
+    def commit(self, consumer: str, symbols: list) -> None:
+        """
+        Set consumer's symbols after the deltas were acknowledged
+        :param consumer: Consumer
+        :param symbols: Desired symbols of consumer
+        :return: None
+        """
+        current = self.consumers.get(consumer, set())
+        desired = set(symbols)
+
+        for symbol in dict.fromkeys(symbols):
+            if symbol not in current:
+                self.refcounts[symbol] = self.refcounts.get(symbol, 0) + 1
+
+        for symbol in current - desired:
+            self.refcounts[symbol] -= 1
+            if self.refcounts[symbol] == 0:
+                del self.refcounts[symbol]
+
+        if desired:
+            self.consumers[consumer] = desired
+        else:
+            self.consumers.pop(consumer, None)
+
+        if not self.refcounts:
+            self.fields = None
+
+    def track(self, command: str, symbols: list, fields: str = None) -> None:
+        """
+        Track a raw SUBS/ADD/UNSUBS request acknowledged by server
+        :param command: SUBS, ADD or UNSUBS
+        :param symbols: Symbols of the request
+        :param fields: Fields string of the request
+        :return: None
+        """
+        if command == "SUBS":
+            # SUBS replaces every symbol of the service
+            self.consumers = {}
+            self.refcounts = {}
+            self.commit(DEFAULT_CONSUMER, symbols)
+            self.fields = fields
+
+        elif command == "ADD":
+            self.commit(DEFAULT_CONSUMER, list(self.consumers.get(DEFAULT_CONSUMER, set())) + list(symbols))
+            self.fields = fields if fields is not None else self.fields
+
+        elif command == "UNSUBS":
+            # Server dropped the symbols for every consumer
+            for consumer in list(self.consumers):
+                self.commit(consumer, [symbol for symbol in self.consumers.get(consumer) if symbol not in symbols])
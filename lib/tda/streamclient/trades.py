@@ -0,0 +1,307 @@
+# Streaming Trade Classification and Bars
+
+import numpy as np
+import pandas as pd
+
+from .quote_store import QuoteStore
+
+# Trade sides
+BUY = 1
+SELL = -1
+UNKNOWN = 0
+
+# Bar kinds
+TIME = "time"
+VOLUME = "volume"
+TICK = "tick"
+
+
+class Bar:
+    """
+    OHLC bar of classified trades
+    """
+
+    __slots__ = ("start", "end", "open", "high", "low", "close", "volume", "buy_volume", "sell_volume", "trades")
+
+    def __init__(self, time: int, price: float):
+        self.start = self.end = time
+        self.open = self.high = self.low = self.close = price
+        self.volume = self.buy_volume = self.sell_volume = 0.0
+        self.trades = 0
+
+    def add(self, time: int, price: float, size: float, side: int) -> None:
+        self.end = time
+        self.close = price
+        if price > self.high:
+            self.high = price
+        elif price < self.low:
+            self.low = price
+
+        self.volume += size
+        if side == BUY:
+            self.buy_volume += size
+        elif side == SELL:
+            self.sell_volume += size
+        self.trades += 1
+
+    @property
+    def delta(self) -> float:
+        return self.buy_volume - self.sell_volume
+
+    def to_dict(self) -> dict:
+        bar = {key: getattr(self, key) for key in self.__slots__}
+        bar["delta"] = self.delta
+        return bar
+
+
+class TradeState:
+    """
+    Running classification state of one symbol
+    """
+
+    __slots__ = ("symbol", "last_price", "last_side", "last_time", "volume", "buy_volume", "sell_volume", "trades",
+                 "bars", "completed")
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.last_price = None
+        self.last_side = UNKNOWN
+        self.last_time = None
+        self.volume = self.buy_volume = self.sell_volume = 0.0
+        self.trades = 0
+
+        # {bar kind: Bar} open and last completed bars
+        self.bars = {}
+        self.completed = {}
+
+    @property
+    def delta(self) -> float:
+        return self.buy_volume - self.sell_volume
+
+
+class TradeClassifier:
+    """
+    Classifies TIMESALE prints as buys or sells and aggregates them into running volumes and bars.
+
+    Quote rule: a print above the mid of the latest quote is a buy, below it a sell. Prints at the mid, or without a
+    usable quote, fall back to the tick rule: above the previous print is a buy, below it a sell, and an unchanged
+    price repeats the previous side. Quotes are read from a QuoteStore, which the StreamClient updates in message
+    order, so the quote used is the latest one received before the print.
+
+    Memory is one TradeState per symbol; completed bars are passed to on_bar and only the last one is kept.
+    """
+
+    def __init__(self,
+                 quotes: QuoteStore = None,
+                 max_quote_age: int = None,
+                 bar_interval: float = None,
+                 bar_volume: float = None,
+                 bar_ticks: int = None,
+                 on_trade=None,
+                 on_bar=None):
+        """
+        Initialize TradeClassifier
+        :param quotes: Level one QuoteStore of the traded symbols. None for tick rule only.
+        :param max_quote_age: Quotes received more than this many ms before a print are ignored. None for no limit.
+        :param bar_interval: Seconds per time bar. None for no time bars.
+        :param bar_volume: Volume per volume bar. None for no volume bars.
+        :param bar_ticks: Trades per tick bar. None for no tick bars.
+        :param on_trade: Called with (symbol, time, price, size, side) for every print
+        :param on_bar: Called with (symbol, bar kind, Bar) for every completed bar
+        """
+        self.quotes = quotes
+        self.max_quote_age = max_quote_age
+        self.bar_interval = int(bar_interval * 1000) if bar_interval else None
+        self.bar_volume = bar_volume
+        self.bar_ticks = bar_ticks
+        self.on_trade = on_trade
+        self.on_bar = on_bar
+
+        self.kinds = [kind for kind, size in ((TIME, bar_interval), (VOLUME, bar_volume), (TICK, bar_ticks)) if size]
+
+        if quotes is not None:
+            self._bid = quotes.numeric_labels.index("Bid Price")
+            self._ask = quotes.numeric_labels.index("Ask Price")
+            self._quote_time = quotes.numeric_labels.index("Timestamp")
+
+        # {symbol: TradeState}
+        self.states = {}
+
+    def __len__(self):
+        return len(self.states)
+
+    def __getitem__(self, symbol: str) -> TradeState:
+        return self.states[symbol]
+
+    def add(self, symbols: str | list) -> None:
+        """
+        Add states for symbols
+        :param symbols: Symbol or list of symbols
+        :return: None
+        """
+        if isinstance(symbols, str):
+            symbols = [symbols]
+
+        for symbol in symbols:
+            if symbol not in self.states:
+                self.states[symbol] = TradeState(symbol)
+
+    def remove(self, symbols: str | list) -> None:
+        """
+        Remove the states of symbols
+        :param symbols: Symbol or list of symbols
+        :return: None
+        """
+        if isinstance(symbols, str):
+            symbols = [symbols]
+
+        for symbol in symbols:
+            self.states.pop(symbol, None)
+
+    def mid(self, symbol: str, time: int) -> float:
+        """
+        Mid of the latest quote of symbol
+        :param symbol: Symbol
+        :param time: Trade time in ms, to check max_quote_age
+        :return: Mid, nan if there is no usable quote
+        """
+        quotes = self.quotes
+        if quotes is None:
+            return np.nan
+
+        row = quotes.rows.get(symbol)
+        if row is None:
+            return np.nan
+
+        values = quotes.values[row]
+        if self.max_quote_age is not None and time is not None and time - values[self._quote_time] > self.max_quote_age:
+            return np.nan
+
+        bid, ask = values[self._bid], values[self._ask]
+        if not 0 < bid <= ask:
+            return np.nan
+
+        return (bid + ask) / 2
+
+    def classify(self, state: TradeState, time: int, price: float) -> int:
+        """
+        Side of a print: quote rule with tick rule fallback
+        :param state: Symbol state before the print
+        :param time: Trade time in ms
+        :param price: Trade price
+        :return: BUY, SELL or UNKNOWN
+        """
+        mid = self.mid(state.symbol, time)
+
+        if price > mid:
+            return BUY
+        elif price < mid:
+            return SELL
+
+        last = state.last_price
+        if last is None:
+            return UNKNOWN
+        elif price > last:
+            return BUY
+        elif price < last:
+            return SELL
+
+        return state.last_side
+
+    def trade(self, symbol: str, time: int, price: float, size: float) -> int:
+        """
+        Classify and aggregate one print
+        :param symbol: Symbol
+        :param time: Trade time in ms
+        :param price: Trade price
+        :param size: Trade size
+        :return: BUY, SELL or UNKNOWN
+        """
+        state = self.states.get(symbol)
+        if state is None:
+            state = self.states[symbol] = TradeState(symbol)
+
+        side = self.classify(state, time, price)
+
+        state.trades += 1
+        state.volume += size
+        if side == BUY:
+            state.buy_volume += size
+        elif side == SELL:
+            state.sell_volume += size
+
+        state.last_price = price
+        state.last_time = time
+        if side != UNKNOWN:
+            state.last_side = side
+
+        for kind in self.kinds:
+            self._bar(state, kind, time, price, size, side)
+
+        if self.on_trade is not None:
+            self.on_trade(symbol, time, price, size, side)
+
+        return side
+
+    def _bar(self, state: TradeState, kind: str, time: int, price: float, size: float, side: int) -> None:
+        """
+        Add a print to the open bar of a kind, completing it when full
+        :return: None
+        """
+        bar = state.bars.get(kind)
+
+        # Time bars complete on the first print of the next interval
+        if bar is not None and kind == TIME and time // self.bar_interval != bar.start // self.bar_interval:
+            self._complete(state, kind, bar)
+            bar = None
+
+        if bar is None:
+            bar = state.bars[kind] = Bar(time, price)
+
+        bar.add(time, price, size, side)
+
+        if (kind == VOLUME and bar.volume >= self.bar_volume) or (kind == TICK and bar.trades >= self.bar_ticks):
+            self._complete(state, kind, bar)
+
+    def _complete(self, state: TradeState, kind: str, bar: Bar) -> None:
+        state.bars.pop(kind, None)
+        state.completed[kind] = bar
+
+        if self.on_bar is not None:
+            self.on_bar(state.symbol, kind, bar)
+
+    def update(self, data: dict) -> None:
+        """
+        Apply a TIMESALE data message
+        :param data: Data message: {"service", "timestamp", "content": [{"key", "1": time, "2": price, "3": size}]}
+        :return: None
+        """
+        for content in data.get("content", []):
+            price, size = content.get("2"), content.get("3")
+            if price is None or size is None:
+                continue
+
+            self.trade(content.get("key"), content.get("1", data.get("timestamp")), price, size)
+
+    def snapshot(self, symbol: str) -> dict:
+        """
+        Running volumes and the last completed bars of symbol
+        :param symbol: Symbol
+        :return: dict
+        """
+        state = self.states[symbol]
+
+        return {"symbol": symbol, "time": state.last_time, "last": state.last_price, "trades": state.trades,
+                "volume": state.volume, "buy_volume": state.buy_volume, "sell_volume": state.sell_volume,
+                "delta": state.delta,
+                "bars": {kind: bar.to_dict() for kind, bar in state.completed.items()}}
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Running volumes of every symbol
+        :return: DataFrame indexed by symbol
+        """
+        return pd.DataFrame([[state.last_time, state.last_price, state.trades, state.volume, state.buy_volume,
+                              state.sell_volume, state.delta] for state in self.states.values()],
+                            index=pd.Index(list(self.states), name="Symbol"),
+                            columns=["Time", "Last", "Trades", "Volume", "Buy Volume", "Sell Volume", "Delta"])
@@ -0,0 +1,302 @@
+# Online Realized Volatility and Covariance
+
+import time
+
+import numpy as np
+import pandas as pd
+
+# Covariance estimators
+WELFORD = "welford"
+EWMA = "ewma"
+
+# Regular session seconds per year, to annualize realized volatility
+SESSION_SECONDS_PER_YEAR = 252 * 6.5 * 3600
+
+
+class RealizedCovariance:
+    """
+    Realized volatility and covariance of level one marks sampled on a fixed clock grid.
+
+    Marks are kept from every message but only sampled at the first message after each grid point, so bid-ask bounce
+    between samples does not add variance. Every sample updates the log return co-moments of all symbols in
+    preallocated matrices with one vectorized pass:
+        welford: running co-moments over the samples both symbols have, for the session covariance
+        ewma:    exponentially weighted zero-mean covariance with a halflife in samples
+    Symbols without a return in a sample (no mark yet) are left out of that sample.
+    """
+
+    def __init__(self,
+                 field: str = "49",
+                 interval: float = 1.0,
+                 method: str = WELFORD,
+                 halflife: float = 300,
+                 benchmark: str = "SPY",
+                 capacity: int = 64):
+        """
+        Initialize RealizedCovariance
+        :param field: Wire key of the mark in the level one messages: 49 QUOTE, 41 OPTION, 24 LEVELONE_FUTURES
+        :param interval: Grid interval in seconds
+        :param method: WELFORD or EWMA
+        :param halflife: EWMA halflife in samples
+        :param benchmark: Symbol that beta is measured against
+        :param capacity: Initial number of symbols
+        """
+        if method not in (WELFORD, EWMA):
+            raise ValueError(f"Unknown covariance method {method}. Use {WELFORD} or {EWMA}.")
+
+        self.field = field
+        self.interval = int(interval * 1000)
+        self.method = method
+        self.decay = 0.5 ** (1 / halflife)
+        self.benchmark = benchmark
+
+        # Symbol rows
+        self.symbols = []
+        self.rows = {}
+
+        # Grid slot of the last sample
+        self.slot = None
+        self.samples = 0
+
+        # Marks: latest and at the last sample
+        self.marks = np.empty(0)
+        self.sampled = np.empty(0)
+
+        # Realized variance: sum of squared returns and number of returns
+        self.realized = np.empty(0)
+        self.returns = np.empty(0)
+
+        # Pairwise co-moments: weight (sample count or EWMA weight), mean of the row symbol's returns and co-moment
+        self.weights = np.empty((0, 0))
+        self.means = np.empty((0, 0))
+        self.comoments = np.empty((0, 0))
+
+        self.capacity = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int) -> None:
+        """
+        Allocate arrays for capacity symbols, keeping the current values
+        :param capacity: Number of symbols
+        :return: None
+        """
+        def grow(array: np.ndarray, fill: float) -> np.ndarray:
+            grown = np.full((capacity,) * array.ndim, fill)
+            grown[(slice(0, self.capacity),) * array.ndim] = array
+            return grown
+
+        self.marks = grow(self.marks, np.nan)
+        self.sampled = grow(self.sampled, np.nan)
+        self.realized = grow(self.realized, 0.0)
+        self.returns = grow(self.returns, 0.0)
+        self.weights = grow(self.weights, 0.0)
+        self.means = grow(self.means, 0.0)
+        self.comoments = grow(self.comoments, 0.0)
+
+        self.capacity = capacity
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol: str):
+        return symbol in self.rows
+
+    def add(self, symbols: str | list) -> None:
+        """
+        Add rows for symbols
+        :param symbols: Symbol or list of symbols
+        :return: None
+        """
+        if isinstance(symbols, str):
+            symbols = [symbols]
+
+        for symbol in symbols:
+            if symbol not in self.rows:
+                if len(self.symbols) == self.capacity:
+                    self._allocate(self.capacity * 2)
+
+                self.rows[symbol] = len(self.symbols)
+                self.symbols.append(symbol)
+
+    def remove(self, symbols: str | list) -> None:
+        """
+        Remove rows for symbols. The last row and column are moved into the freed ones.
+        :param symbols: Symbol or list of symbols
+        :return: None
+        """
+        if isinstance(symbols, str):
+            symbols = [symbols]
+
+        for symbol in symbols:
+            row = self.rows.pop(symbol, None)
+            if row is None:
+                continue
+
+            last = len(self.symbols) - 1
+            last_symbol = self.symbols.pop()
+
+            if row != last:
+                for vector in (self.marks, self.sampled, self.realized, self.returns):
+                    vector[row] = vector[last]
+                for matrix in (self.weights, self.means, self.comoments):
+                    matrix[row] = matrix[last]
+                    matrix[:, row] = matrix[:, last]
+
+                self.symbols[row] = last_symbol
+                self.rows[last_symbol] = row
+
+            self.marks[last] = self.sampled[last] = np.nan
+            self.realized[last] = self.returns[last] = 0.0
+            for matrix in (self.weights, self.means, self.comoments):
+                matrix[last] = 0.0
+                matrix[:, last] = 0.0
+
+    def update(self, data: dict) -> None:
+        """
+        Apply a level one data message, sampling first if a grid point passed since the last sample
+        :param data: Data message: {"service", "timestamp", "content": [{"key", wire key: value}]}
+        :return: None
+        """
+        timestamp = data.get("timestamp") or int(time.time() * 1000)
+        slot = timestamp // self.interval
+
+        if self.slot is None:
+            self.slot = slot
+        elif slot > self.slot:
+            self.slot = slot
+            self.sample()
+
+        field = self.field
+        for content in data.get("content", []):
+            mark = content.get(field)
+            if mark is None:
+                continue
+
+            symbol = content.get("key")
+            row = self.rows.get(symbol)
+            if row is None:
+                self.add(symbol)
+                row = self.rows.get(symbol)
+
+            self.marks[row] = mark
+
+    def sample(self) -> None:
+        """
+        Take a sample of the current marks
+        :return: None
+        """
+        n = len(self.symbols)
+        marks = self.marks[:n]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = np.log(marks / self.sampled[:n])
+
+        valid = np.isfinite(returns)
+        self.sampled[:n] = marks
+
+        if not valid.any():
+            return
+
+        returns = np.where(valid, returns, 0.0)
+        pairs = valid[:, None] & valid[None, :]
+
+        self.realized[:n] += returns * returns
+        self.returns[:n] += valid
+
+        weights = self.weights[:n, :n]
+        means = self.means[:n, :n]
+        comoments = self.comoments[:n, :n]
+
+        if self.method == WELFORD:
+            # Welford: C += (x - mean x before) * (y - mean y after) over the samples both symbols have
+            weights += pairs
+            deviations = np.where(pairs, returns[:, None] - means, 0.0)
+            means += np.where(pairs, deviations / np.maximum(weights, 1), 0.0)
+            comoments += deviations * (returns[None, :] - means.T)
+
+        else:
+            # EWMA: decayed sums of the return products and of the weights, so early estimates are unbiased
+            decay = np.where(pairs, self.decay, 1.0)
+            weights *= decay
+            weights += np.where(pairs, 1 - self.decay, 0.0)
+            comoments *= decay
+            comoments += np.where(pairs, (1 - self.decay) * np.outer(returns, returns), 0.0)
+
+        self.samples += 1
+
+    def covariance(self) -> pd.DataFrame:
+        """
+        Covariance matrix of the sampled log returns
+        :return: DataFrame indexed by symbol on both axes
+        """
+        n = len(self.symbols)
+        weights = self.weights[:n, :n]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if self.method == WELFORD:
+                covariance = np.where(weights > 1, self.comoments[:n, :n] / (weights - 1), np.nan)
+            else:
+                covariance = np.where(weights > 0, self.comoments[:n, :n] / weights, np.nan)
+
+        return pd.DataFrame(covariance, index=self.symbols, columns=self.symbols)
+
+    def correlation(self) -> pd.DataFrame:
+        """
+        Correlation matrix of the sampled log returns
+        :return: DataFrame indexed by symbol on both axes
+        """
+        covariance = self.covariance().to_numpy()
+        deviations = np.sqrt(np.diag(covariance))
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            correlation = covariance / np.outer(deviations, deviations)
+
+        return pd.DataFrame(correlation, index=self.symbols, columns=self.symbols)
+
+    def beta(self, benchmark: str = None) -> pd.Series:
+        """
+        Beta of every symbol against benchmark
+        :param benchmark: Symbol. None for the benchmark given at init.
+        :return: Series indexed by symbol
+        """
+        benchmark = benchmark or self.benchmark
+        if benchmark not in self.rows:
+            return pd.Series(np.nan, index=self.symbols, name="Beta")
+
+        covariance = self.covariance()[benchmark]
+        return (covariance / covariance.get(benchmark)).rename("Beta")
+
+    def volatility(self, annualize: bool = False) -> pd.Series:
+        """
+        Realized volatility of every symbol: square root of the sum of squared sampled log returns
+        :param annualize: Scale to a year of regular sessions from the mean squared return per grid interval
+        :return: Series indexed by symbol
+        """
+        n = len(self.symbols)
+        realized, returns = self.realized[:n], self.returns[:n]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if annualize:
+                volatility = np.sqrt(realized / returns * SESSION_SECONDS_PER_YEAR / (self.interval / 1000))
+            else:
+                volatility = np.where(returns > 0, np.sqrt(realized), np.nan)
+
+        return pd.Series(volatility, index=self.symbols, name="Realized Volatility")
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Mark, realized volatility, beta and correlation against the benchmark of every symbol
+        :return: DataFrame indexed by symbol
+        """
+        n = len(self.symbols)
+        correlation = self.correlation()
+
+        return pd.DataFrame({
+            "Mark": self.marks[:n],
+            "Samples": self.returns[:n],
+            "Realized Volatility": self.volatility().to_numpy(),
+            "Annualized Volatility": self.volatility(annualize=True).to_numpy(),
+            "Beta": self.beta().to_numpy(),
+            "Correlation": (correlation[self.benchmark].to_numpy() if self.benchmark in self.rows
+                            else np.full(n, np.nan)),
+        }, index=pd.Index(self.symbols, name="Symbol"))
@@ -0,0 +1,285 @@
+# Intraday Volume Profile and VWAP
+
+import numpy as np
+import pandas as pd
+
+# Initial price buckets of a profile
+INITIAL_BUCKETS = 64
+
+# Bucket prices are rounded to drop float error of bucket * tick size
+PRICE_DECIMALS = 10
+
+
+class VolumeProfile:
+    """
+    Volume at price of one symbol in fixed tick size buckets, with session and rolling VWAP.
+
+    The histogram is a float64 array over a contiguous bucket range that doubles when a print falls outside it.
+    Rolling VWAP sums live in a ring of time slots. Every print is O(1); the value area is computed on demand.
+    """
+
+    __slots__ = ("symbol", "tick_size", "base", "volumes", "low", "high", "poc", "volume", "notional", "trades",
+                 "last_time", "slot_times", "slot_notional", "slot_volume", "resolution")
+
+    def __init__(self, symbol: str, tick_size: float, window_slots: int, resolution: int):
+        """
+        Initialize VolumeProfile
+        :param symbol: Symbol
+        :param tick_size: Price bucket size
+        :param window_slots: Rolling VWAP slots
+        :param resolution: Rolling VWAP slot size in ms
+        """
+        self.symbol = symbol
+        self.tick_size = tick_size
+
+        # Histogram: volumes[i] is the volume of bucket base + i; low and high are the extreme traded buckets
+        self.base = None
+        self.volumes = np.zeros(INITIAL_BUCKETS)
+        self.low = self.high = None
+        self.poc = None
+
+        # Session totals
+        self.volume = 0.0
+        self.notional = 0.0
+        self.trades = 0
+        self.last_time = None
+
+        # Rolling window ring: slot start time, price * size and size of each slot
+        self.resolution = resolution
+        self.slot_times = np.full(window_slots, -1, dtype=np.int64)
+        self.slot_notional = np.zeros(window_slots)
+        self.slot_volume = np.zeros(window_slots)
+
+    def _index(self, bucket: int) -> int:
+        """
+        Histogram index of a bucket, growing the histogram to cover it
+        :param bucket: Price bucket
+        :return: Index
+        """
+        if self.base is None:
+            self.base = bucket - len(self.volumes) // 2
+
+        index = bucket - self.base
+        if 0 <= index < len(self.volumes):
+            return index
+
+        # Double (or more) with the old range and the new bucket centred
+        low, high = min(self.base, bucket), max(self.base + len(self.volumes), bucket + 1)
+        size = max(len(self.volumes) * 2, high - low)
+        base = low - (size - (high - low)) // 2
+
+        volumes = np.zeros(size)
+        volumes[self.base - base:self.base - base + len(self.volumes)] = self.volumes
+        self.volumes, self.base = volumes, base
+
+        return bucket - base
+
+    def add(self, time: int, price: float, size: float) -> None:
+        """
+        Add a print
+        :param time: Trade time in ms
+        :param price: Trade price
+        :param size: Trade size
+        :return: None
+        """
+        bucket = round(price / self.tick_size)
+        index = self._index(bucket)
+        volumes = self.volumes
+        volumes[index] += size
+
+        if self.poc is None or volumes[index] > volumes[self.poc - self.base]:
+            self.poc = bucket
+        if self.low is None or bucket < self.low:
+            self.low = bucket
+        if self.high is None or bucket > self.high:
+            self.high = bucket
+
+        self.volume += size
+        self.notional += price * size
+        self.trades += 1
+
+        if time is not None:
+            self.last_time = time
+
+            start = time - time % self.resolution
+            slot = start // self.resolution % len(self.slot_times)
+            if self.slot_times[slot] != start:
+                self.slot_times[slot] = start
+                self.slot_notional[slot] = 0.0
+                self.slot_volume[slot] = 0.0
+            self.slot_notional[slot] += price * size
+            self.slot_volume[slot] += size
+
+    def price(self, bucket: int) -> float:
+        return round(bucket * self.tick_size, PRICE_DECIMALS)
+
+    @property
+    def vwap(self) -> float:
+        return self.notional / self.volume if self.volume else np.nan
+
+    def rolling_vwap(self, time: int = None) -> float:
+        """
+        VWAP of the rolling window ending at time
+        :param time: Time in ms. None for the last print time.
+        :return: VWAP, nan if the window has no prints
+        """
+        time = self.last_time if time is None else time
+        if time is None:
+            return np.nan
+
+        start = time - time % self.resolution - (len(self.slot_times) - 1) * self.resolution
+        live = (self.slot_times >= start) & (self.slot_times <= time)
+
+        volume = self.slot_volume[live].sum()
+        return float(self.slot_notional[live].sum() / volume) if volume else np.nan
+
+    def histogram(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Traded price range of the histogram
+        :return: (prices, volumes) from the lowest to the highest traded bucket. volumes is a view.
+        """
+        if self.low is None:
+            return np.empty(0), np.empty(0)
+
+        prices = (np.arange(self.low, self.high + 1) * self.tick_size).round(PRICE_DECIMALS)
+        return prices, self.volumes[self.low - self.base:self.high - self.base + 1]
+
+    def value_area(self, percent: float = 0.7) -> tuple[float, float]:
+        """
+        Price range around the POC holding percent of the volume, grown one bucket at a time toward the larger side
+        :param percent: Share of the volume
+        :return: (value area low, value area high)
+        """
+        if self.poc is None:
+            return np.nan, np.nan
+
+        volumes = self.volumes[self.low - self.base:self.high - self.base + 1]
+        low = high = self.poc - self.low
+        covered, target = volumes[low], percent * self.volume
+
+        while covered < target and (low > 0 or high < len(volumes) - 1):
+            below = volumes[low - 1] if low > 0 else -1.0
+            above = volumes[high + 1] if high < len(volumes) - 1 else -1.0
+
+            if above >= below:
+                high += 1
+                covered += above
+            else:
+                low -= 1
+                covered += below
+
+        return self.price(self.low + low), self.price(self.low + high)
+
+
+class VolumeProfiler:
+    """
+    Volume profiles of every symbol of a TIMESALE service
+    """
+
+    def __init__(self, tick_size: float = 0.01, window: float = 300, resolution: float = 1, value_area: float = 0.7):
+        """
+        Initialize VolumeProfiler
+        :param tick_size: Price bucket size
+        :param window: Rolling VWAP window in seconds
+        :param resolution: Rolling VWAP slot size in seconds: prints expire from the window one slot at a time
+        :param value_area: Share of the volume in the value area
+        """
+        self.tick_size = tick_size
+        self.resolution = max(int(resolution * 1000), 1)
+        self.window_slots = max(int(window * 1000) // self.resolution, 1)
+        self.value_area = value_area
+
+        # {symbol: VolumeProfile}
+        self.profiles = {}
+
+    def __len__(self):
+        return len(self.profiles)
+
+    def __getitem__(self, symbol: str) -> VolumeProfile:
+        return self.profiles[symbol]
+
+    def add(self, symbols: str | list) -> None:
+        """
+        Add empty profiles for symbols
+        :param symbols: Symbol or list of symbols
+        :return: None
+        """
+        if isinstance(symbols, str):
+            symbols = [symbols]
+
+        for symbol in symbols:
+            if symbol not in self.profiles:
+                self.profiles[symbol] = VolumeProfile(symbol, self.tick_size, self.window_slots, self.resolution)
+
+    def remove(self, symbols: str | list) -> None:
+        """
+        Remove the profiles of symbols
+        :param symbols: Symbol or list of symbols
+        :return: None
+        """
+        if isinstance(symbols, str):
+            symbols = [symbols]
+
+        for symbol in symbols:
+            self.profiles.pop(symbol, None)
+
+    def reset(self, symbols: str | list = None) -> None:
+        """
+        Start a new session
+        :param symbols: Symbol or list of symbols. None for every symbol.
+        :return: None
+        """
+        symbols = list(self.profiles) if symbols is None else symbols
+        self.remove(symbols)
+        self.add(symbols)
+
+    def update(self, data: dict) -> None:
+        """
+        Apply a TIMESALE data message
+        :param data: Data message: {"service", "timestamp", "content": [{"key", "1": time, "2": price, "3": size}]}
+        :return: None
+        """
+        for content in data.get("content", []):
+            price, size = content.get("2"), content.get("3")
+            if price is None or size is None:
+                continue
+
+            symbol = content.get("key")
+            profile = self.profiles.get(symbol)
+            if profile is None:
+                profile = self.profiles[symbol] = VolumeProfile(symbol, self.tick_size, self.window_slots,
+                                                                self.resolution)
+
+            profile.add(content.get("1", data.get("timestamp")), price, size)
+
+    def snapshot(self, symbol: str) -> dict:
+        """
+        Profile and VWAPs of symbol
+        :param symbol: Symbol
+        :return: dict with "prices" and "volumes" arrays of the traded range
+        """
+        profile = self.profiles[symbol]
+        prices, volumes = profile.histogram()
+        value_area_low, value_area_high = profile.value_area(self.value_area)
+
+        return {"symbol": symbol, "time": profile.last_time, "volume": profile.volume, "trades": profile.trades,
+                "vwap": profile.vwap, "rolling_vwap": profile.rolling_vwap(),
+                "poc": profile.price(profile.poc) if profile.poc is not None else np.nan,
+                "value_area_low": value_area_low, "value_area_high": value_area_high,
+                "prices": prices, "volumes": volumes.copy()}
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        VWAPs, POC and value area of every symbol
+        :return: DataFrame indexed by symbol
+        """
+        columns = ["Time", "Volume", "Trades", "VWAP", "Rolling VWAP", "POC", "Value Area Low", "Value Area High"]
+
+        rows = []
+        for symbol in self.profiles:
+            snapshot = self.snapshot(symbol)
+            rows.append([snapshot.get("time"), snapshot.get("volume"), snapshot.get("trades"), snapshot.get("vwap"),
+                         snapshot.get("rolling_vwap"), snapshot.get("poc"), snapshot.get("value_area_low"),
+                         snapshot.get("value_area_high")])
+
+        return pd.DataFrame(rows, index=pd.Index(list(self.profiles), name="Symbol"), columns=columns)
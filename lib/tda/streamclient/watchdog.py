@@ -0,0 +1,104 @@
+# Event Loop Lag Watchdog
+
+import asyncio
+import time
+from collections import deque
+
+from .metrics import LatencyHistogram
+from ..logger import TDALogger
+
+
+class LoopWatchdog:
+    """
+    Measures event loop scheduling lag: how late a sleeping coroutine wakes up.
+
+    Every interval the watchdog sleeps and records how much later than requested it woke up. Lag means some
+    coroutine blocked the loop. When lag crosses threshold, the handler runs that overlapped the stall are logged
+    with their runtime, so a blocking handler can be named.
+    """
+
+    def __init__(self, runs: deque = None, interval: float = 0.1, threshold: float = 0.1):
+        """
+        Initialize LoopWatchdog
+        :param runs: Shared log of handler runs: (start ns, end ns, handler name, executor)
+        :param interval: Seconds between checks
+        :param threshold: Lag in seconds logged as a stall
+        """
+        self.logger = TDALogger("StreamClient").logger
+
+        self.runs = runs if runs is not None else deque(maxlen=10000)
+        self.interval = interval
+        self.threshold = threshold
+
+        self._task = None
+
+        # Lag histogram in ns and stalls over threshold
+        self.lag = LatencyHistogram()
+        self.stalls = 0
+        self.last_stall = None
+
+    def start(self) -> None:
+        """
+        Start watching the running loop
+        :return: None
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._watch())
+
+    def stop(self) -> None:
+        """
+        Stop watching
+        :return: None
+        """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        """
+        Lag percentiles in ms and stall count
+        :return: dict
+        """
+        return {"lag": self.lag.summary(), "stalls": self.stalls, "last_stall": self.last_stall}
+
+    def culprits(self, start: int, end: int) -> list:
+        """
+        Handlers that ran on the loop between start and end
+        :param start: perf_counter_ns
+        :param end: perf_counter_ns
+        :return: [(handler name, runtime ms in window, calls)] longest first
+        """
+        culprits = {}
+
+        for run_start, run_end, name, executor in reversed(self.runs):
+            if run_end < start:
+                break
+            # Thread and process handlers do not block the loop
+            if executor != "inline" or run_start > end:
+                continue
+
+            runtime, calls = culprits.get(name, (0, 0))
+            culprits[name] = (runtime + min(run_end, end) - max(run_start, start), calls + 1)
+
+        return sorted(((name, runtime / 1e6, calls) for name, (runtime, calls) in culprits.items()),
+                      key=lambda culprit: culprit[1], reverse=True)
+
+    async def _watch(self):
+        interval = int(self.interval * 1e9)
+        threshold = int(self.threshold * 1e9)
+
+        while True:
+            start = time.perf_counter_ns()
+            await asyncio.sleep(self.interval)
+            end = time.perf_counter_ns()
+
+            lag = end - start - interval
+            self.lag.record(lag)
+
+            if lag > threshold:
+                self.stalls += 1
+                culprits = self.culprits(start, end)
+                self.last_stall = {"time": time.time(), "lag_ms": lag / 1e6, "handlers": culprits}
+
+                handlers = ", ".join(f"{name} ({runtime:.1f} ms, {calls} calls)" for name, runtime, calls in culprits)
+                self.logger.warning(f"Event loop stalled {lag / 1e6:.1f} ms. Handlers: {handlers or 'none'}")
@@ -1,6 +1,21 @@
+import asyncio
+import os
+import pickle
+import tempfile
+import threading
+import time
 import unittest
+from pathlib import Path
+from unittest import IsolatedAsyncioTestCase, mock
+
+from aiohttp import web
 
 from lib.tda import authenticate, get_token, get_content
+from lib.tda.auth import async_content, auth_token, oauth, token_cache
+from lib.tda.auth.rate_limit import RateLimiter
+from lib.tda.auth.refresher import TokenRefresher
+from lib.tda.auth.session import SessionPool
+from lib.tda.auth.token_cache import TokenCache
 
 
 class AuthTest(unittest.TestCase):
@@ -19,6 +34,256 @@ class AuthTest(unittest.TestCase):
         self.assertEqual(data.status_code, 200)
 
 
+class TokenCacheTest(unittest.TestCase):
+    def test_reload_on_change(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'token.pickle')
+            with open(path, 'wb') as token_obj:
+                pickle.dump({'token_header': {'Authorization': 'Bearer a'}, 'expires_at': 1.0}, token_obj)
+
+            cache = TokenCache(path, check_interval=0)
+            for _ in range(100):
+                self.assertEqual(cache.header(), {'Authorization': 'Bearer a'})
+            self.assertEqual(cache.expires_at(), 1.0)
+            self.assertEqual(cache.loads, 1)
+
+            with open(path, 'wb') as token_obj:
+                pickle.dump({'token_header': {'Authorization': 'Bearer b'}}, token_obj)
+            os.utime(path, ns=(0, 1))
+
+            self.assertEqual(cache.header(), {'Authorization': 'Bearer b'})
+            self.assertEqual(cache.loads, 2)
+
+    def test_set(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'token.pickle')
+            token = {'token_header': {'Authorization': 'Bearer a'}, 'expires_at': 1.0}
+            with open(path, 'wb') as token_obj:
+                pickle.dump(token, token_obj)
+
+            # The writing process uses the token it saved without reading or checking the file
+            cache = TokenCache(path)
+            cache.set(token)
+            with mock.patch('os.stat') as stat:
+                self.assertEqual(cache.header(), {'Authorization': 'Bearer a'})
+                stat.assert_not_called()
+            self.assertEqual(cache.loads, 0)
+
+
+class WithTokenTest(unittest.TestCase):
+    def test_merge(self):
+        with mock.patch.object(auth_token, 'get_token', return_value={'Authorization': 'Bearer new'}):
+            self.assertEqual(auth_token.with_token({'Authorization': 'Bearer old', 'Accept': 'application/json'}),
+                             {'Authorization': 'Bearer new', 'Accept': 'application/json'})
+            self.assertEqual(auth_token.with_token(), {'Authorization': 'Bearer new'})
+
+
+class DumpPickleTest(unittest.TestCase):
+    def test_atomic(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'token.pickle')
+            oauth.dump_pickle({'n': -1}, path)
+            done = threading.Event()
+
+            def write():
+                for n in range(200):
+                    oauth.dump_pickle({'n': n, 'padding': 'x' * 100_000}, path)
+                done.set()
+
+            writer = threading.Thread(target=write)
+            writer.start()
+
+            # Readers never see a partially written file
+            while not done.is_set():
+                with open(path, 'rb') as token_obj:
+                    self.assertIn('n', pickle.load(token_obj))
+            writer.join()
+
+            self.assertEqual(os.listdir(directory), ['token.pickle'])
+
+
+class TokenRefresherTest(unittest.TestCase):
+    def test_refresh_before_expiry(self):
+        def post(url, headers=None, data=None):
+            response = mock.Mock()
+            response.json.return_value = {'access_token': data['refresh_token'] + '-access', 'expires_in': 1800}
+            return response
+
+        with tempfile.TemporaryDirectory() as directory:
+            token_path, status_path = Path(directory, 'token.pickle'), Path(directory, 'tda_status.pickle')
+            with open(token_path, 'wb') as token_obj:
+                pickle.dump({'token_header': {'Authorization': 'Bearer old'}, 'refresh_token': 'refresh',
+                             'expires_at': time.time() + 60}, token_obj)
+
+            with mock.patch.object(oauth, 'TOKEN_PATH', token_path), \
+                    mock.patch.object(oauth, 'STATUS_PATH', status_path), \
+                    mock.patch.object(token_cache, 'path', token_path), \
+                    mock.patch.object(oauth.requests, 'post', post):
+                token_cache.invalidate()
+
+                refresher = TokenRefresher(margin=300, lock_path=os.path.join(directory, 'token.lock'))
+                self.assertEqual(refresher.due(), 0)
+
+                refresher.start()
+                for _ in range(100):
+                    if refresher.refreshes:
+                        break
+                    time.sleep(0.01)
+                refresher.stop()
+
+                self.assertEqual(refresher.refreshes, 1)
+                self.assertEqual(token_cache.header(), {'Authorization': 'Bearer refresh-access'})
+                self.assertGreater(refresher.due(), 1000)
+
+            token_cache.invalidate()
+
+    def test_one_refresh(self):
+        posts = []
+
+        def post(url, headers=None, data=None):
+            posts.append(data)
+            time.sleep(0.05)
+            response = mock.Mock()
+            response.json.return_value = {'access_token': 'new', 'expires_in': 1800}
+            return response
+
+        with tempfile.TemporaryDirectory() as directory:
+            token_path, status_path = Path(directory, 'token.pickle'), Path(directory, 'tda_status.pickle')
+            with open(token_path, 'wb') as token_obj:
+                pickle.dump({'token_header': {'Authorization': 'Bearer old'}, 'refresh_token': 'refresh',
+                             'expires_at': time.time() + 60}, token_obj)
+
+            with mock.patch.object(oauth, 'TOKEN_PATH', token_path), \
+                    mock.patch.object(oauth, 'STATUS_PATH', status_path), \
+                    mock.patch.object(token_cache, 'path', token_path), \
+                    mock.patch.object(oauth.requests, 'post', post):
+                token_cache.invalidate()
+
+                # Refreshers sharing the lock file, as in separate processes, refresh once between them
+                lock_path = os.path.join(directory, 'token.lock')
+                refreshers = [TokenRefresher(margin=300, lock_path=lock_path) for _ in range(4)]
+                threads = [threading.Thread(target=refresher.refresh, kwargs={'force': False})
+                           for refresher in refreshers]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+
+                self.assertEqual(len(posts), 1)
+                self.assertEqual(sum(refresher.refreshes for refresher in refreshers), 1)
+
+            token_cache.invalidate()
+
+    def test_unknown_expiry(self):
+        post = mock.Mock()
+
+        with tempfile.TemporaryDirectory() as directory:
+            token_path, status_path = Path(directory, 'token.pickle'), Path(directory, 'tda_status.pickle')
+            with open(token_path, 'wb') as token_obj:
+                pickle.dump({'token_header': {'Authorization': 'Bearer old'}}, token_obj)
+
+            with mock.patch.object(oauth, 'TOKEN_PATH', token_path), \
+                    mock.patch.object(oauth, 'STATUS_PATH', status_path), \
+                    mock.patch.object(token_cache, 'path', token_path), \
+                    mock.patch.object(oauth.requests, 'post', post):
+                token_cache.invalidate()
+
+                # Tokens saved before the expiry was recorded are not refreshed blind
+                refresher = TokenRefresher(margin=300, lock_path=os.path.join(directory, 'token.lock'))
+                self.assertIsNone(refresher.due())
+                self.assertAlmostEqual(refresher.backoff(), oauth.ACCESS_TOKEN_LIFETIME - 300, delta=5)
+
+                refresher.start()
+                time.sleep(0.05)
+                self.assertTrue(refresher.running)
+                refresher.stop()
+
+                post.assert_not_called()
+                self.assertEqual(refresher.refreshes, 0)
+
+            token_cache.invalidate()
+
+
+class SessionPoolTest(unittest.TestCase):
+    def test_shared_adapter(self):
+        pool = SessionPool(pool_size=4, gzip=False)
+        sessions = [pool.session()]
+
+        thread = threading.Thread(target=lambda: sessions.append(pool.session()))
+        thread.start()
+        thread.join()
+
+        # One Session per thread on one connection pool
+        self.assertIs(pool.session(), sessions[0])
+        self.assertIsNot(sessions[0], sessions[1])
+        self.assertIs(sessions[0].get_adapter('https://api.tdameritrade.com'),
+                      sessions[1].get_adapter('https://api.tdameritrade.com'))
+        self.assertEqual(sessions[0].headers['Accept-Encoding'], 'identity')
+
+        pool.configure(pool_size=8)
+        self.assertIsNot(pool.session(), sessions[0])
+        self.assertEqual(pool.session().headers['Accept-Encoding'], 'gzip, deflate')
+
+
+class RateLimiterTest(unittest.TestCase):
+    def test_shared_bucket(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'rate_limit.bin')
+            limiter, other = RateLimiter(path, rate=10, per=1, burst=2), RateLimiter(path, rate=10, per=1, burst=2)
+
+            # Burst, then one token every 0.1s, drawn from one bucket by both limiters
+            waits = [limiter.reserve(), other.reserve(), limiter.reserve(), other.reserve()]
+            self.assertEqual(waits[:2], [0, 0])
+            self.assertAlmostEqual(waits[2], 0.1, delta=0.02)
+            self.assertAlmostEqual(waits[3], 0.2, delta=0.02)
+
+            # A 429 puts every process in debt
+            other.penalize(1)
+            self.assertAlmostEqual(limiter.available(), -12, delta=0.2)
+
+
+class AsyncContentTest(IsolatedAsyncioTestCase):
+    async def test_concurrency(self):
+        in_flight = []
+
+        async def chains(request):
+            in_flight.append(1)
+            await asyncio.sleep(0.01)
+            concurrent = len(in_flight)
+            in_flight.pop()
+
+            if request.query.get('symbol') == 'ERROR':
+                return web.Response(status=500)
+            return web.json_response({'symbol': request.query.get('symbol'), 'concurrent': concurrent})
+
+        app = web.Application()
+        app.router.add_get('/chains', chains)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        url = 'http://127.0.0.1:{}/chains'.format(site._server.sockets[0].getsockname()[1])
+
+        session = async_content.AsyncSession(concurrency=4)
+        directory = tempfile.TemporaryDirectory()
+        limiter = RateLimiter(os.path.join(directory.name, 'rate_limit.bin'), rate=1000, per=1, burst=100)
+        try:
+            with mock.patch.object(async_content, 'async_session', session), \
+                    mock.patch.object(async_content, 'rate_limiter', limiter), \
+                    mock.patch.object(async_content.token_refresher, 'start'):
+                contents = await asyncio.gather(*[async_content.async_get_content(url, params={'symbol': str(i)},
+                                                                                  headers={}) for i in range(20)])
+                error = await async_content.async_get_content(url, params={'symbol': 'ERROR'}, headers={})
+        finally:
+            await session.close()
+            await runner.cleanup()
+            directory.cleanup()
+
+        self.assertEqual([content.json()['symbol'] for content in contents], [str(i) for i in range(20)])
+        self.assertLessEqual(max(content.json()['concurrent'] for content in contents), 4)
+        self.assertIsNone(error)
+
+
 # Run All Tests
 if __name__ == '__main__':
     unittest.main()
@@ -1,8 +1,32 @@
+import asyncio
+import json
+import tempfile
+import time
 import unittest
-from ..streamclient import StreamClient
+
+import numpy as np
+
+from ..streamclient import StreamClient, ReplayStreamClient, StreamRecorder, Fields
+from ..streamclient.book import BookEngine
+from ..streamclient.client import BatchHandler, BookHandler
+from ..streamclient.decoders import get_decoder
+from ..streamclient.dispatch import HandlerQueue
+from ..streamclient.metrics import LatencyHistogram
+from ..streamclient.watchdog import LoopWatchdog
+from ..streamclient.local_server import LocalStreamServer, LocalStreamClient
+from ..streamclient.quote_store import QuoteStore
+from ..streamclient.recorder import read_segments
+from ..streamclient.subscriptions import SubscriptionManager
+from ..streamclient.trades import TradeClassifier, BUY, SELL
+from ..streamclient.volatility import RealizedCovariance
+from ..streamclient.volume_profile import VolumeProfiler
 from unittest import IsolatedAsyncioTestCase
 
 
+def batch_size(msg: list) -> int:
+    return len(msg)
+
+
 class TestStreamer(IsolatedAsyncioTestCase):
     async def test_stream_connect_disconnect(self):
         socket = StreamClient()
@@ -15,5 +39,404 @@ class TestStreamer(IsolatedAsyncioTestCase):
                 run = False
 
 
+class TestFieldDecoder(unittest.TestCase):
+    def test_record(self):
+        decoder = get_decoder(Fields.level_one_equity)
+        record = decoder.record({"key": "SPY", "1": 476.91, "2": 476.98, "11": 71999, "50": 1640653200830})
+
+        self.assertIs(decoder, get_decoder(Fields.level_one_equity))
+        self.assertEqual(record.key, "SPY")
+        self.assertEqual(record["Bid Price"], 476.91)
+        self.assertEqual(record.get("Last Price"), None)
+        self.assertEqual(record["Quote Time"], 1640653200830)
+        self.assertEqual(dict(record), {"key": "SPY", "Bid Price": 476.91, "Ask Price": 476.98,
+                                        "Quote Time": 1640653200830})
+        self.assertEqual(len(dict(record)), len(record))
+        self.assertEqual(list(record.keys()).count("Quote Time"), 1)
+        self.assertEqual(record.values_by_number()[1:4], (476.91, 476.98, None))
+
+
+class TestBatchHandler(unittest.TestCase):
+    def test_columns(self):
+        handler = BatchHandler(print, Fields.level_one_equity, ["Bid Price", "Ask Price"])
+        frames = [{"service": "QUOTE", "timestamp": 1, "content": [{"key": "SPY", "1": 476.91, "2": 476.98,
+                                                                    "3": 476.95, "25": "SPDR S&P 500"}]},
+                  {"service": "QUOTE", "timestamp": 2, "content": [{"key": "QQQ", "2": 401.2}]}]
+
+        df = handler.columns(frames)
+        self.assertEqual(list(df.columns), ["symbol", "field", "value", "timestamp"])
+        self.assertEqual(df["symbol"].tolist(), ["SPY", "SPY", "QQQ"])
+        self.assertEqual(df["field"].tolist(), ["Bid Price", "Ask Price", "Ask Price"])
+        self.assertEqual(df["value"].tolist(), [476.91, 476.98, 401.2])
+        self.assertEqual(df["timestamp"].tolist(), [1, 1, 2])
+
+
+class TestBookHandler(unittest.TestCase):
+    def test_label(self):
+        handler = BookHandler(print, Fields.book)
+        msg = handler.label_message({"service": "LISTED_BOOK", "timestamp": 1, "content": [
+            {"key": "SPY", "1": 1640653200830, "2": [{"0": 476.91, "1": 700, "2": 1, "3": [{"0": "ARCX", "1": 700}]}],
+             "3": [], "sendTimeNs": 5}]})
+
+        book = msg["LISTED_BOOK"]["SPY"]
+        self.assertEqual(book["Time"], 1640653200830)
+        self.assertEqual(book["sendTimeNs"], 5)
+        self.assertEqual(book["Bids"], [{"Price": 476.91, "Volume": 700, "Num Bids": 1,
+                                         "Exchange Details": [{"Exchange": "ARCX", "Volume": 700}]}])
+        self.assertEqual(book["Asks"], [])
+
+
+class TestQuoteStore(unittest.TestCase):
+    def test_update(self):
+        store = QuoteStore(Fields.level_one_equity, capacity=1)
+        store.update({"timestamp": 1, "content": [{"key": "SPY", "1": 476.91, "2": 476.98, "25": "SPDR S&P 500"}]})
+        df = store.to_frame()
+        store.update({"timestamp": 2, "content": [{"key": "SPY", "1": 476.95}, {"key": "QQQ", "3": 401.1}]})
+
+        self.assertEqual(store.symbols, ["SPY", "QQQ"])
+        self.assertEqual(store.snapshot("SPY")["Bid Price"], 476.95)
+        self.assertEqual(store.snapshot("SPY")["Ask Price"], 476.98)
+        self.assertEqual(store.snapshot("SPY")["Description"], "SPDR S&P 500")
+        self.assertEqual(store.get("QQQ", "Last Price"), 401.1)
+        self.assertEqual(store.to_frame().loc["SPY", "Timestamp"], 2)
+        self.assertEqual(df.loc["SPY", "Ask Price"], 476.98)
+
+        store.remove("SPY")
+        self.assertEqual(store.symbols, ["QQQ"])
+        self.assertEqual(store.snapshot("QQQ")["Last Price"], 401.1)
+
+    def test_bad_value(self):
+        store = QuoteStore(Fields.level_one_equity)
+        store.update({"timestamp": 1, "content": [{"key": "SPY", "1": 476.91, "2": 476.98}]})
+        store.update({"timestamp": 2, "content": [{"key": "SPY", "1": "N/A", "2": 477.0}]})
+
+        self.assertEqual(store.get("SPY", "Bid Price"), 476.91)
+        self.assertEqual(store.get("SPY", "Ask Price"), 477.0)
+        self.assertEqual(store.get("SPY", "Timestamp"), 2)
+
+
+class TestBookEngine(unittest.TestCase):
+    def test_update(self):
+        engine = BookEngine(depth=2)
+        engine.update({"content": [{"key": "SPY", "1": 1640653200830,
+                                    "2": [{"0": 476.91, "1": 500, "2": 1, "3": [{"0": "ARCX", "1": 500, "2": 1}]},
+                                          {"0": 476.90, "1": 100}, {"0": 476.91, "1": 200}],
+                                    "3": [{"0": 476.99, "1": 200}, {"0": 476.98, "1": 100}]}]})
+        book = engine["SPY"]
+
+        self.assertEqual(book.bid_prices.tolist(), [476.91, 476.90])
+        self.assertEqual(book.bid_sizes.tolist(), [700, 100])
+        self.assertEqual((book.bid, book.ask, book.bid_size, book.ask_size), (476.91, 476.98, 700, 100))
+        self.assertAlmostEqual(book.microprice, (476.91 * 100 + 476.98 * 700) / 800)
+        self.assertAlmostEqual(book.imbalance, 0.75)
+        self.assertEqual(book.depth(2), (800, 300))
+
+        # Unchanged bids and missing asks keep the book
+        self.assertEqual(engine.update({"content": [{"key": "SPY", "2": [{"0": 476.91, "1": 700},
+                                                                         {"0": 476.90, "1": 100}]}]}), [])
+        self.assertEqual(engine.update({"content": [{"key": "SPY", "3": []}]}), ["SPY"])
+        self.assertEqual(book.ask_size, 0)
+        self.assertAlmostEqual(engine.to_frame().loc["SPY", "Depth Imbalance 2"], 1)
+
+
+class TestTradeClassifier(unittest.TestCase):
+    def test_classify(self):
+        quotes = QuoteStore(Fields.level_one_equity)
+        quotes.update({"timestamp": 1000, "content": [{"key": "SPY", "1": 476.90, "2": 477.00}]})
+
+        bars = []
+        classifier = TradeClassifier(quotes, bar_ticks=2, on_bar=lambda symbol, kind, bar: bars.append(bar))
+        classifier.update({"content": [{"key": "SPY", "1": 1000, "2": 476.99, "3": 100},
+                                       {"key": "SPY", "1": 1001, "2": 476.91, "3": 200},
+                                       {"key": "SPY", "1": 1002, "2": 476.95, "3": 300},
+                                       {"key": "QQQ", "1": 1002, "2": 401.00, "3": 50},
+                                       {"key": "QQQ", "1": 1003, "2": 401.01, "3": 50}]})
+
+        # Quote rule, then tick rule at the mid and without quotes
+        self.assertEqual(classifier.states["SPY"].last_side, BUY)
+        self.assertEqual(classifier.snapshot("SPY")["buy_volume"], 400)
+        self.assertEqual(classifier.snapshot("SPY")["sell_volume"], 200)
+        self.assertEqual(classifier.snapshot("QQQ")["delta"], 50)
+
+        self.assertEqual(len(bars), 2)
+        self.assertEqual((bars[0].open, bars[0].close, bars[0].volume, bars[0].delta), (476.99, 476.91, 300, -100))
+
+    def test_stale_quote(self):
+        quotes = QuoteStore(Fields.level_one_equity)
+        quotes.update({"timestamp": 1000, "content": [{"key": "SPY", "1": 476.90, "2": 477.00}]})
+
+        classifier = TradeClassifier(quotes, max_quote_age=500)
+        classifier.trade("SPY", 1000, 477.00, 100)
+        self.assertEqual(classifier.trade("SPY", 1400, 476.99, 100), BUY)
+        self.assertEqual(classifier.trade("SPY", 2000, 476.98, 100), SELL)
+
+
+class TestVolumeProfiler(unittest.TestCase):
+    def test_update(self):
+        profiler = VolumeProfiler(tick_size=0.25, window=60, resolution=1)
+        prints = [(0, 4000.00, 10), (1000, 4000.25, 30), (2000, 4000.50, 5), (61000, 3990.00, 20), (62000, 4000.25, 5)]
+        profiler.update({"content": [{"key": "/ES", "1": time, "2": price, "3": size} for time, price, size in prints]})
+
+        snapshot = profiler.snapshot("/ES")
+        self.assertEqual(snapshot["volume"], 70)
+        self.assertAlmostEqual(snapshot["vwap"], sum(price * size for _, price, size in prints) / 70)
+        self.assertAlmostEqual(snapshot["rolling_vwap"], (3990 * 20 + 4000.25 * 5) / 25)
+        self.assertEqual(snapshot["poc"], 4000.25)
+        self.assertEqual((snapshot["value_area_low"], snapshot["value_area_high"]), (4000.00, 4000.50))
+
+        # The histogram grew to cover 3990.00 and holds every bucket between
+        self.assertEqual(len(snapshot["prices"]), 43)
+        self.assertEqual(snapshot["volumes"].sum(), 70)
+
+
+class TestRealizedCovariance(unittest.TestCase):
+    def test_welford(self):
+        returns = np.random.default_rng(0).normal(0, 1e-3, (500, 3))
+        returns[:, 1] += 2 * returns[:, 0]
+        marks = 100 * np.exp(np.cumsum(returns, axis=0))
+
+        estimator = RealizedCovariance(interval=1, capacity=2)
+        for t, row in enumerate(marks):
+            # Several quotes per interval: only the last mark before each grid point is sampled
+            for price in (row * 1.001, row):
+                estimator.update({"timestamp": t * 1000 + 500,
+                                  "content": [{"key": key, "49": mark} for key, mark in zip(("SPY", "A", "B"), price)]})
+        estimator.update({"timestamp": len(marks) * 1000, "content": []})
+
+        expected = np.cov(np.diff(np.log(marks), axis=0).T)
+        np.testing.assert_allclose(estimator.covariance().to_numpy(), expected, rtol=1e-9, atol=1e-15)
+        self.assertAlmostEqual(estimator.beta()["A"], expected[1, 0] / expected[0, 0])
+
+        estimator.remove("A")
+        np.testing.assert_allclose(estimator.covariance().to_numpy(), expected[[0, 2]][:, [0, 2]], rtol=1e-9)
+
+
+class TestSubscriptionManager(unittest.TestCase):
+    def test_refcount(self):
+        manager = SubscriptionManager("QUOTE")
+
+        self.assertEqual(manager.diff("watchlist", ["SPY", "QQQ"]), (["SPY", "QQQ"], []))
+        manager.commit("watchlist", ["SPY", "QQQ"])
+
+        self.assertEqual(manager.diff("screener", ["QQQ", "IWM"]), (["IWM"], []))
+        manager.commit("screener", ["QQQ", "IWM"])
+
+        self.assertEqual(manager.diff("watchlist", ["SPY"]), ([], []))
+        manager.commit("watchlist", ["SPY"])
+
+        self.assertEqual(manager.diff("screener", []), ([], ["QQQ", "IWM"]))
+        manager.commit("screener", [])
+        self.assertEqual(manager.keys, ["SPY"])
+
+        manager.track("UNSUBS", ["SPY"])
+        self.assertFalse(manager)
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_percentiles(self):
+        histogram = LatencyHistogram()
+        for value in range(1, 100_001):
+            histogram.record(value * 1000)
+
+        self.assertEqual(histogram.count, 100_000)
+        self.assertEqual(histogram.max, 100_000_000)
+        self.assertAlmostEqual(histogram.percentile(50), 50_000_000, delta=50_000_000 / 32)
+        self.assertAlmostEqual(histogram.percentile(99), 99_000_000, delta=99_000_000 / 32)
+        self.assertAlmostEqual(histogram.summary().get("p50"), 50, delta=50 / 32)
+
+
+class TestLoopWatchdog(IsolatedAsyncioTestCase):
+    async def test_stall(self):
+        def blocking_handler(msg):
+            time.sleep(0.1)
+
+        queue = HandlerQueue(blocking_handler)
+        watchdog = LoopWatchdog(interval=0.01, threshold=0.05)
+        queue.runs = watchdog.runs
+        watchdog.start()
+
+        await asyncio.sleep(0.02)
+        await queue.put({})
+        await asyncio.sleep(0.05)
+
+        self.assertEqual(watchdog.stalls, 1)
+        self.assertTrue(watchdog.last_stall.get("handlers")[0][0].endswith("blocking_handler"))
+        self.assertEqual(queue.stats().get("calls"), 1)
+        self.assertGreaterEqual(queue.stats().get("runtime_max_ms"), 100)
+
+        watchdog.stop()
+        queue.stop()
+
+
+class TestHandlerQueue(IsolatedAsyncioTestCase):
+    async def test_drop_oldest(self):
+        received = []
+        queue = HandlerQueue(lambda msg: received.append(msg), maxsize=2, overflow="drop_oldest")
+
+        for i in range(5):
+            await queue.put(i)
+        await asyncio.sleep(0)
+
+        self.assertEqual(received, [3, 4])
+        self.assertEqual(queue.stats().get("dropped"), 3)
+        queue.stop()
+
+    async def test_conflate(self):
+        received = []
+        queue = HandlerQueue(lambda msg: received.append(msg), maxsize=10, overflow="conflate")
+
+        await queue.put({"QUOTE": {"SPY": {"Bid Price": 1.0, "Ask Price": 1.1}}})
+        await queue.put({"QUOTE": {"SPY": {"Bid Price": 1.2}}})
+        await asyncio.sleep(0)
+
+        self.assertEqual(len(received), 1)
+        self.assertEqual(dict(received[0]["QUOTE"]["SPY"]), {"Bid Price": 1.2, "Ask Price": 1.1})
+        self.assertEqual(queue.stats().get("conflated"), 1)
+        queue.stop()
+
+    async def test_conflate_notify(self):
+        received = []
+        queue = HandlerQueue(lambda msg: received.append(msg), maxsize=10, overflow="conflate")
+
+        # Heartbeats and notify payloads are not keyed by symbol: they are queued, not merged
+        await queue.put({"QUOTE": {"SPY": {"Bid Price": 1.0}}})
+        await queue.put({"ADMIN": {"heartbeat": "1640653200830"}})
+        await queue.put({"QUOTE": {"SPY": {"Bid Price": 1.2}}})
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+        self.assertEqual(received[0], {"ADMIN": {"heartbeat": "1640653200830"}})
+        self.assertEqual(dict(received[1]["QUOTE"]["SPY"]), {"Bid Price": 1.2})
+        self.assertEqual(len(received), 2)
+        self.assertEqual(queue.depth, 0)
+        queue.stop()
+
+    async def test_process_batches(self):
+        results = []
+        queue = HandlerQueue(batch_size, maxsize=10, executor="process", callback=results.append, batch_size=4)
+
+        for i in range(6):
+            await queue.put({"QUOTE": {"SPY": {"Last Price": i}}})
+
+        while queue.processed < 6:
+            await asyncio.sleep(0.01)
+
+        self.assertEqual(results, [4, 2])
+        queue.stop()
+
+
+class TestReplay(IsolatedAsyncioTestCase):
+    async def test_record_replay(self):
+        with tempfile.TemporaryDirectory() as directory:
+            recorder = StreamRecorder(directory, segment_size=256)
+            for i in range(5):
+                frame = {"data": [{"service": "TIMESALE_FUTURES", "timestamp": i,
+                                   "content": [{"key": "/ES", "2": 4000 + i, "3": 1}]}]}
+                recorder.record(json.dumps(frame), received=i * 1_000_000)
+            recorder.close()
+
+            self.assertGreater(len(recorder.segments), 1)
+            self.assertEqual([received for received, _ in read_segments(directory)],
+                             [i * 1_000_000 for i in range(5)])
+
+            prices = []
+            client = ReplayStreamClient(directory, speed=None)
+            client.add_timesale_futures_handler(lambda msg: prices.append(msg["TIMESALE_FUTURES"]["/ES"]["Last Price"]))
+
+            self.assertEqual(await client.run(), 5)
+            self.assertEqual(prices, [4000, 4001, 4002, 4003, 4004])
+            await client.logout()
+
+
+class TestLocalServer(IsolatedAsyncioTestCase):
+    async def test_login_subs(self):
+        async with LocalStreamServer(rates={"QUOTE": 100}) as server:
+            client = LocalStreamClient(server, auto_reconnect=False)
+            self.assertTrue(await client.login())
+
+            quotes = []
+            client.add_level_one_equity_handler(lambda msg: quotes.append(msg))
+            await client.level_one_equity_sub(["SPY", "QQQ"])
+
+            while len(quotes) < 3:
+                await client.handle_message()
+
+            self.assertEqual(set(quotes[-1]["QUOTE"]), {"SPY", "QQQ"})
+            self.assertIn("SPY", client.quote_store())
+            await client.logout()
+
+    async def test_iterator(self):
+        async with LocalStreamServer(rates={"QUOTE": 100}) as server:
+            client = LocalStreamClient(server, auto_reconnect=False)
+
+            ticks = client.quotes(["SPY", "QQQ"])
+            symbols = {(await ticks.__anext__()).key for _ in range(4)}
+            self.assertEqual(symbols, {"SPY", "QQQ"})
+            self.assertEqual(client.subscription("QUOTE").keys, ["SPY", "QQQ"])
+
+            await ticks.aclose()
+            self.assertFalse(client.subscription("QUOTE"))
+            await client.logout()
+
+
+    async def test_concurrent_consumers(self):
+        async with LocalStreamServer(rates={"QUOTE": 100}) as server:
+            client = LocalStreamClient(server, auto_reconnect=False)
+            await client.login()
+
+            quotes = []
+            client.add_level_one_equity_handler(lambda msg: quotes.extend(msg["QUOTE"]))
+            await client.update_symbols("QUOTE", ["SPY"], consumer="a")
+
+            # b takes SPY over while a releases it: SPY stays subscribed on both sides
+            await asyncio.gather(client.update_symbols("QUOTE", [], consumer="a"),
+                                 client.update_symbols("QUOTE", ["SPY"], consumer="b"))
+            self.assertEqual(client.subscription("QUOTE").refcounts, {"SPY": 1})
+
+            async def receive():
+                while len(quotes) < 3:
+                    await client.handle_message()
+
+            quotes.clear()
+            await asyncio.wait_for(receive(), 2)
+            self.assertEqual(set(quotes), {"SPY"})
+            await client.logout()
+
+    async def test_concurrent_iterators(self):
+        async with LocalStreamServer(rates={"QUOTE": 100}) as server:
+            client = LocalStreamClient(server, auto_reconnect=False)
+
+            bids = client.quotes("SPY", fields=["Bid Price"])
+            self.assertEqual((await bids.__anext__()).key, "SPY")
+
+            # A second iterator with other fields, opened and closed while the first is live
+            for _ in range(2):
+                asks = client.quotes("QQQ", fields=["Ask Price"])
+                tick = await asyncio.wait_for(asks.__anext__(), 2)
+                self.assertEqual(tick.key, "QQQ")
+                self.assertIn("Ask Price", tick)
+                await asks.aclose()
+
+            tick = await asyncio.wait_for(bids.__anext__(), 2)
+            self.assertEqual(tick.key, "SPY")
+            self.assertIn("Bid Price", tick)
+            self.assertEqual(client.subscription("QUOTE").keys, ["SPY"])
+
+            await bids.aclose()
+            self.assertFalse(client.subscription("QUOTE"))
+            await client.logout()
+
+    async def test_book_iterator(self):
+        async with LocalStreamServer(rates={"LISTED_BOOK": 100}) as server:
+            client = LocalStreamClient(server, auto_reconnect=False)
+
+            books = client.book("SPY")
+            book = await books.__anext__()
+            self.assertEqual(book["key"], "SPY")
+            self.assertEqual(set(book["Bids"][0]), {"Price", "Volume", "Num Bids", "Exchange Details"})
+
+            await books.aclose()
+            await client.logout()
+
 if __name__ == '__main__':
     unittest.main()
@@ -2,7 +2,7 @@
 
 import asyncio
 from lib.tda import StreamClient
-from timesale_buysell import TimeSaleFutures
+from timesale_buysell import timesale_buysell
 
 
 socket = StreamClient()
@@ -26,15 +26,14 @@ async def level_one():
     equity_options_symbols = ["SPY_122024C500", "QQQ_011924C400"]
     future_symbols = ["/ES", "/NQ"]
 
-    await socket.level_one_equity_sub(symbols=equity_symbols)
-    socket.add_level_one_equity_handler(print_handler)
+    # Subscribe to all services in one round trip
+    await socket.subscribe([("QUOTE", equity_symbols),
+                            ("OPTION", equity_options_symbols),
+                            ("LEVELONE_FUTURES", future_symbols)])
 
-    await socket.level_one_options_sub(symbols=equity_options_symbols)
+    socket.add_level_one_equity_handler(print_handler)
     socket.add_level_one_options_handler(print_handler)
-
-    await socket.level_one_futures_sub(symbols=future_symbols)
     socket.add_level_one_futures_handler(print_handler)
-    socket.add_level_one_futures_handler(TimeSaleFutures)
 
     run = True
 
@@ -42,9 +41,9 @@ async def level_one():
         try:
             await socket.handle_message()
         except KeyboardInterrupt:
-            await socket.level_one_equity_unsub(symbols=equity_symbols)
-            await socket.level_one_options_unsub(equity_options_symbols)
-            await socket.level_one_futures_unsub(future_symbols)
+            await socket.unsubscribe([("QUOTE", equity_symbols),
+                                      ("OPTION", equity_options_symbols),
+                                      ("LEVELONE_FUTURES", future_symbols)])
 
             await socket.logout(disconnect=True)
 
@@ -57,12 +56,13 @@ async def book():
     future_symbols = [r"/ES", r"/NQ"]
     futures_options_symbols = [r"/ESH23C4750"]
 
-    await socket.listed_book_sub(symbols=equity_symbols)
+    # Subscribe to all services in one round trip
+    await socket.subscribe([("LISTED_BOOK", equity_symbols),
+                            ("NASDAQ_BOOK", equity_symbols),
+                            ("OPTIONS_BOOK", equity_options_symbols)])
+
     socket.add_listed_book_handler(print_handler)
-    await socket.nasdaq_book_sub(symbols=equity_symbols)
     socket.add_nasdaq_book_handler(print_handler)
-
-    await socket.options_book_sub(symbols=equity_options_symbols)
     socket.add_options_book_handler(print_handler)
 
     run = True
@@ -72,10 +72,10 @@ async def book():
             await socket.handle_message()
 
         except KeyboardInterrupt:
-            await socket.listed_book_unsub(symbols=equity_symbols)
-            await socket.nasdaq_book_unsub(symbols=equity_symbols)
-            await socket.options_book_unsub(equity_options_symbols)
-            await socket.futures_book_unsub(future_symbols)
+            await socket.unsubscribe([("LISTED_BOOK", equity_symbols),
+                                      ("NASDAQ_BOOK", equity_symbols),
+                                      ("OPTIONS_BOOK", equity_options_symbols),
+                                      ("FUTURES_BOOK", future_symbols)])
 
             await socket.logout(disconnect=True)
 
@@ -88,12 +88,13 @@ async def timesale():
 
     await socket.update_QOS(level="0")
 
-    await socket.timesale_equity_sub(symbols=equity_symbols)
-    socket.add_timesale_equity_handler(print_handler)
+    # Subscribe to all services in one round trip
+    await socket.subscribe([("TIMESALE_EQUITY", equity_symbols),
+                            ("TIMESALE_FUTURES", future_symbols)])
 
-    await socket.timesale_futures_sub(symbols=future_symbols)
+    socket.add_timesale_equity_handler(print_handler)
     socket.add_timesale_futures_handler(print_handler)
-    socket.add_timesale_futures_handler(TimeSaleFutures)
+    timesale_buysell(socket)
 
     run = True
 
@@ -102,8 +103,8 @@ async def timesale():
             await socket.handle_message()
 
         except KeyboardInterrupt:
-            await socket.timesale_equity_unsub(symbols=equity_symbols)
-            await socket.timesale_futures_unsub(future_symbols)
+            await socket.unsubscribe([("TIMESALE_EQUITY", equity_symbols),
+                                      ("TIMESALE_FUTURES", future_symbols)])
 
             await socket.logout(disconnect=True)
 
@@ -116,20 +117,17 @@ async def news():
 
     await socket.update_QOS(level="0")
 
-    await socket.news_headline_sub(symbols=equity_symbols + future_symbols)
-    socket.add_news_headline_handler(print_handler)
+    # Symbols are subscribed while iterating and unsubscribed when the iterator closes
+    headlines = socket.news(equity_symbols + future_symbols)
 
-    run = True
+    try:
+        async for headline in headlines:
+            print_handler(headline)
 
-    while run:
-        try:
-            await socket.handle_message()
-        except KeyboardInterrupt:
-            await socket.news_headline_unsub(equity_symbols + future_symbols)
+    finally:
+        await headlines.aclose()
 
-            await socket.logout(disconnect=True)
-
-            break
+        await socket.logout(disconnect=True)
 
 
 async def main():